@@ -0,0 +1,93 @@
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Runtime configuration, read from ``TAX_*`` environment variables."""
+
+    model_config = SettingsConfigDict(env_prefix="TAX_", env_file=".env", extra="ignore")
+
+    # SQLAlchemy URL of the application database (parsed forms are saved as income records)
+    database_url: str = "sqlite:///./tax_filing.db"
+
+    # W-2 parse pool for OCR work (images, scanned PDFs): worker processes and
+    # how many uploads may wait for one
+    w2_parse_workers: int = 2
+    w2_parse_queue_size: int = 8
+    w2_parse_retry_after: int = 5
+
+    # Separate pool for PDFs with a text layer, so they never queue behind OCR
+    w2_fast_workers: int = 1
+    w2_fast_queue_size: int = 32
+
+    # OCR: backend (auto|tesserocr|pytesseract), engines per worker (default: one per
+    # zonal OCR thread, so zones are read in parallel), OpenMP threads per worker
+    w2_ocr_backend: str = "auto"
+    w2_ocr_engines: Optional[int] = None
+    w2_ocr_omp_threads: int = 1
+    # Resolution pages are rendered and photos decoded at for OCR; larger photos are
+    # reduced while decoding
+    w2_ocr_dpi: int = 300
+    # Load parser libraries and run a tiny OCR in each parse worker at startup
+    w2_warm_up: bool = True
+
+    # Extra layout profile directories (os.pathsep-separated): W-2 profiles at the top
+    # level are added to app/profiles/w2, 1099 profiles go in a <form_type> subdirectory
+    w2_profile_dirs: str = ""
+
+    # Extraction tiers (text, geometry, zonal OCR, full-page OCR) stop once every
+    # checked field scores at least this confidence
+    w2_min_confidence: float = 0.8
+
+    # Zonal OCR of W-2 template boxes before falling back to full-page OCR
+    w2_zonal_ocr: bool = True
+    w2_zonal_threads: int = 4
+
+    # OCR text of recent photos (per parse worker, ~0.3 MB each), reused for a
+    # re-photographed W-2 of the same tax return whose perceptual hash is within
+    # this many of 256 bits and that passes image verification; 0 entries disables.
+    # The hash is indexed in distance + 1 chunks, which stop pruning below ~12 bits
+    w2_ocr_cache_entries: int = 64
+    w2_ocr_cache_distance: int = 16
+
+    # Parse-result cache keyed by upload SHA-256; disk tier is off unless a dir is set
+    w2_cache_entries: int = 256
+    w2_cache_dir: Optional[str] = None
+    w2_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # Batch uploads: files per batch (after expanding ZIPs), largest ZIP member and
+    # largest request body
+    w2_batch_max_files: int = 200
+    w2_batch_max_member_bytes: int = 50 * 1024 * 1024
+    w2_batch_max_bytes: int = 200 * 1024 * 1024
+
+    # Async parse jobs: SQLite queue and job inputs live here; jobs run at most
+    # this many at once and are retried after a crash up to max attempts
+    w2_jobs_dir: str = "uploads/w2_jobs"
+    w2_job_concurrency: int = 2
+    w2_job_max_attempts: int = 3
+
+    # Server-Timing header with per-stage spans on every response (otherwise only
+    # when the request sends X-W2-Trace: 1); log full extracted W-2 text (debug only)
+    w2_trace_headers: bool = False
+    w2_debug_text: bool = False
+
+    # Uploads up to this size stay in memory; larger ones are spooled to one temp file
+    w2_spool_max_bytes: int = 8 * 1024 * 1024
+    # Largest single W-2 upload; bigger requests are cut off as their body arrives
+    w2_upload_max_bytes: int = 25 * 1024 * 1024
+
+    # Scratch space for spooled uploads: root directory (a tmpfs such as /dev/shm is
+    # fastest; default <tmp>/w2-scratch), a byte quota shared by all requests, how long
+    # a write waits for room before a 503, and when crashed requests' dirs are reaped
+    w2_scratch_dir: Optional[str] = None
+    w2_scratch_quota_bytes: int = 1024 * 1024 * 1024
+    w2_scratch_wait_seconds: float = 10.0
+    w2_scratch_orphan_seconds: int = 3600
+    w2_scratch_reap_interval: int = 300
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
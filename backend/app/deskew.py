@@ -0,0 +1,68 @@
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+# Skew below this many degrees is left alone; rotating costs more than it gains
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_MAX_ANGLE = 10.0
+# Estimation runs on a copy no wider than this
+WORK_WIDTH = 800
+
+
+@dataclass
+class SkewEstimate:
+    angle: float        # degrees to rotate (counter-clockwise) to level the text
+    elapsed_ms: float
+    applied: bool = False
+
+
+def _profile_score(binary: np.ndarray, angle: float) -> float:
+    h, w = binary.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    rotated = cv2.warpAffine(binary, M, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+    rows = rotated.sum(axis=1, dtype=np.float64)
+    # Level text gives sharp row-to-row jumps between ink lines and gaps
+    return float(np.square(np.diff(rows)).sum())
+
+
+def _search(binary: np.ndarray, lo: float, hi: float, step: float) -> float:
+    angles = np.arange(lo, hi + step / 2, step)
+    scores = [_profile_score(binary, a) for a in angles]
+    return float(angles[int(np.argmax(scores))])
+
+
+def estimate_skew(gray: np.ndarray, max_angle: float = DEFAULT_MAX_ANGLE) -> SkewEstimate:
+    """
+    Estimate page skew with a coarse-to-fine projection-profile search on a
+    downsampled, binarized copy of ``gray``.
+    """
+    start = time.perf_counter()
+    h, w = gray.shape[:2]
+    if w > WORK_WIDTH:
+        small = cv2.resize(gray, (WORK_WIDTH, max(1, round(h * WORK_WIDTH / w))), interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+    binary = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+    # Coarse pass on a further-halved copy, then refine around the best angle
+    half = cv2.resize(binary, (max(1, binary.shape[1] // 2), max(1, binary.shape[0] // 2)),
+                      interpolation=cv2.INTER_NEAREST)
+    coarse = _search(half, -max_angle, max_angle, 1.0)
+    fine = _search(binary, coarse - 1.0, coarse + 1.0, 0.1)
+    return SkewEstimate(angle=round(fine, 2), elapsed_ms=(time.perf_counter() - start) * 1000)
+
+
+def deskew(gray: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+           max_angle: float = DEFAULT_MAX_ANGLE) -> Tuple[np.ndarray, SkewEstimate]:
+    """Rotate ``gray`` level when its estimated skew exceeds ``threshold`` degrees."""
+    estimate = estimate_skew(gray, max_angle)
+    if abs(estimate.angle) < threshold:
+        return gray, estimate
+    h, w = gray.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), estimate.angle, 1.0)
+    rotated = cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    estimate.applied = True
+    return rotated, estimate
@@ -5,3 +5,39 @@ class W2ParseError(Exception):
 class UnsupportedFileTypeError(Exception):
     """Raised when an unsupported file type is uploaded"""
     pass
+
+class ParseQueueFullError(Exception):
+    """Raised when the parse pool has no free worker or queue slot"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Parse queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class ParseWorkerError(Exception):
+    """Raised when a parse worker process dies while parsing (OOM, crash in a native library)"""
+    pass
+
+class BatchTooLargeError(Exception):
+    """Raised when a batch upload holds more files than allowed"""
+    pass
+
+class ScratchQuotaError(Exception):
+    """Raised when scratch space stays full for longer than an upload may wait"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Scratch space is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload is larger than allowed"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+class TaxReturnNotFoundError(Exception):
+    """Raised when parsed forms are saved to a tax return that does not exist"""
+
+    def __init__(self, tax_return_id: int):
+        super().__init__(f"Tax return {tax_return_id} not found")
+        self.tax_return_id = tax_return_id
@@ -0,0 +1,44 @@
+"""
+Identify uploads by their leading bytes instead of the client's Content-Type.
+"""
+from typing import Collection, Optional
+
+from app.errors import UnsupportedFileTypeError
+
+PDF = "application/pdf"
+PNG = "image/png"
+JPEG = "image/jpeg"
+ZIP = "application/zip"
+
+# PDF readers accept the header anywhere in the first 1 KB (PDF 1.7, annex H)
+PDF_HEADER_WINDOW = 1024
+SIGNATURES = ((b"\x89PNG\r\n\x1a\n", PNG), (b"\xff\xd8\xff", JPEG), (b"PK\x03\x04", ZIP))
+# What clients send when they don't know the type; the sniffed type is used
+GENERIC_TYPES = {"", "application/octet-stream", "binary/octet-stream"}
+ALIASES = {"image/jpg": JPEG, "image/pjpeg": JPEG, "application/x-pdf": PDF,
+           "application/x-zip-compressed": ZIP}
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """The content type ``head`` (the first bytes of a file) starts, or None."""
+    for magic, content_type in SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    if b"%PDF-" in head[:PDF_HEADER_WINDOW]:
+        return PDF
+    return None
+
+
+def check_type(head: bytes, declared: Optional[str], allowed: Collection[str]) -> str:
+    """
+    The sniffed type of ``head``; UnsupportedFileTypeError if it is not one
+    of ``allowed`` or contradicts the type the client declared.
+    """
+    sniffed = sniff_type(head)
+    if sniffed is None or sniffed not in allowed:
+        raise UnsupportedFileTypeError(f"Unsupported file type {sniffed or 'unknown'}")
+    declared = (declared or '').split(';')[0].strip().lower()
+    declared = ALIASES.get(declared, declared)
+    if declared not in GENERIC_TYPES and declared != sniffed:
+        raise UnsupportedFileTypeError(f"File declared as {declared} but is {sniffed}")
+    return sniffed
@@ -0,0 +1,118 @@
+"""
+Field schemas of the information returns the parser reads (W-2 and the
+1099 series), and detection of which one a document is.
+
+Every form runs through the same decode, preprocess, OCR and caching
+stages; a schema only says which fields to extract (and their defaults),
+which must be confident before extraction stops, and where its layout
+profiles live (app/profiles/<form_type>).
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from app.w2_confidence import CHECKED_FIELDS
+from app.w2_grammar import W2_DEFAULTS, fold
+
+W2 = "w2"
+F1099_NEC = "1099-nec"
+F1099_INT = "1099-int"
+F1099_DIV = "1099-div"
+F1099_R = "1099-r"
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    """
+    One form type. ``defaults`` lists every output field (money fields
+    default to 0.0); ``markers`` are folded phrases that identify the form,
+    and ``layout`` says whether the W-2 geometry and template-zone tiers
+    apply. ``income_type`` is the matching ``models.IncomeType`` value.
+    """
+    form_type: str
+    title: str
+    income_type: str
+    defaults: Dict[str, Any]
+    checked_fields: Tuple[str, ...]
+    markers: Tuple[str, ...]
+    # Field holding the form's main amount, the one naming the payer and its EIN/TIN
+    amount_field: str
+    payer_field: str
+    payer_tin_field: str
+    # Fields holding the taxpayer's SSN (or TIN), first and last name
+    recipient_fields: Tuple[str, str, str]
+    layout: bool = False
+
+    @property
+    def money_fields(self) -> FrozenSet[str]:
+        return frozenset(f for f, v in self.defaults.items() if isinstance(v, float))
+
+
+# Payer and recipient boxes shared by every 1099
+_PAYER_DEFAULTS: Dict[str, Any] = {
+    "payer_name": None, "payer_tin": None, "recipient_tin": None,
+    "recipient_first_name": None, "recipient_last_name": None, "account_number": None,
+    "federal_withholding": 0.0, "state": None, "payer_state_id": None, "state_withholding": 0.0,
+}
+_PAYER_CHECKED = ("payer_tin", "payer_name", "recipient_tin")
+
+
+def _1099(form_type: str, income_type: str, amounts: Dict[str, Any], checked: Tuple[str, ...],
+          markers: Tuple[str, ...]) -> FormSchema:
+    return FormSchema(form_type=form_type, title=form_type.upper(), income_type=income_type,
+                      defaults={**_PAYER_DEFAULTS, **amounts},
+                      checked_fields=_PAYER_CHECKED + checked + ("federal_withholding",),
+                      markers=(f"form {form_type}",) + markers,
+                      amount_field=checked[0], payer_field="payer_name", payer_tin_field="payer_tin",
+                      recipient_fields=("recipient_tin", "recipient_first_name", "recipient_last_name"))
+
+
+FORMS: Dict[str, FormSchema] = {form.form_type: form for form in (
+    FormSchema(form_type=W2, title="W-2", income_type="w2_wages", defaults=W2_DEFAULTS,
+               checked_fields=CHECKED_FIELDS,
+               markers=("form w-2", "wage and tax statement", "wages, tips, other compensation",
+                        "employee's social security number", "employer identification number"),
+               amount_field="wages", payer_field="employer_name", payer_tin_field="employer_ein",
+               recipient_fields=("employee_ssn", "employee_first_name", "employee_last_name"), layout=True),
+    _1099(F1099_NEC, "self_employment", {"nonemployee_compensation": 0.0, "state_income": 0.0},
+          ("nonemployee_compensation",), ("nonemployee compensation", "payer made direct sales")),
+    _1099(F1099_INT, "interest",
+          {"interest_income": 0.0, "early_withdrawal_penalty": 0.0, "us_savings_bond_interest": 0.0,
+           "investment_expenses": 0.0, "foreign_tax_paid": 0.0, "tax_exempt_interest": 0.0},
+          ("interest_income",), ("interest income", "early withdrawal penalty", "tax-exempt interest")),
+    _1099(F1099_DIV, "dividends",
+          {"total_ordinary_dividends": 0.0, "qualified_dividends": 0.0, "total_capital_gain": 0.0,
+           "nondividend_distributions": 0.0, "section_199a_dividends": 0.0, "foreign_tax_paid": 0.0,
+           "exempt_interest_dividends": 0.0},
+          ("total_ordinary_dividends", "qualified_dividends"),
+          ("dividends and distributions", "ordinary dividends", "qualified dividends")),
+    _1099(F1099_R, "retirement",
+          {"gross_distribution": 0.0, "taxable_amount": 0.0, "capital_gain": 0.0,
+           "employee_contributions": 0.0, "distribution_code": None},
+          ("gross_distribution", "taxable_amount"),
+          ("distributions from pensions", "gross distribution", "distribution code")),
+)}
+W2_FORM = FORMS[W2]
+
+
+def get_form(form_type: Optional[str]) -> FormSchema:
+    """The schema of ``form_type``; results parsed before forms were detected are W-2s."""
+    if not form_type:
+        return W2_FORM
+    try:
+        return FORMS[form_type]
+    except KeyError:
+        raise ValueError(f"Unknown form type {form_type!r}") from None
+
+
+def detect_form(txt: str) -> Optional[FormSchema]:
+    """
+    The form whose markers occur most often in ``txt`` (W-2 first on a tie),
+    or None if the text names no known form.
+    """
+    folded = fold(" ".join(txt.split()))
+    best, best_hits = None, 0
+    for form in FORMS.values():
+        hits = sum(marker in folded for marker in form.markers)
+        if hits > best_hits:
+            best, best_hits = form, hits
+    return best
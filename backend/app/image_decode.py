@@ -0,0 +1,143 @@
+"""
+Decode W-2 photos and scans straight to OCR resolution.
+
+Phone photos arrive at 12+ megapixels, several times what tesseract needs.
+The header is read first to estimate the document's DPI; JPEGs are then
+decoded with libjpeg's DCT scaling at 1/2, 1/4 or 1/8 size and straight to
+grayscale, so the full-size RGB bitmap is never built, and whatever is left
+is area-averaged down to the target. EXIF orientation is applied while
+decoding (OpenCV) or to the reduced image (Pillow), never as a separate
+full-size rotation pass.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Tuple
+
+from app.lazy_import import lazy_import
+
+# Loaded on first decode, like the parser's other image libraries
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+logger = logging.getLogger("image_decode")
+
+DEFAULT_TARGET_DPI = 300
+# Long edge of what is photographed: one W-2 form (wide, about 8.5 x 4 in)
+# or a full Letter page of copies (8.5 x 11 in)
+FORM_LONG_EDGE_IN = 8.5
+PAGE_LONG_EDGE_IN = 11.0
+# Images at least this wide for their height are a single form, not a page
+FORM_ASPECT = 1.6
+# Embedded densities below this are camera defaults (72/96), not a scan's DPI
+MIN_SCAN_DPI = 150
+# DCT scaling only halves; land up to this far under the target DPI (240 of
+# 300) if that lets libjpeg skip the work
+DRAFT_SLACK = 0.8
+# Leave images alone that are within this much of the target
+RESIZE_TOLERANCE = 1.05
+
+# OpenCV imread flag for each DCT reduction
+_REDUCED_GRAYSCALE = {1: "IMREAD_GRAYSCALE", 2: "IMREAD_REDUCED_GRAYSCALE_2",
+                      4: "IMREAD_REDUCED_GRAYSCALE_4", 8: "IMREAD_REDUCED_GRAYSCALE_8"}
+
+
+@dataclass
+class DecodeInfo:
+    source_size: Tuple[int, int]
+    size: Tuple[int, int]
+    estimated_dpi: float
+    # DCT scale denominator used while decoding (1 = full size)
+    reduction: int
+    elapsed_ms: float
+
+
+def estimate_dpi(img: "Image.Image") -> float:
+    """
+    The document's resolution in the image: a scanner's embedded density if
+    there is a believable one, otherwise assume the form or page fills the
+    frame along its long edge.
+    """
+    dpi = img.info.get("dpi")
+    if dpi:
+        try:
+            x = float(dpi[0])
+        except (TypeError, ValueError, IndexError):
+            x = 0.0
+        if x >= MIN_SCAN_DPI:
+            return x
+    w, h = img.size
+    long_edge, short_edge = max(w, h), max(1, min(w, h))
+    inches = FORM_LONG_EDGE_IN if long_edge / short_edge >= FORM_ASPECT else PAGE_LONG_EDGE_IN
+    return long_edge / inches
+
+
+def _plan(stream: BinaryIO, target_dpi: int) -> Tuple["Image.Image", float, Tuple[int, int], int]:
+    """Open the image (header only) and work out the target size and DCT reduction."""
+    stream.seek(0)
+    img = Image.open(stream)
+    dpi = estimate_dpi(img)
+    scale = min(1.0, target_dpi / dpi)
+    target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    reduction = 1
+    if img.format == "JPEG":
+        while reduction < 8 and img.width / (reduction * 2) >= target[0] * DRAFT_SLACK:
+            reduction *= 2
+    return img, dpi, target, reduction
+
+
+def _fit(size: Tuple[int, int], target: Tuple[int, int]) -> Tuple[int, int]:
+    # A decoder that applied EXIF orientation may have swapped the axes
+    if (size[0] > size[1]) != (target[0] > target[1]):
+        return target[1], target[0]
+    return target
+
+
+def _log(info: DecodeInfo) -> None:
+    logger.debug("Decoded %s -> %s (est. %s dpi, 1/%d DCT) in %.1fms", info.source_size, info.size,
+                 info.estimated_dpi, info.reduction, info.elapsed_ms)
+
+
+def decode_for_ocr(stream: BinaryIO, target_dpi: int = DEFAULT_TARGET_DPI) -> Tuple["Image.Image", DecodeInfo]:
+    """Decode to an upright 8-bit grayscale ``Image`` at about ``target_dpi`` (never upscaled)."""
+    start = time.perf_counter()
+    img, dpi, target, reduction = _plan(stream, target_dpi)
+    source_size = img.size
+    if reduction > 1:
+        img.draft("L", (source_size[0] // reduction, source_size[1] // reduction))
+    if img.mode != "L":
+        img = img.convert("L")
+    if img.width > target[0] * RESIZE_TOLERANCE:
+        img = img.resize(target, Image.BOX)
+    # Rotating the reduced image is far cheaper than rotating the photo
+    img = ImageOps.exif_transpose(img)
+    info = DecodeInfo(source_size, img.size, round(dpi, 1), reduction,
+                      round((time.perf_counter() - start) * 1000, 2))
+    _log(info)
+    return img, info
+
+
+def decode_array_for_ocr(data: bytes, stream: BinaryIO,
+                         target_dpi: int = DEFAULT_TARGET_DPI) -> Tuple["np.ndarray", DecodeInfo]:
+    """
+    ``decode_for_ocr`` with OpenCV, returning a uint8 array. ``data`` is the
+    encoded image and ``stream`` reads the same bytes (for the header).
+    OpenCV applies EXIF orientation itself.
+    """
+    start = time.perf_counter()
+    img, dpi, target, reduction = _plan(stream, target_dpi)
+    gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), getattr(cv2, _REDUCED_GRAYSCALE[reduction]))
+    if gray is None:
+        raise ValueError("Could not decode image")
+    target = _fit((gray.shape[1], gray.shape[0]), target)
+    if gray.shape[1] > target[0] * RESIZE_TOLERANCE:
+        # INTER_AREA is several times slower for fractional factors above 1/2,
+        # where bilinear barely aliases
+        interpolation = cv2.INTER_AREA if gray.shape[1] >= 2 * target[0] else cv2.INTER_LINEAR
+        gray = cv2.resize(gray, target, interpolation=interpolation)
+    info = DecodeInfo(img.size, (gray.shape[1], gray.shape[0]), round(dpi, 1), reduction,
+                      round((time.perf_counter() - start) * 1000, 2))
+    _log(info)
+    return gray, info
@@ -0,0 +1,126 @@
+"""
+Persist parsed W-2s and 1099s as IncomeRecord rows.
+
+A whole upload or batch is written with one multi-row INSERT in a single
+transaction. A form is stored once per tax return: rows are keyed by
+(tax_return_id, SHA-256 of the uploaded file, position of the form in the
+file), repeats within the batch and rows already stored are skipped, and
+the unique constraint on that key drops any row a concurrent request
+stored first.
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.errors import TaxReturnNotFoundError
+from app.form_schemas import W2, get_form
+from app.models import IncomeRecord, IncomeType, TaxReturn
+
+logger = logging.getLogger("income_records")
+
+# (parsed form, SHA-256 of the file it came from, position of the form in that file)
+ParsedForm = Tuple[Dict[str, Any], str, int]
+SourceKey = Tuple[str, int]
+
+# Dialects whose INSERT can skip rows that break the unique constraint
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+SOURCE_KEY = ("tax_return_id", "source_sha256", "source_index")
+
+
+def income_record_row(parsed: Dict[str, Any], tax_return_id: int, sha256: str, index: int = 0) -> Dict[str, Any]:
+    """IncomeRecord column values for one parsed form."""
+    form = get_form(parsed.get("form_type"))
+    row = {
+        "tax_return_id": tax_return_id,
+        "income_type": IncomeType(form.income_type),
+        "amount": parsed.get(form.amount_field) or 0.0,
+        "payer_name": parsed.get(form.payer_field),
+        "payer_ein": parsed.get("employer_ein" if form.form_type == W2 else "payer_tin"),
+        "federal_withholding": parsed.get("federal_withholding") or 0.0,
+        "state_withholding": parsed.get("state_withholding") or 0.0,
+        "source_sha256": sha256,
+        "source_index": index,
+        # Every row has every column so the batch is a single executemany
+        "wages_tips": None, "social_security_wages": None, "medicare_wages": None,
+        "nonemployee_compensation": None,
+    }
+    if form.form_type == W2:
+        row.update(wages_tips=parsed.get("wages"), social_security_wages=parsed.get("social_security_wages"),
+                   medicare_wages=parsed.get("medicare_wages"))
+    elif "nonemployee_compensation" in form.defaults:
+        row["nonemployee_compensation"] = parsed.get("nonemployee_compensation")
+    return row
+
+
+class IncomeRecordStore:
+    """Bulk, deduplicating writer of parsed forms into ``income_records``."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.sessions = sessionmaker(bind=engine)
+        self._lock = threading.Lock()
+        self._inserted = 0
+        self._duplicates = 0
+        self._batches = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "IncomeRecordStore":
+        # SQLite connections are shared by the threads uploads are saved from
+        connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
+        return cls(create_engine(settings.database_url, connect_args=connect_args, pool_pre_ping=True))
+
+    def tax_return_exists(self, tax_return_id: int) -> bool:
+        with self.sessions() as session:
+            return session.get(TaxReturn, tax_return_id) is not None
+
+    def _stored(self, session: Session, tax_return_id: int, hashes: Set[str]) -> Set[SourceKey]:
+        rows = session.execute(select(IncomeRecord.source_sha256, IncomeRecord.source_index)
+                               .where(IncomeRecord.tax_return_id == tax_return_id,
+                                      IncomeRecord.source_sha256.in_(hashes)))
+        return {(sha256, index) for sha256, index in rows}
+
+    def _insert(self):
+        upsert = UPSERT_INSERTS.get(self.engine.dialect.name)
+        if upsert is None:
+            return insert(IncomeRecord)
+        return upsert(IncomeRecord).on_conflict_do_nothing(index_elements=list(SOURCE_KEY))
+
+    def save(self, tax_return_id: int, forms: Sequence[ParsedForm]) -> Dict[str, int]:
+        """
+        Store ``forms`` on a tax return in one transaction; returns how many
+        rows were inserted and how many were duplicates. Blocking: call it
+        from a worker thread.
+        """
+        rows: List[Dict[str, Any]] = []
+        seen: Set[SourceKey] = set()
+        with self.sessions() as session, session.begin():
+            if session.get(TaxReturn, tax_return_id) is None:
+                raise TaxReturnNotFoundError(tax_return_id)
+            stored = self._stored(session, tax_return_id, {sha256 for _, sha256, _ in forms})
+            for parsed, sha256, index in forms:
+                row = income_record_row(parsed, tax_return_id, sha256, index)
+                key = (sha256, index)
+                if key in seen or key in stored:
+                    continue
+                seen.add(key)
+                rows.append(row)
+            if rows:
+                # One Core executemany in the session's transaction (the ORM's bulk insert
+                # would split the rows by which columns are None)
+                session.connection().execute(self._insert(), rows)
+        duplicates = len(forms) - len(rows)
+        with self._lock:
+            self._batches += 1
+            self._inserted += len(rows)
+            self._duplicates += duplicates
+        logger.info("Saved %d income records to tax return %d (%d duplicates)", len(rows), tax_return_id,
+                    duplicates)
+        return {"inserted": len(rows), "duplicates": duplicates}
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self._batches, "inserted": self._inserted, "duplicates": self._duplicates}
@@ -0,0 +1,52 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+_MISSING = object()
+
+
+class LazyModule:
+    """
+    Stand-in for an optional module that is imported on first attribute
+    access. It is falsy if the module isn't installed, so the usual
+    ``if not pdfplumber:`` checks keep working without importing anything
+    at module import time.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Any = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[ModuleType]:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    try:
+                        self._module = importlib.import_module(self._name)
+                    except ImportError:
+                        self._module = _MISSING
+        return None if self._module is _MISSING else self._module
+
+    @property
+    def loaded(self) -> bool:
+        """Imported successfully; never triggers the import itself."""
+        return self._module not in (None, _MISSING)
+
+    def __bool__(self) -> bool:
+        return self.load() is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self.load()
+        if module is None:
+            raise ImportError(f"{self._name} not installed")
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "missing" if self._module is _MISSING else "not loaded"
+        return f"<lazy module {self._name} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -65,12 +65,13 @@ class Dependent(Base):
     last_name = Column(String)
     ssn = Column(String)
     date_of_birth = Column(DateTime)
-    relationship = Column(String)
     months_lived_with_taxpayer = Column(Integer)
     is_student = Column(Boolean, default=False)
     is_disabled = Column(Boolean, default=False)
 
     user = relationship("User", back_populates="dependents")
+    # Declared after ``user``: in the class body this name shadows sqlalchemy's relationship()
+    relationship = Column(String)
 
 class Business(Base):
     __tablename__ = "businesses"
@@ -129,6 +130,10 @@ class TaxReturn(Base):
 
 class IncomeRecord(Base):
     __tablename__ = "income_records"
+    # One row per parsed form: the form at the same position of the same file is never stored
+    # twice. Records entered by hand have no source, and NULLs never conflict
+    __table_args__ = (UniqueConstraint("tax_return_id", "source_sha256", "source_index",
+                                       name="uq_income_records_source"),)
 
     id = Column(Integer, primary_key=True, index=True)
     tax_return_id = Column(Integer, ForeignKey("tax_returns.id"))
@@ -147,6 +152,12 @@ class IncomeRecord(Base):
     # 1099 specific fields
     nonemployee_compensation = Column(Float, nullable=True)
 
+    # SHA-256 of the uploaded file the record was parsed from, and the form's position in it
+    # (a split PDF holds one W-2 per employee); None if entered by hand
+    # (migrations/versions/0001_income_record_sources.py)
+    source_sha256 = Column(String(64), nullable=True, index=True)
+    source_index = Column(Integer, nullable=True)
+
     tax_return = relationship("TaxReturn", back_populates="income_records")
 
 class DeductionRecord(Base):
@@ -0,0 +1,152 @@
+import abc
+import logging
+import os
+import queue
+import shlex
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.errors import W2ParseError
+from app.lazy_import import lazy_import
+
+# Loaded on first use: pytesseract pulls in PIL and numpy
+pytesseract = lazy_import("pytesseract")
+tesserocr = lazy_import("tesserocr")
+
+logger = logging.getLogger("ocr")
+
+
+def limit_omp_threads(threads: int) -> None:
+    """
+    Cap tesseract's OpenMP threads for this process and its children. Must run
+    before libtesseract is loaded: ParsePool calls it before starting workers
+    (forked workers inherit the environment) and in each worker's initializer.
+    """
+    os.environ["OMP_THREAD_LIMIT"] = str(max(1, threads))
+
+
+def parse_config(config: str) -> Tuple[Optional[int], Dict[str, str]]:
+    """Split a tesseract CLI config string into (psm, {variable: value})."""
+    psm: Optional[int] = None
+    variables: Dict[str, str] = {}
+    args = shlex.split(config)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--psm' and i + 1 < len(args):
+            psm = int(args[i + 1])
+            i += 1
+        elif arg == '--dpi' and i + 1 < len(args):
+            variables['user_defined_dpi'] = args[i + 1]
+            i += 1
+        elif arg == '-c' and i + 1 < len(args):
+            key, _, value = args[i + 1].partition('=')
+            variables[key] = value
+            i += 1
+        i += 1
+    return psm, variables
+
+
+class OCRBackend(abc.ABC):
+    """Turns a preprocessed page (PIL image or uint8 array) into text."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def image_to_string(self, img: Any, config: str = '') -> str:
+        """Text of ``img``; ``config`` takes tesseract CLI options (--psm, -c var=value)."""
+
+    def close(self) -> None:
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """Runs the tesseract CLI once per call; slow to start but always available."""
+
+    name = "pytesseract"
+
+    def __init__(self):
+        if not pytesseract:
+            raise W2ParseError('pytesseract not installed')
+
+    def image_to_string(self, img: Any, config: str = '') -> str:
+        return pytesseract.image_to_string(img, config=config)
+
+
+class TesserocrPoolBackend(OCRBackend):
+    """
+    A fixed pool of long-lived tesseract engines (via tesserocr) that keep the
+    language data loaded between calls. Callers borrow an engine per call, so
+    up to ``size`` threads can OCR concurrently in one process.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, size: int = 1, lang: str = 'eng'):
+        if not tesserocr:
+            raise W2ParseError('tesserocr not installed')
+        self.size = max(1, size)
+        self.lang = lang
+        self._idle: "queue.Queue" = queue.Queue()
+        self._engines: List[Any] = []
+        self._lock = threading.Lock()
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._engines) < self.size:
+                engine = tesserocr.PyTessBaseAPI(lang=self.lang)
+                self._engines.append(engine)
+                return engine
+        return self._idle.get()
+
+    def image_to_string(self, img: Any, config: str = '') -> str:
+        psm, variables = parse_config(config)
+        engine = self._borrow()
+        previous = {key: engine.GetVariableAsString(key) for key in variables}
+        try:
+            engine.SetPageSegMode(tesserocr.PSM(psm) if psm is not None else tesserocr.PSM.AUTO)
+            for key, value in variables.items():
+                engine.SetVariable(key, value)
+            if hasattr(img, 'shape'):
+                h, w = img.shape[:2]
+                channels = 1 if img.ndim == 2 else img.shape[2]
+                data = img.tobytes() if img.flags['C_CONTIGUOUS'] else img.copy().tobytes()
+                engine.SetImageBytes(data, w, h, channels, w * channels)
+            else:
+                engine.SetImage(img)
+            return engine.GetUTF8Text()
+        finally:
+            # Variables stick to the engine; restore them before it is reused
+            for key, value in previous.items():
+                if value is not None:
+                    engine.SetVariable(key, value)
+            engine.Clear()
+            self._idle.put(engine)
+
+    def close(self) -> None:
+        with self._lock:
+            for engine in self._engines:
+                engine.End()
+            self._engines = []
+
+
+_backend: Optional[OCRBackend] = None
+
+
+def get_ocr_backend() -> OCRBackend:
+    """Process-wide OCR backend chosen by TAX_W2_OCR_BACKEND (auto|tesserocr|pytesseract)."""
+    global _backend
+    if _backend is None:
+        from app.config import get_settings
+        settings = get_settings()
+        choice = settings.w2_ocr_backend
+        if choice == 'tesserocr' or (choice == 'auto' and tesserocr):
+            _backend = TesserocrPoolBackend(size=settings.w2_ocr_engines or settings.w2_zonal_threads)
+        else:
+            _backend = PytesseractBackend()
+        logger.info("Using OCR backend %s", _backend.name)
+    return _backend
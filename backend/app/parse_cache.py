@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("parse_cache")
+
+CacheValue = Tuple[Dict[str, Any], str]
+
+
+def cache_key(digest: str, parser_version: str, content_type: str = '') -> str:
+    """Cache key for an upload: parser version + declared type + SHA-256 of the bytes."""
+    kind = content_type.replace('/', '_') or 'unknown'
+    return f"v{parser_version}-{kind}-{digest}"
+
+
+class ParseCache:
+    """
+    Two-tier cache of ``(parsed_data, file_type)`` results keyed by file hash.
+
+    The memory tier is a plain LRU. The optional disk tier stores one JSON
+    file per key under ``directory`` and evicts least-recently-used files once
+    their total size exceeds ``max_disk_bytes``. Only the memory tier is
+    touched on the event loop; disk reads, writes and eviction run in a thread.
+    """
+
+    def __init__(self, max_entries: int = 256, directory: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, CacheValue]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    @classmethod
+    def from_settings(cls, settings) -> "ParseCache":
+        return cls(max_entries=settings.w2_cache_entries,
+                   directory=settings.w2_cache_dir,
+                   max_disk_bytes=settings.w2_cache_max_bytes)
+
+    async def get(self, key: str) -> Optional[CacheValue]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return dict(value[0]), value[1]
+
+        value = await asyncio.to_thread(self._disk_get, key) if self.directory else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_put(key, value)
+        return dict(value[0]), value[1]
+
+    async def put(self, key: str, parsed: Dict[str, Any], file_type: str) -> None:
+        value = (dict(parsed), file_type)
+        with self._lock:
+            self._memory_put(key, value)
+        if self.directory:
+            await asyncio.to_thread(self._disk_put, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _memory_put(self, key: str, value: CacheValue) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _disk_entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                st = entry.stat()
+                yield entry.path, st.st_mtime, st.st_size
+
+    def _disk_get(self, key: str) -> Optional[CacheValue]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r') as fh:
+                payload = json.load(fh)
+            os.utime(path)  # mtime doubles as the LRU clock for eviction
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", path, e)
+            self._disk_remove(path)
+            return None
+        return payload["parsed_data"], payload["file_type"]
+
+    def _disk_put(self, key: str, value: CacheValue) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as fh:
+                json.dump({"parsed_data": value[0], "file_type": value[1]}, fh)
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk_bytes += os.path.getsize(path) - old
+        except OSError as e:
+            logger.warning("Could not write cache entry %s: %s", path, e)
+            return
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _disk_remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _evict_disk(self) -> None:
+        for path, _, _ in sorted(self._disk_entries(), key=lambda e: e[1]):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._disk_remove(path)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import mmap
+import re
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from app.errors import W2ParseError
+from app.parse_pool import ParsePool, parse_w2, parse_w2_segment, read_w2_pages
+from app.form_schemas import get_form
+from app.w2_split import merge_instances, segment_pages
+
+logger = logging.getLogger("parse_lanes")
+
+FAST, SLOW = "fast", "slow"
+
+_FONT_RE = re.compile(rb"/Font\b")
+_OBJSTM_RE = re.compile(rb"/Type\s*/ObjStm")
+# How much of each compressed object stream to inflate when looking for fonts
+OBJSTM_PEEK = 256 * 1024
+# Pages one worker reads per task when splitting a multi-W-2 PDF
+SPLIT_PAGE_CHUNK = 8
+
+
+def pdf_has_text_layer(buf: Union[bytes, mmap.mmap]) -> bool:
+    """
+    Cheap text-layer check: a page with text references a font resource. The
+    raw bytes are scanned first; PDF 1.5+ files may keep their resource
+    dictionaries in compressed object streams, so those are inflated too.
+    """
+    if _FONT_RE.search(buf):
+        return True
+    for m in _OBJSTM_RE.finditer(buf):
+        start = buf.find(b"stream", m.end())
+        if start < 0:
+            continue
+        start += len(b"stream")
+        while buf[start:start + 1] in (b"\r", b"\n"):
+            start += 1
+        try:
+            data = zlib.decompressobj().decompress(buf[start:start + OBJSTM_PEEK], OBJSTM_PEEK * 8)
+        except zlib.error:
+            continue
+        if _FONT_RE.search(data):
+            return True
+    return False
+
+
+@contextmanager
+def _peek(source: Union[str, bytes]) -> Iterator[Union[bytes, mmap.mmap]]:
+    if isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+    with open(source, 'rb') as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+class ParseScheduler:
+    """
+    Routes W-2 and 1099 parses to two independent ParsePools so cheap work never
+    queues behind OCR: the fast lane takes PDFs with a text layer, the slow
+    lane takes images and scanned PDFs.
+
+    Fast-lane parses skip the OCR tiers. If the text layer turns out not to
+    be good enough (a checked field below ``min_confidence``), the upload
+    is parsed again in the slow lane.
+    """
+
+    def __init__(self, fast: ParsePool, slow: ParsePool, min_confidence: float = 0.8):
+        self.lanes: Dict[str, ParsePool] = {FAST: fast, SLOW: slow}
+        self.min_confidence = min_confidence
+        self._routed = {FAST: 0, SLOW: 0}
+        self._escalated = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "ParseScheduler":
+        fast = ParsePool(max_workers=settings.w2_fast_workers, max_queue=settings.w2_fast_queue_size,
+                         retry_after=settings.w2_parse_retry_after, omp_threads=1, warm=settings.w2_warm_up)
+        return cls(fast, ParsePool.from_settings(settings), settings.w2_min_confidence)
+
+    async def classify(self, source: Union[str, bytes], content_type: str) -> str:
+        """The upload's lane. PDFs are scanned (and object streams inflated) in a thread."""
+        if content_type != 'application/pdf':
+            return SLOW
+        return await asyncio.to_thread(self._classify_pdf, source)
+
+    def _classify_pdf(self, source: Union[str, bytes]) -> str:
+        try:
+            with _peek(source) as buf:
+                return FAST if pdf_has_text_layer(buf) else SLOW
+        except (OSError, ValueError):
+            # Unreadable or empty: let the slow lane's full parse report it
+            return SLOW
+
+    def _needs_ocr(self, parsed: Dict[str, Any]) -> bool:
+        confidence = parsed.get("confidence") or {}
+        checked = get_form(parsed.get("form_type")).checked_fields
+        return any(confidence.get(f, 0.0) < self.min_confidence for f in checked)
+
+    async def _submit(self, lane: str, wait: bool, fn: Callable, *args) -> Any:
+        pool = self.lanes[lane]
+        return await (pool.run_when_free(fn, *args) if wait else pool.run(fn, *args))
+
+    async def run(self, source: Union[str, bytes], content_type: str, fn: Callable = parse_w2,
+                  prefix: tuple = (), wait: bool = False, lane: Optional[str] = None,
+                  tenant: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Parse in the upload's lane (``classify`` unless given) with
+        ``fn(*prefix, source, content_type, text_only, tenant)``. ``wait``
+        queues for a free slot instead of raising ParseQueueFullError.
+        """
+        lane = lane or await self.classify(source, content_type)
+        self._routed[lane] += 1
+        if lane == FAST:
+            try:
+                parsed, file_type = await self._submit(FAST, wait, fn, *prefix, source, content_type, True, tenant)
+                if not self._needs_ocr(parsed):
+                    return parsed, file_type
+            except W2ParseError as e:
+                logger.info("Text-layer parse failed, retrying with OCR: %s", e)
+            self._escalated += 1
+        return await self._submit(SLOW, wait, fn, *prefix, source, content_type, False, tenant)
+
+    async def run_all(self, source: Union[str, bytes], content_type: str,
+                      wait: bool = False, tenant: Optional[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Parse every W-2 in an upload. PDFs are read in page chunks across the
+        lane's workers, split into one segment per employee and the segments
+        parsed in parallel (each escalating to OCR on its own); see
+        W2Parser.parse_all for the single-process equivalent. ``tenant`` is
+        passed on to every parse, as in ``run``.
+        """
+        lane = await self.classify(source, content_type)
+        if content_type != 'application/pdf':
+            parsed, file_type = await self.run(source, content_type, wait=wait, lane=lane, tenant=tenant)
+            return [{**parsed, "pages": [1]}], file_type
+        # The first chunk also tells us the page count; it alone is subject to admission control
+        reads, total = await self._submit(lane, wait, read_w2_pages, source, 0, SPLIT_PAGE_CHUNK)
+        chunks = await asyncio.gather(*(
+            self._submit(lane, True, read_w2_pages, source, start, start + SPLIT_PAGE_CHUNK)
+            for start in range(SPLIT_PAGE_CHUNK, total, SPLIT_PAGE_CHUNK)))
+        for more, _ in chunks:
+            reads += more
+        segments = segment_pages(reads)
+        if not segments:
+            raise W2ParseError('PDF has no pages')
+        results = await asyncio.gather(*(
+            self.run(source, content_type, parse_w2_segment, (segment,), wait=True, lane=lane, tenant=tenant)
+            for segment in segments))
+        return merge_instances([parsed for parsed, _ in results]), 'pdf'
+
+    async def warm_up(self) -> Dict[str, List[Dict[str, float]]]:
+        """Warm every lane's workers (ParsePool.warm_up); cheap once they are warm."""
+        timings = await asyncio.gather(*(pool.warm_up() for pool in self.lanes.values()))
+        return dict(zip(self.lanes, timings))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**{lane: pool.stats() for lane, pool in self.lanes.items()},
+                "routed": dict(self._routed), "escalated": self._escalated}
+
+    def shutdown(self) -> None:
+        for pool in self.lanes.values():
+            pool.shutdown()
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.errors import ParseQueueFullError, ParseWorkerError
+from app.ocr import limit_omp_threads
+from app.tracing import Span, merge, record, tracing
+
+logger = logging.getLogger("parse_pool")
+
+_worker_parser = None
+_warm_timings: Optional[Dict[str, float]] = None
+
+
+def _get_parser():
+    global _worker_parser
+    if _worker_parser is None:
+        from app.w2_parser import W2Parser
+        _worker_parser = W2Parser()
+    return _worker_parser
+
+
+def parse_w2(source: Union[str, bytes], content_type: str = '', text_only: bool = False,
+             tenant: Optional[str] = None,
+             progress: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, Any], str]:
+    """Parse a W-2 (path or raw bytes) inside a pool worker, reusing one parser per process."""
+    return _get_parser().parse_file(source, content_type, progress, text_only, tenant=tenant)
+
+
+def read_w2_pages(source: Union[str, bytes], start: int = 0, stop: Optional[int] = None):
+    """Read a span of a multi-W-2 PDF's pages for splitting (W2Parser.read_pages)."""
+    return _get_parser().read_pages(source, start, stop)
+
+
+def parse_w2_segment(segment, source: Union[str, bytes], content_type: str = '',
+                     text_only: bool = False, tenant: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Parse one W-2 instance of a split PDF; call shape matches ``parse_w2``
+    after the segment. PDF pages don't use the OCR cache, so ``tenant`` is unused.
+    """
+    return _get_parser().parse_segment(source, segment, text_only=text_only), 'pdf'
+
+
+def warm_up_worker() -> Dict[str, float]:
+    """Warm this worker's parser once (W2Parser.warm_up); later calls return the first timings."""
+    global _warm_timings
+    if _warm_timings is None:
+        _warm_timings = _get_parser().warm_up()
+    return _warm_timings
+
+
+def _init_worker(omp_threads: int, warm: bool) -> None:
+    limit_omp_threads(omp_threads)
+    if warm:
+        warm_up_worker()
+
+
+def _timed_call(fn: Callable, args: tuple) -> Tuple[float, List[Span], Any, Optional[BaseException]]:
+    """Run in the worker: (start time, the task's spans, result, exception raised)."""
+    started = time.time()
+    with tracing() as trace:
+        try:
+            result = fn(*args)
+        except Exception as e:
+            return started, trace.spans, None, e
+    return started, trace.spans, result, None
+
+
+class ParsePool:
+    """
+    Bounded process pool for CPU-heavy parsing.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more
+    may wait for a worker; anything beyond that is rejected immediately with
+    ParseQueueFullError so the event loop never blocks on parsing. Batch
+    callers use ``run_when_free`` instead and wait in line for a slot.
+
+    With ``warm`` each worker process loads the parser's libraries and runs
+    a tiny OCR as soon as it starts; ``warm_up`` starts the workers now.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, retry_after: int = 5,
+                 omp_threads: int = 1, window: int = 1000, warm: bool = False):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.omp_threads = omp_threads
+        self.warm = warm
+        self.warm_timings: Optional[List[Dict[str, float]]] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=window)
+        # run_when_free callers waiting for a slot, first come first served
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    @classmethod
+    def from_settings(cls, settings) -> "ParsePool":
+        return cls(max_workers=settings.w2_parse_workers,
+                   max_queue=settings.w2_parse_queue_size,
+                   retry_after=settings.w2_parse_retry_after,
+                   omp_threads=settings.w2_ocr_omp_threads,
+                   warm=settings.w2_warm_up)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Workers x OpenMP threads should not exceed the cores we have. Set before the
+            # workers are forked too, in case anything loads libtesseract on import
+            limit_omp_threads(self.omp_threads)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.omp_threads, self.warm))
+        return self._executor
+
+    async def warm_up(self) -> List[Dict[str, float]]:
+        """Start the workers and wait until they are warm; returns each one's warm-up timings."""
+        if self.warm_timings is None:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            self.warm_timings = list(await asyncio.gather(
+                *(loop.run_in_executor(executor, warm_up_worker) for _ in range(self.max_workers))))
+        return self.warm_timings
+
+    @property
+    def _full(self) -> bool:
+        return self._pending >= self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run ``fn(*args)`` in a worker process, or reject if the pool is saturated."""
+        if self._full:
+            self._rejected += 1
+            raise ParseQueueFullError(self.retry_after)
+
+        self._pending += 1
+        submitted = time.time()
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            started, spans, result, error = await loop.run_in_executor(executor, _timed_call, fn, args)
+            record("queue_wait", max(0.0, started - submitted) * 1000)
+            merge(spans)
+            if error is not None:
+                raise error
+        except BrokenProcessPool as e:
+            # A worker died (OOM, segfault in a native lib); start fresh next time. Every
+            # call on the broken executor lands here, only the first replaces it
+            self._failed += 1
+            if self._executor is executor:
+                logger.error("Parse pool broken, recreating executor")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.warm_timings = None
+            raise ParseWorkerError("Parse worker process died") from e
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+            self._wake()
+
+        self._waits.append(max(0.0, started - submitted))
+        self._completed += 1
+        return result
+
+    async def run_when_free(self, fn: Callable, *args) -> Any:
+        """Like ``run``, but wait in line for a free slot instead of being rejected (batch jobs)."""
+        # Join the back of the line; once woken, a caller whose slot was taken keeps its place
+        first = True
+        while self._full or (first and self._waiters):
+            waiter = asyncio.get_running_loop().create_future()
+            if first:
+                self._waiters.append(waiter)
+            else:
+                self._waiters.appendleft(waiter)
+            first = False
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    # Woken but leaving: hand the slot to the next in line
+                    self._wake()
+                raise
+        return await self.run(fn, *args)
+
+    def _wake(self) -> None:
+        """Wake the first run_when_free caller still waiting."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2)
+
+        return {
+            "workers": self.max_workers,
+            "queue_capacity": self.max_queue,
+            "in_flight": min(self._pending, self.max_workers),
+            "queue_depth": max(0, self._pending - self.max_workers),
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "wait_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": pct(1.0)},
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
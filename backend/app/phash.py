@@ -0,0 +1,203 @@
+"""
+Perceptual-hash cache of OCR text, so a W-2 photographed again reuses the
+text read from the first photo.
+
+Candidates are found by a 16x16 difference hash (256 bits) of the
+preprocessed image cropped to its content, indexed with multi-index
+hashing: the hash is split into ``max_distance + 1`` chunks, and any hash
+within that Hamming distance matches the query exactly on at least one
+chunk, so only entries sharing a chunk are compared. Unlike a BK-tree,
+entries are removed as cheaply as they are added, which LRU eviction needs.
+
+Every W-2 is printed on the same template, so two people's forms hash as
+close as two photos of one form. Entries are therefore kept apart per
+tenant (the tax return the upload belongs to), so one taxpayer's text is
+never offered for another's image, and a candidate is only reused after
+verification: the photos are registered with ORB features and a homography,
+and any patch with ink in one and not the other (a different digit) rejects
+the match. Cached entries keep only a bit-packed ink map (~250 KB) and the
+features, not the image.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# Rows/columns with less ink than this are margin, not content (ignores specks)
+MIN_INK_FRACTION = 0.002
+# Verification: photos are compared at this long edge, registered with this many
+# ORB features and need this many RANSAC inliers to count as the same page
+VERIFY_LONG_EDGE = 1600
+ORB_FEATURES = 2000
+MIN_INLIERS = 20
+# Ink within this many pixels of ink in the other photo matches it
+INK_TOLERANCE = 3
+# The largest fraction of unmatched ink in any patch: re-encoded or resized
+# copies of one photo score up to ~0.07 and most re-photos under 0.1, while a
+# form one SSN digit apart scores 0.15 and up
+PATCH = 16
+MAX_MISMATCH = 0.1
+# Nearest candidates verified per lookup
+MAX_VERIFY = 3
+
+
+@dataclass
+class Fingerprint:
+    hash: int
+    # Ink of the thumbnail, one bit per pixel, and the thumbnail's width
+    ink: np.ndarray
+    width: int
+    points: np.ndarray
+    descriptors: Optional[np.ndarray]
+    # Only kept while the image is being looked up (to register it onto entries)
+    thumb: Optional[np.ndarray] = None
+
+    def ink_mask(self) -> np.ndarray:
+        return np.unpackbits(self.ink, axis=1, count=self.width) * np.uint8(255)
+
+
+def _trim(gray: np.ndarray) -> np.ndarray:
+    ink = gray < 128
+    rows = np.flatnonzero(ink.mean(axis=1) > MIN_INK_FRACTION)
+    cols = np.flatnonzero(ink.mean(axis=0) > MIN_INK_FRACTION)
+    if len(rows) < 2 or len(cols) < 2:
+        return gray
+    return gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def dhash(gray: np.ndarray, size: int = HASH_SIZE) -> int:
+    """Difference hash of a grayscale array: whether each cell is brighter than its right neighbour."""
+    small = cv2.resize(_trim(gray), (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def fingerprint(gray: np.ndarray) -> Fingerprint:
+    """The hash plus what verification needs: a thumbnail and its ORB features."""
+    scale = VERIFY_LONG_EDGE / max(gray.shape[:2])
+    thumb = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    keypoints, descriptors = cv2.ORB_create(ORB_FEATURES).detectAndCompute(thumb, None)
+    points = np.float32([k.pt for k in keypoints]).reshape(-1, 2)
+    ink = np.packbits(_ink(thumb) > 0, axis=1)
+    return Fingerprint(dhash(gray), ink, thumb.shape[1], points, descriptors, thumb)
+
+
+def _ink(gray: np.ndarray) -> np.ndarray:
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+
+def mismatch(a: Fingerprint, b: Fingerprint) -> float:
+    """
+    Largest fraction of unmatched ink in any patch once the image of ``b``
+    (a lookup, with its thumbnail) is registered onto ``a`` (1.0 if it can't be).
+    """
+    if a.descriptors is None or b.descriptors is None or b.thumb is None:
+        return 1.0
+    matches = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True).match(b.descriptors, a.descriptors)
+    if len(matches) < MIN_INLIERS:
+        return 1.0
+    src = b.points[[m.queryIdx for m in matches]]
+    dst = a.points[[m.trainIdx for m in matches]]
+    H, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 3.0)
+    if H is None or int(inliers.sum()) < MIN_INLIERS:
+        return 1.0
+    ink_a = a.ink_mask()
+    h, w = ink_a.shape
+    ink_b = _ink(cv2.warpPerspective(b.thumb, H, (w, h), borderValue=255))
+    kernel = np.ones((INK_TOLERANCE, INK_TOLERANCE), np.uint8)
+    unmatched = (cv2.bitwise_and(ink_a, cv2.bitwise_not(cv2.dilate(ink_b, kernel)))
+                 | cv2.bitwise_and(ink_b, cv2.bitwise_not(cv2.dilate(ink_a, kernel))))
+    patches = cv2.resize((unmatched > 0).astype(np.float32), (max(1, w // PATCH), max(1, h // PATCH)),
+                         interpolation=cv2.INTER_AREA)
+    return float(patches.max())
+
+
+class OCRCache:
+    """
+    LRU of OCR text per tenant and image. ``get`` returns the texts of the
+    nearest verified near-duplicate the same tenant stored within
+    ``max_distance`` hash bits. Texts are plain dicts the parser fills in
+    (full-page text, zone texts). Chunks are ``HASH_BITS / (max_distance + 1)``
+    bits wide, so a large distance makes them too narrow to prune candidates.
+    """
+
+    def __init__(self, max_entries: int = 64, max_distance: int = 16, bits: int = HASH_BITS):
+        self.max_entries = max_entries
+        self.max_distance = max(0, min(max_distance, bits - 1))
+        chunks = self.max_distance + 1
+        # (shift, mask) of each chunk, spreading the remainder bits over the first ones
+        self._chunks: List[Tuple[int, int]] = []
+        start = 0
+        for i in range(chunks):
+            width = bits // chunks + (1 if i < bits % chunks else 0)
+            self._chunks.append((start, (1 << width) - 1))
+            start += width
+        # Chunk tables map (tenant, chunk value) to the tenant's hashes sharing it
+        self._tables: List[Dict[Tuple[str, int], Set[int]]] = [{} for _ in self._chunks]
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[Fingerprint, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "OCRCache":
+        return cls(max_entries=settings.w2_ocr_cache_entries, max_distance=settings.w2_ocr_cache_distance)
+
+    def _keys(self, tenant: str, h: int) -> List[Tuple[str, int]]:
+        return [(tenant, (h >> shift) & mask) for shift, mask in self._chunks]
+
+    def candidates(self, tenant: str, h: int) -> List[Tuple[int, int]]:
+        """``tenant``'s stored hashes within ``max_distance`` of ``h`` as (distance, hash), nearest first."""
+        with self._lock:
+            found: Set[int] = set()
+            for table, key in zip(self._tables, self._keys(tenant, h)):
+                found |= table.get(key, set())
+        return sorted(d for d in ((hamming(h, c), c) for c in found) if d[0] <= self.max_distance)
+
+    def get(self, tenant: str, fp: Fingerprint) -> Optional[Dict[str, Any]]:
+        for _, h in self.candidates(tenant, fp.hash)[:MAX_VERIFY]:
+            with self._lock:
+                entry = self._entries.get((tenant, h))
+            if entry is None:
+                continue
+            if mismatch(entry[0], fp) > MAX_MISMATCH:
+                self.rejected += 1
+                continue
+            with self._lock:
+                if (tenant, h) in self._entries:
+                    self._entries.move_to_end((tenant, h))
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, tenant: str, fp: Fingerprint, texts: Dict[str, Any]) -> None:
+        if self.max_entries <= 0 or not texts:
+            return
+        with self._lock:
+            if (tenant, fp.hash) not in self._entries:
+                for table, key in zip(self._tables, self._keys(tenant, fp.hash)):
+                    table.setdefault(key, set()).add(fp.hash)
+            self._entries[tenant, fp.hash] = replace(fp, thumb=None), texts
+            self._entries.move_to_end((tenant, fp.hash))
+            while len(self._entries) > self.max_entries:
+                (owner, old), _ = self._entries.popitem(last=False)
+                for table, key in zip(self._tables, self._keys(owner, old)):
+                    bucket = table[key]
+                    bucket.discard(old)
+                    if not bucket:
+                        del table[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "rejected": self.rejected}
@@ -1,30 +1,157 @@
+import asyncio
+from typing import List, Optional
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from fastapi.responses import JSONResponse
-import shutil, os, logging
-from tempfile import NamedTemporaryFile
-from app.w2_parser import W2Parser
-from app.errors import UnsupportedFileTypeError, W2ParseError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import logging
+from app.config import get_settings
+from app.income_records import IncomeRecordStore
+from app.parse_cache import ParseCache, cache_key
+from app.parse_lanes import ParseScheduler
+from app.scratch import ScratchSpace
+from app.upload_spool import spool_upload
+from app.w2_batch import ALLOWED_TYPES, collect_batch, stream_batch
+from app.w2_jobs import JobRunner, public_job
+from app.w2_parser import PARSER_VERSION
+from app.tracing import STAGE_SECONDS
+from app.errors import (BatchTooLargeError, ParseQueueFullError, ParseWorkerError, ScratchQuotaError,
+                        TaxReturnNotFoundError, UnsupportedFileTypeError, UploadTooLargeError, W2ParseError)
 
 router = APIRouter(prefix="/w2", tags=["w2"])
 logger = logging.getLogger("w2")
-parser = W2Parser()
+parse_scheduler = ParseScheduler.from_settings(get_settings())
+parse_cache = ParseCache.from_settings(get_settings())
+scratch_space = ScratchSpace.from_settings(get_settings())
+job_runner = JobRunner.from_settings(get_settings(), parse_scheduler, parse_cache)
+income_store = IncomeRecordStore.from_settings(get_settings())
 
-ALLOWED_TYPES = {"application/pdf", "image/png", "image/jpeg"}
+def _scratch_full(e: ScratchQuotaError) -> HTTPException:
+    logger.warning("W2 scratch space full: %s", scratch_space.stats())
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="W-2 upload space is full, please retry",
+                         headers={"Retry-After": str(e.retry_after)})
+
+async def _check_tax_return(tax_return_id: Optional[int]) -> None:
+    """404 before any parsing if forms are to be saved to a tax return that doesn't exist."""
+    if tax_return_id is not None and not await asyncio.to_thread(income_store.tax_return_exists, tax_return_id):
+        raise HTTPException(status_code=404, detail=f"Tax return {tax_return_id} not found")
+
+async def _ingest(file: UploadFile):
+    """Spool an upload after sniffing its type; the sniffed type is ``upload.content_type``."""
+    settings = get_settings()
+    try:
+        return await spool_upload(file, settings.w2_spool_max_bytes, scratch_space,
+                                  max_bytes=settings.w2_upload_max_bytes, allowed_types=ALLOWED_TYPES)
+    except UnsupportedFileTypeError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ScratchQuotaError as e:
+        raise _scratch_full(e)
 
 @router.post("/upload")
-async def upload_w2(file: UploadFile = File(...)):
-    if file.content_type not in ALLOWED_TYPES:
-        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-                            detail=f"Unsupported file type {file.content_type}")
+async def upload_w2(file: UploadFile = File(...), split: bool = False, tax_return_id: Optional[int] = None):
+    """
+    Parse one W-2 or 1099 (NEC, INT, DIV, R); the result's ``form_type`` says
+    which was detected. With ``split=true`` a PDF holding several employees' W-2s
+    is returned as ``documents``, one parsed W-2 per employee with the pages
+    it came from. With ``tax_return_id`` the parsed forms are also saved to
+    that return as income records (once per form and file), reported as
+    ``income_records``, and a photo may reuse OCR text of that return's
+    earlier photos.
+    """
+    await _check_tax_return(tax_return_id)
+    tenant = None if tax_return_id is None else str(tax_return_id)
+    upload = await _ingest(file)
     try:
-        tmp_file = NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1])
-        with tmp_file as tmp:
-            shutil.copyfileobj(file.file, tmp)
-        parsed, ftype = parser.parse_file(tmp_file.name, file.content_type)
-        return {"file_type": ftype, "parsed_data": parsed}
+        with upload:
+            key = cache_key(upload.sha256, PARSER_VERSION + ("-split" if split else ""), upload.content_type)
+            cached = await parse_cache.get(key)
+            if cached is None:
+                if split:
+                    documents, ftype = await parse_scheduler.run_all(upload.source, upload.content_type, tenant=tenant)
+                    cached = {"documents": documents}, ftype
+                else:
+                    cached = await parse_scheduler.run(upload.source, upload.content_type, tenant=tenant)
+                await parse_cache.put(key, *cached)
+        parsed, ftype = cached
+        response = {"file_type": ftype, **parsed} if split else {"file_type": ftype, "parsed_data": parsed}
+        if tax_return_id is not None:
+            documents = parsed["documents"] if split else [parsed]
+            response["income_records"] = await asyncio.to_thread(
+                income_store.save, tax_return_id,
+                [(document, upload.sha256, n) for n, document in enumerate(documents)])
+        return response
+    except ParseQueueFullError as e:
+        logger.warning("W2 parse queue full: %s", parse_scheduler.stats())
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="W-2 parser is busy, please retry",
+                            headers={"Retry-After": str(e.retry_after)})
+    except ParseWorkerError as e:
+        logger.error("W2 parse worker failed: %s", e)
+        raise HTTPException(status_code=500, detail="W-2 parser worker crashed while parsing the file")
     except W2ParseError as e:
         logger.warning("W2 parse error: %s", e)
         raise HTTPException(status_code=422, detail=f"Unable to parse W-2: {e}")
+    except TaxReturnNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.exception("Unexpected error parsing W2: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error while parsing W-2")
+
+@router.post("/batch")
+async def upload_w2_batch(files: List[UploadFile] = File(...), tax_return_id: Optional[int] = None):
+    """
+    Parse many W-2s and 1099s, mixed freely (PDF/PNG/JPEG files or ZIPs of
+    them), and stream one NDJSON line per file as soon as it is parsed, then
+    a summary line. With ``tax_return_id`` every parsed form is saved to that
+    return as an income record, all in one transaction after the last parse.
+    """
+    await _check_tax_return(tax_return_id)
+    settings = get_settings()
+    try:
+        items = await collect_batch(files, settings.w2_batch_max_files, settings.w2_batch_max_member_bytes,
+                                    scratch_space)
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ScratchQuotaError as e:
+        raise _scratch_full(e)
+    return StreamingResponse(stream_batch(items, parse_scheduler, parse_cache, income_store, tax_return_id),
+                             media_type="application/x-ndjson")
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_w2_job(file: UploadFile = File(...)):
+    """Queue a W-2 for background parsing; resubmitting the same file returns its existing job."""
+    with await _ingest(file) as upload:
+        job, created = await job_runner.submit(upload, upload.content_type, file.filename or '')
+    return {**public_job(job), "created": created}
+
+@router.get("/jobs/{job_id}")
+async def get_w2_job(job_id: str):
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+
+@router.get("/jobs/{job_id}/events")
+async def w2_job_events(job_id: str):
+    """Server-Sent Events stream of a job's progress until it finishes."""
+    if await job_runner.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(job_runner.events(job_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/ready")
+async def parse_ready():
+    """Readiness check: returns once every parse worker has loaded its libraries and run a tiny OCR."""
+    return {"ready": True, "warm_up_ms": await parse_scheduler.warm_up()}
+
+@router.get("/pool")
+async def parse_pool_stats():
+    return {**parse_scheduler.stats(), "cache": parse_cache.stats(), "jobs": await job_runner.stats(),
+            "stages": STAGE_SECONDS.snapshot(), "scratch": scratch_space.stats(),
+            "income_records": income_store.stats()}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def parse_metrics():
+    """Per-stage latency histograms and scratch bytes in use, in the Prometheus text format."""
+    return PlainTextResponse(STAGE_SECONDS.exposition() + scratch_space.exposition(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,215 @@
+"""
+Scratch space for spooled uploads.
+
+Every request that spills to disk gets its own directory under one root
+(point it at a tmpfs such as /dev/shm for speed), removed as a whole when
+the request ends. Bytes on disk count against a quota shared by all
+requests; writers wait for room while the quota is used up, and give up
+with ScratchQuotaError after ``wait_seconds``. Directories are named after
+the owning process, so a reaper can remove those left behind by a crash.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from tempfile import NamedTemporaryFile
+from typing import IO, Any, Dict, Optional, Set
+
+from app.errors import ScratchQuotaError
+
+logger = logging.getLogger("scratch")
+
+DEFAULT_QUOTA_BYTES = 1024 * 1024 * 1024
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScratchScope:
+    """One request's scratch directory; ``cleanup`` removes it and returns its bytes to the quota."""
+
+    def __init__(self, space: "ScratchSpace", path: str):
+        self.space = space
+        self.path = path
+        self.bytes = 0
+
+    def file(self, suffix: str = '') -> IO[bytes]:
+        return NamedTemporaryFile(dir=self.path, delete=False, suffix=suffix)
+
+    def charge(self, n: int) -> None:
+        self.bytes += n
+        self.space._charge(n)
+
+    def release(self, n: int) -> None:
+        """A file of ``n`` bytes left the scope (moved elsewhere or deleted)."""
+        n = min(n, self.bytes)
+        self.bytes -= n
+        self.space._charge(-n)
+
+    def cleanup(self) -> None:
+        if self.path is None:
+            return
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.release(self.bytes)
+        self.space._forget(self)
+        self.path = None
+
+
+class ScratchSpace:
+    """Per-request scratch directories under ``root`` with a global byte quota."""
+
+    def __init__(self, root: Optional[str] = None, quota_bytes: int = DEFAULT_QUOTA_BYTES,
+                 wait_seconds: float = 10.0, orphan_seconds: float = 3600.0, reap_interval: float = 300.0,
+                 retry_after: int = 5, poll: float = 0.05):
+        self.root = root or os.path.join(tempfile.gettempdir(), "w2-scratch")
+        self.quota_bytes = quota_bytes
+        self.wait_seconds = wait_seconds
+        self.orphan_seconds = orphan_seconds
+        self.reap_interval = reap_interval
+        self.retry_after = retry_after
+        self.poll = poll
+        self._used = 0
+        self._live: Set[str] = set()
+        self._lock = threading.Lock()
+        self._waits = 0
+        self._rejected = 0
+        self._reaped = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "ScratchSpace":
+        return cls(root=settings.w2_scratch_dir, quota_bytes=settings.w2_scratch_quota_bytes,
+                   wait_seconds=settings.w2_scratch_wait_seconds,
+                   orphan_seconds=settings.w2_scratch_orphan_seconds,
+                   reap_interval=settings.w2_scratch_reap_interval,
+                   retry_after=settings.w2_parse_retry_after)
+
+    @property
+    def bytes_in_use(self) -> int:
+        return self._used
+
+    def scope(self) -> ScratchScope:
+        name = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._live.add(name)
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+        return ScratchScope(self, path)
+
+    def _charge(self, n: int) -> None:
+        with self._lock:
+            self._used = max(0, self._used + n)
+
+    def _forget(self, scope: ScratchScope) -> None:
+        with self._lock:
+            self._live.discard(os.path.basename(scope.path))
+
+    def has_room(self) -> bool:
+        return self._used < self.quota_bytes
+
+    async def wait_for_room(self) -> None:
+        """Wait while the quota is used up; ScratchQuotaError after ``wait_seconds``."""
+        if self.has_room():
+            return
+        self._waits += 1
+        deadline = time.monotonic() + self.wait_seconds
+        while not self.has_room():
+            if time.monotonic() >= deadline:
+                self._rejected += 1
+                raise ScratchQuotaError(self.retry_after)
+            await asyncio.sleep(self.poll)
+
+    def wait_for_room_blocking(self) -> None:
+        """``wait_for_room`` for code running in a worker thread."""
+        if self.has_room():
+            return
+        self._waits += 1
+        deadline = time.monotonic() + self.wait_seconds
+        while not self.has_room():
+            if time.monotonic() >= deadline:
+                self._rejected += 1
+                raise ScratchQuotaError(self.retry_after)
+            time.sleep(self.poll)
+
+    def reap(self) -> int:
+        """
+        Remove orphaned request directories: this process's that no live scope
+        owns, other processes' once the process is gone or the directory is
+        older than ``orphan_seconds``. Returns how many were removed.
+        """
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        removed = 0
+        for entry in entries:
+            pid_part = entry.name.split("-", 1)[0]
+            if not entry.is_dir(follow_symlinks=False) or not pid_part.isdigit():
+                continue
+            with self._lock:
+                if entry.name in self._live:
+                    continue
+            pid = int(pid_part)
+            try:
+                age = now - entry.stat(follow_symlinks=False).st_mtime
+            except FileNotFoundError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid) and age < self.orphan_seconds:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+        if removed:
+            logger.info("Reaped %d orphaned scratch directories under %s", removed, self.root)
+        self._reaped += removed
+        return removed
+
+    async def start(self) -> None:
+        """Reap what a previous run left behind, then keep reaping every ``reap_interval``."""
+        os.makedirs(self.root, exist_ok=True)
+        await asyncio.to_thread(self.reap)
+        if self._reaper is None and self.reap_interval > 0:
+            self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def _reap_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await asyncio.to_thread(self.reap)
+            except Exception as e:
+                logger.warning("Scratch reaper failed: %s", e)
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "bytes_in_use": self._used,
+            "quota_bytes": self.quota_bytes,
+            "scopes": len(self._live),
+            "waits": self._waits,
+            "rejected": self._rejected,
+            "reaped": self._reaped,
+        }
+
+    def exposition(self) -> str:
+        """Bytes in use and the quota as Prometheus gauges."""
+        return (f"# HELP w2_scratch_bytes Bytes of spooled uploads in scratch space.\n"
+                f"# TYPE w2_scratch_bytes gauge\nw2_scratch_bytes {self._used}\n"
+                f"# HELP w2_scratch_quota_bytes Scratch space quota.\n"
+                f"# TYPE w2_scratch_quota_bytes gauge\nw2_scratch_quota_bytes {self.quota_bytes}\n")
@@ -0,0 +1,138 @@
+"""
+Per-stage timing for the W-2 pipeline.
+
+``span(name)`` times a block into the current request's ``Trace`` (a
+context variable) and a per-stage latency histogram. Parses run in pool
+workers, so the worker's spans travel back with the result and are merged
+into the caller's trace and this process's histograms (``merge``).
+Histograms are exported in the Prometheus text format at ``/w2/metrics``;
+a request's trace can be returned as a ``Server-Timing`` header.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+Span = Tuple[str, float]  # (stage, milliseconds)
+
+# Seconds; OCR of a page sits in the top buckets, regex parsing in the bottom ones
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TRACE_HEADER = "X-W2-Trace"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label value, Prometheus style."""
+
+    def __init__(self, name: str, help: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, List[float]] = {}  # value -> bucket counts..., count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0.0] * (len(self.buckets) + 2)
+            for j in range(i, len(self.buckets)):
+                series[j] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {value: {"count": int(series[-2]), "sum_ms": round(series[-1] * 1000, 2)}
+                    for value, series in self._series.items()}
+
+    def exposition(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for value, series in sorted(self._series.items()):
+                labels = f'{self.label}="{value}"'
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {int(count)}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {int(series[-2])}')
+                lines.append(f"{self.name}_count{{{labels}}} {int(series[-2])}")
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("w2_stage_seconds", "Time spent in each W-2 pipeline stage.", "stage")
+
+
+class Trace:
+    """The spans of one request (or one worker task), in the order they ended."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def add(self, stage: str, ms: float) -> None:
+        self.spans.append((stage, ms))
+
+    def totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for stage, ms in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + ms
+        return totals
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in self.totals().items())
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("w2_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def tracing() -> Iterator[Trace]:
+    """Collect the spans of the enclosed work into a fresh Trace."""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def record(stage: str, ms: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, ms)
+    STAGE_SECONDS.observe(stage, ms / 1000)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - start) * 1000)
+
+
+def merge(spans: Sequence[Span]) -> None:
+    """Fold spans timed in another process into this one's trace and histograms."""
+    for stage, ms in spans:
+        record(stage, ms)
+
+
+def wants_trace(headers, always: bool) -> bool:
+    return always or headers.get(TRACE_HEADER, "").lower() in ("1", "true", "yes")
+
+
+async def trace_requests(request, call_next):
+    """HTTP middleware: trace each request and, if asked, return its spans as Server-Timing."""
+    from app.config import get_settings
+    with tracing() as trace:
+        response = await call_next(request)
+    if trace.spans and wants_trace(request.headers, get_settings().w2_trace_headers):
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import shutil
+from tempfile import NamedTemporaryFile
+from typing import TYPE_CHECKING, Callable, Collection, Mapping, Optional, Union
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.errors import UploadTooLargeError
+from app.file_types import check_type
+from app.tracing import span
+
+if TYPE_CHECKING:
+    from app.scratch import ScratchScope, ScratchSpace
+
+COPY_CHUNK = 64 * 1024
+# Multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class SpooledUpload:
+    """
+    An upload held in memory, or spooled once to a named file when it grows
+    past ``max_memory`` bytes. The SHA-256 digest is computed as bytes arrive.
+    With ``scratch`` the file lives in its own scratch directory and counts
+    against the scratch quota. Call ``cleanup()`` (or use as a context
+    manager) to remove the spool file.
+    """
+
+    def __init__(self, max_memory: int, suffix: str = '', scratch: Optional["ScratchSpace"] = None):
+        self.max_memory = max_memory
+        self.suffix = suffix
+        self.scratch = scratch
+        self.size = 0
+        self.path: Optional[str] = None
+        self.sha256: Optional[str] = None
+        # Set from the file's leading bytes when the upload is type-checked
+        self.content_type: Optional[str] = None
+        self._buffer = bytearray()
+        self._digest = hashlib.sha256()
+        self._fh = None
+        self._scope: Optional["ScratchScope"] = None
+
+    def spills(self, n: int) -> bool:
+        """Whether writing ``n`` more bytes puts them on disk."""
+        return self._fh is not None or self.size + n > self.max_memory
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if self._fh is None and self.size > self.max_memory:
+            if self.scratch is not None:
+                self._scope = self.scratch.scope()
+                self._fh = self._scope.file(self.suffix)
+                self._scope.charge(len(self._buffer))
+            else:
+                self._fh = NamedTemporaryFile(delete=False, suffix=self.suffix)
+            self.path = self._fh.name
+            self._fh.write(self._buffer)
+            self._buffer = bytearray()
+        if self._fh is not None:
+            if self._scope is not None:
+                self._scope.charge(len(chunk))
+            self._fh.write(chunk)
+        else:
+            self._buffer += chunk
+
+    def finish(self) -> str:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        self.sha256 = self._digest.hexdigest()
+        return self.sha256
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What to hand to W2Parser: the bytes themselves, or the spool path."""
+        return self.path if self.path else bytes(self._buffer)
+
+    def save(self, dest: str) -> None:
+        """Keep the upload at ``dest``: the spool file is moved there, or the bytes written."""
+        if self.path:
+            shutil.move(self.path, dest)
+            self.path = None
+            if self._scope is not None:
+                self._scope.release(self.size)
+        else:
+            with open(dest, 'wb') as fh:
+                fh.write(self._buffer)
+
+    def cleanup(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        if self._scope is not None:
+            self._scope.cleanup()
+            self._scope = None
+        self._buffer = bytearray()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cleanup()
+
+
+async def spool_upload(upload, max_memory: int, scratch: Optional["ScratchSpace"] = None,
+                       max_bytes: Optional[int] = None,
+                       allowed_types: Optional[Collection[str]] = None) -> SpooledUpload:
+    """
+    Drain a FastAPI ``UploadFile`` into a SpooledUpload, hashing as it goes.
+
+    With ``allowed_types`` the first chunk is sniffed before anything is
+    kept, and a file of another type, or one contradicting its declared
+    Content-Type, raises UnsupportedFileTypeError; the sniffed type is set on
+    the spool. Past ``max_bytes`` the copy stops with UploadTooLargeError.
+    Starlette has already received the whole request body by then; oversized
+    requests are cut off earlier by BodySizeLimit.
+    Once the upload spills to disk, each chunk waits for room in the scratch
+    quota.
+    """
+    if max_bytes is not None and (getattr(upload, "size", None) or 0) > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+    spool = SpooledUpload(max_memory, suffix=os.path.splitext(upload.filename or '')[1], scratch=scratch)
+    try:
+        with span("upload_copy"):
+            while True:
+                chunk = await upload.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                if allowed_types is not None and spool.size == 0:
+                    spool.content_type = check_type(chunk, upload.content_type, allowed_types)
+                if max_bytes is not None and spool.size + len(chunk) > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                if scratch is not None and spool.spills(len(chunk)):
+                    await scratch.wait_for_room()
+                spool.write(chunk)
+            if allowed_types is not None and spool.size == 0:
+                check_type(b"", upload.content_type, allowed_types)
+            spool.finish()
+    except BaseException:
+        spool.cleanup()
+        raise
+    return spool
+
+
+class BodySizeLimit:
+    """
+    ASGI middleware answering 413 to POSTs to the paths in ``limits`` (path
+    -> callable returning the byte limit) whose body is too large.
+
+    Starlette receives and buffers a whole multipart body before the route
+    runs, so the route's own checks come too late to save the transfer. A
+    Content-Length over the limit is refused before the body is read; without
+    one (chunked bodies) bytes are counted as they arrive and the request is
+    cut off once the count passes the limit.
+    """
+
+    def __init__(self, app, limits: Mapping[str, Callable[[], int]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send) -> None:
+        max_bytes = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if max_bytes is None or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        limit = max_bytes()
+        too_large = HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes")
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit + MULTIPART_OVERHEAD:
+            return await JSONResponse({"detail": too_large.detail}, status_code=413)(scope, receive, send)
+
+        received = 0
+        started = False
+
+        async def counted_receive():
+            nonlocal received
+            if received > limit + MULTIPART_OVERHEAD:
+                # The rest of the body is never read; the response is all that is left
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + MULTIPART_OVERHEAD:
+                    # Routes let HTTPExceptions from body parsing through as responses
+                    raise too_large
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, counted_receive, tracked_send)
+        except HTTPException as e:
+            if e is not too_large or started:
+                raise
+            await JSONResponse({"detail": e.detail}, status_code=413)(scope, receive, send)
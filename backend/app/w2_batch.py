@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Sequence
+
+from app.errors import (BatchTooLargeError, ParseWorkerError, UnsupportedFileTypeError, UploadTooLargeError,
+                        W2ParseError)
+from app.file_types import JPEG, PDF, PNG, check_type
+from app.income_records import IncomeRecordStore, ParsedForm
+from app.parse_cache import ParseCache, cache_key
+from app.parse_lanes import ParseScheduler
+from app.scratch import ScratchSpace
+from app.upload_spool import COPY_CHUNK, SpooledUpload, spool_upload
+from app.w2_parser import PARSER_VERSION
+
+logger = logging.getLogger("w2_batch")
+
+ALLOWED_TYPES = {PDF, PNG, JPEG}
+ZIP_TYPES = {"application/zip", "application/x-zip-compressed"}
+TYPES_BY_EXTENSION = {".pdf": PDF, ".png": PNG, ".jpg": JPEG, ".jpeg": JPEG}
+# Batch items are spooled to disk sooner than single uploads so a large batch
+# never holds more than this per file in memory
+BATCH_SPOOL_MEMORY = 1024 * 1024
+
+
+@dataclass
+class BatchItem:
+    """One form (W-2 or 1099) of a batch: an uploaded file or a ZIP member."""
+    index: int
+    filename: str
+    content_type: str
+    upload: Optional[SpooledUpload] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class _Outcome:
+    key: str
+    parsed: Optional[Dict[str, Any]] = None
+    file_type: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+    timing: Dict[str, float] = field(default_factory=dict)
+
+
+def _is_zip(upload) -> bool:
+    return upload.content_type in ZIP_TYPES or (upload.filename or '').lower().endswith('.zip')
+
+
+def _spool_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, archive: str, index: int, max_files: int,
+                  max_member_bytes: int, scratch: Optional[ScratchSpace]) -> Optional[BatchItem]:
+    base = os.path.basename(info.filename)
+    if info.is_dir() or info.filename.startswith("__MACOSX/") or base.startswith("."):
+        return None
+    if index >= max_files:
+        raise BatchTooLargeError(f"Batch exceeds {max_files} files")
+    ext = os.path.splitext(base)[1].lower()
+    item = BatchItem(index, f"{archive}/{info.filename}", TYPES_BY_EXTENSION.get(ext, ''))
+    if not item.content_type:
+        item.error = f"Unsupported file type {ext or '(none)'}"
+        return item
+    if info.file_size > max_member_bytes:
+        item.error = f"File exceeds {max_member_bytes} bytes"
+        return item
+    spool = SpooledUpload(BATCH_SPOOL_MEMORY, suffix=ext, scratch=scratch)
+    try:
+        with zf.open(info) as member:
+            # Don't trust the header's size: stop once the limit is passed
+            while spool.size <= max_member_bytes:
+                chunk = member.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                if spool.size == 0:
+                    check_type(chunk, item.content_type, ALLOWED_TYPES)
+                if scratch is not None and spool.spills(len(chunk)):
+                    scratch.wait_for_room_blocking()
+                spool.write(chunk)
+    except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+        spool.cleanup()
+        item.error = f"Could not read ZIP member: {e}"
+        return item
+    except UnsupportedFileTypeError as e:
+        spool.cleanup()
+        item.error = str(e)
+        return item
+    except BaseException:
+        spool.cleanup()
+        raise
+    if spool.size > max_member_bytes:
+        spool.cleanup()
+        item.error = f"File exceeds {max_member_bytes} bytes"
+        return item
+    spool.finish()
+    item.upload = spool
+    return item
+
+
+def _expand_zip(fileobj: BinaryIO, archive: str, first_index: int, max_files: int,
+                max_member_bytes: int, scratch: Optional[ScratchSpace] = None) -> List[BatchItem]:
+    """Spool every supported member of a ZIP; runs in a thread since it decompresses."""
+    items: List[BatchItem] = []
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        return [BatchItem(first_index, archive, "application/zip", error="Not a valid ZIP archive")]
+    try:
+        with zf:
+            for info in zf.infolist():
+                item = _spool_member(zf, info, archive, first_index + len(items), max_files,
+                                     max_member_bytes, scratch)
+                if item is not None:
+                    items.append(item)
+    except BaseException:
+        # Members spooled so far never reach the caller
+        cleanup_batch(items)
+        raise
+    return items
+
+
+async def collect_batch(uploads: Sequence, max_files: int, max_member_bytes: int,
+                        scratch: Optional[ScratchSpace] = None) -> List[BatchItem]:
+    """
+    Spool the uploaded files, expanding ZIP archives into their members.
+    Unsupported or unreadable entries become items carrying an error.
+    """
+    items: List[BatchItem] = []
+    try:
+        for upload in uploads:
+            if _is_zip(upload):
+                items += await asyncio.to_thread(_expand_zip, upload.file, upload.filename or "upload.zip",
+                                                 len(items), max_files, max_member_bytes, scratch)
+                continue
+            if len(items) >= max_files:
+                raise BatchTooLargeError(f"Batch exceeds {max_files} files")
+            item = BatchItem(len(items), upload.filename or f"file-{len(items)}", upload.content_type or '')
+            items.append(item)
+            try:
+                item.upload = await spool_upload(upload, BATCH_SPOOL_MEMORY, scratch, max_bytes=max_member_bytes,
+                                                 allowed_types=ALLOWED_TYPES)
+            except (UnsupportedFileTypeError, UploadTooLargeError) as e:
+                item.error = str(e)
+                continue
+            item.content_type = item.upload.content_type
+    except BaseException:
+        cleanup_batch(items)
+        raise
+    return items
+
+
+def cleanup_batch(items: Sequence[BatchItem]) -> None:
+    for item in items:
+        if item.upload is not None:
+            item.upload.cleanup()
+
+
+def _line(item: BatchItem, outcome: Optional[_Outcome] = None, duplicate_of: Optional[int] = None) -> bytes:
+    record: Dict[str, Any] = {"index": item.index, "filename": item.filename,
+                              "sha256": item.upload.sha256 if item.upload else None}
+    error = outcome.error if outcome else item.error
+    if error is not None:
+        record.update(status="error", error=error)
+    else:
+        record.update(status="ok", file_type=outcome.file_type, form_type=outcome.parsed.get("form_type"),
+                      parsed_data=outcome.parsed)
+    if outcome is not None:
+        record.update(cached=outcome.cached, duplicate_of=duplicate_of, timing=outcome.timing)
+    return (json.dumps(record) + "\n").encode()
+
+
+async def stream_batch(items: List[BatchItem], scheduler: ParseScheduler, cache: ParseCache,
+                       store: Optional[IncomeRecordStore] = None,
+                       tax_return_id: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Parse each distinct file once and yield one NDJSON line per item as
+    soon as its parse finishes, followed by a summary line counting the
+    form types parsed (a batch may mix W-2s and 1099s). Identical files
+    are reported with ``duplicate_of`` pointing at the first copy. Spooled
+    files are removed when done.
+
+    With a ``store`` and ``tax_return_id``, every parsed form is saved as an
+    income record in one transaction once all are parsed, and the summary
+    reports ``income_records``. Photos only reuse OCR text of other photos
+    of the same tax return (W2Parser.parse_file's ``tenant``).
+
+    A batch keeps at most one file per worker in flight in each lane, so
+    queue slots stay free for single uploads.
+    """
+    batch_start = time.perf_counter()
+    semaphores = {lane: asyncio.Semaphore(pool.max_workers) for lane, pool in scheduler.lanes.items()}
+    groups: Dict[str, List[BatchItem]] = {}
+    failed = 0
+    forms: Dict[str, int] = {}
+    parsed_forms: List[ParsedForm] = []
+    tenant = None if tax_return_id is None else str(tax_return_id)
+
+    def elapsed_ms(since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 2)
+
+    async def parse(key: str, item: BatchItem) -> _Outcome:
+        cached = await cache.get(key)
+        if cached is not None:
+            return _Outcome(key, *cached, cached=True,
+                            timing={"queued_ms": 0.0, "parse_ms": 0.0, "finished_ms": elapsed_ms(batch_start)})
+        queued = time.perf_counter()
+        lane = await scheduler.classify(item.upload.source, item.content_type)
+        async with semaphores[lane]:
+            started = time.perf_counter()
+            outcome = _Outcome(key)
+            try:
+                outcome.parsed, outcome.file_type = await scheduler.run(
+                    item.upload.source, item.content_type, wait=True, lane=lane, tenant=tenant)
+                await cache.put(key, outcome.parsed, outcome.file_type)
+            except W2ParseError as e:
+                outcome.error = f"Unable to parse form: {e}"
+            except ParseWorkerError as e:
+                logger.error("Parse worker failed on %s: %s", item.filename, e)
+                outcome.error = "Parser worker crashed while parsing form"
+            except Exception as e:
+                logger.exception("Unexpected error parsing %s: %s", item.filename, e)
+                outcome.error = "Internal server error while parsing form"
+        outcome.timing = {"queued_ms": round((started - queued) * 1000, 2), "parse_ms": elapsed_ms(started),
+                          "finished_ms": elapsed_ms(batch_start)}
+        return outcome
+
+    tasks: List[asyncio.Future] = []
+    try:
+        for item in items:
+            if item.upload is None:
+                failed += 1
+                yield _line(item)
+                continue
+            key = cache_key(item.upload.sha256, PARSER_VERSION, item.content_type)
+            groups.setdefault(key, []).append(item)
+        tasks = [asyncio.ensure_future(parse(key, group[0])) for key, group in groups.items()]
+        for next_done in asyncio.as_completed(tasks):
+            outcome = await next_done
+            group = groups[outcome.key]
+            for n, item in enumerate(group):
+                failed += outcome.error is not None
+                if outcome.parsed is not None:
+                    form_type = outcome.parsed.get("form_type")
+                    forms[form_type] = forms.get(form_type, 0) + 1
+                    parsed_forms.append((outcome.parsed, item.upload.sha256, 0))
+                yield _line(item, outcome, duplicate_of=group[0].index if n else None)
+        summary: Dict[str, Any] = {"files": len(items), "unique": len(groups), "failed": failed, "forms": forms}
+        if store is not None and tax_return_id is not None:
+            try:
+                summary["income_records"] = await asyncio.to_thread(store.save, tax_return_id, parsed_forms)
+            except Exception as e:
+                logger.exception("Saving income records for tax return %s failed: %s", tax_return_id, e)
+                summary["income_records"] = {"error": "Could not save income records"}
+        summary["elapsed_ms"] = elapsed_ms(batch_start)
+        yield (json.dumps({"summary": summary}) + "\n").encode()
+    finally:
+        for task in tasks:
+            task.cancel()
+        cleanup_batch(items)
@@ -0,0 +1,153 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+# How far each extraction tier is trusted when a value is well-formed
+TIER_WEIGHTS = {"text": 0.9, "geometry": 0.95, "zonal": 0.85, "ocr": 0.8}
+
+# W-2 fields that must reach the confidence threshold before extraction stops
+# (other forms' are in app.form_schemas)
+CHECKED_FIELDS = ("employee_ssn", "employer_ein", "employer_name", "wages", "federal_withholding",
+                  "social_security_wages", "social_security_tax", "medicare_wages", "medicare_tax")
+# A form with zero in these boxes almost always means the box was not read
+NONZERO_FIELDS = ("wages", "social_security_wages", "medicare_wages", "nonemployee_compensation",
+                  "interest_income", "gross_distribution")
+
+SOCIAL_SECURITY_RATE = 0.062
+MEDICARE_RATE = 0.0145
+ADDITIONAL_MEDICARE_RATE = 0.009
+ADDITIONAL_MEDICARE_THRESHOLD = 200000.0
+# Multiplier applied to both fields of a failed cross-field check
+MISMATCH_PENALTY = 0.5
+
+_SSN_RE = re.compile(r"^(\d{3})-?(\d{2})-?(\d{4})$")
+_MASKED_SSN_RE = re.compile(r"^[Xx*]{3}-?[Xx*]{2}-?\d{4}$")
+_EIN_RE = re.compile(r"^(\d{2})-?\d{7}$")
+# A name that swallowed a neighbouring box label
+_LABEL_RE = re.compile(r"\b(?:employee|employer|payer|recipient|name and address|wages|social security|ssn|ein)\b",
+                       re.I)
+
+# EIN prefixes the IRS assigns (campus and internet/fax/SS-4 prefixes)
+EIN_PREFIXES = frozenset(
+    [f"{n:02d}" for n in [*range(1, 7), *range(10, 17), *range(20, 28), *range(30, 49),
+                          *range(50, 69), *range(71, 78), *range(80, 89), *range(90, 96), 98, 99]])
+
+
+def valid_ssn(ssn: str) -> bool:
+    """SSA assignment rules: no 000/666/9xx area, 00 group or 0000 serial."""
+    m = _SSN_RE.match(ssn)
+    if not m:
+        return False
+    area, group, serial = m.groups()
+    return area not in ("000", "666") and area[0] != "9" and group != "00" and serial != "0000"
+
+
+def valid_ein(ein: str) -> bool:
+    m = _EIN_RE.match(ein)
+    return bool(m) and m.group(1) in EIN_PREFIXES
+
+
+def field_score(field: str, value: Any) -> float:
+    """How plausible a single value is on its own, from 0 (missing) to 1."""
+    if value is None or value == "" or value == []:
+        return 0.0
+    if field == "employee_ssn":
+        if _MASKED_SSN_RE.match(value) or valid_ssn(value):
+            return 1.0
+        return 0.3 if _SSN_RE.match(value) else 0.2
+    if field == "employer_ein":
+        if valid_ein(value):
+            return 1.0
+        return 0.3 if _EIN_RE.match(value) else 0.2
+    if field in ("payer_tin", "recipient_tin"):
+        # 1099 TINs are an EIN or an SSN; recipients' are usually masked
+        if valid_ein(value) or valid_ssn(value) or (field == "recipient_tin" and _MASKED_SSN_RE.match(value)):
+            return 1.0
+        return 0.3 if _SSN_RE.match(value) or _EIN_RE.match(value) else 0.2
+    if field in ("employer_name", "payer_name"):
+        return 0.4 if _LABEL_RE.search(value) else 1.0
+    if isinstance(value, float):
+        if value < 0:
+            return 0.2
+        if value == 0 and field in NONZERO_FIELDS:
+            return 0.0
+    return 1.0
+
+
+def _close(actual: float, expected: float) -> bool:
+    # Per-paycheck rounding drifts by cents; allow a dollar or half a percent
+    return abs(actual - expected) <= max(1.0, 0.005 * expected)
+
+
+def cross_check(values: Dict[str, Any], scores: Dict[str, float]) -> Dict[str, float]:
+    """Penalize both fields of every related pair whose amounts disagree."""
+    scores = dict(scores)
+
+    def check(a: str, b: str, consistent) -> None:
+        x, y = values.get(a), values.get(b)
+        if isinstance(x, float) and isinstance(y, float) and not consistent(x, y):
+            scores[a] = scores.get(a, 0.0) * MISMATCH_PENALTY
+            scores[b] = scores.get(b, 0.0) * MISMATCH_PENALTY
+
+    # Box 4 is 6.2% of box 3
+    check("social_security_wages", "social_security_tax",
+          lambda wages, tax: _close(tax, SOCIAL_SECURITY_RATE * wages))
+    # Box 6 is 1.45% of box 5, plus 0.9% withheld above $200,000
+    check("medicare_wages", "medicare_tax",
+          lambda wages, tax: _close(tax, MEDICARE_RATE * wages + ADDITIONAL_MEDICARE_RATE
+                                    * max(0.0, wages - ADDITIONAL_MEDICARE_THRESHOLD)))
+    check("wages", "federal_withholding", lambda wages, tax: wages == 0 or tax <= wages)
+    # 1099s: a part never exceeds the total it is part of
+    check("total_ordinary_dividends", "qualified_dividends", lambda total, part: part <= total)
+    check("gross_distribution", "taxable_amount", lambda total, part: part <= total)
+    return scores
+
+
+def score_fields(values: Dict[str, Any], tier: str) -> Dict[str, float]:
+    weight = TIER_WEIGHTS[tier]
+    return cross_check(values, {f: weight * field_score(f, v) for f, v in values.items()})
+
+
+class TieredExtraction:
+    """
+    Merges the output of successive extraction tiers field by field. A tier's
+    value replaces the current one only if it scores higher, and scores are
+    re-checked across fields after every merge.
+    """
+
+    def __init__(self, threshold: float, checked: Sequence[str] = CHECKED_FIELDS):
+        self.threshold = threshold
+        self.checked = checked
+        self.values: Dict[str, Any] = {}
+        self._base: Dict[str, float] = {}
+        self.sources: Dict[str, str] = {}
+        self.tiers: List[str] = []
+        # Last tier failure, reported if no tier produced anything
+        self.error: Optional[Exception] = None
+
+    @property
+    def scores(self) -> Dict[str, float]:
+        return cross_check(self.values, self._base)
+
+    def offer(self, tier: str, data: Dict[str, Any]) -> None:
+        self.tiers.append(tier)
+        current = self.scores
+        weight = TIER_WEIGHTS[tier]
+        for field, score in score_fields(data, tier).items():
+            if field not in self.values or score > current.get(field, 0.0):
+                self.values[field] = data[field]
+                self._base[field] = weight * field_score(field, data[field])
+                self.sources[field] = tier
+
+    def failing(self) -> Optional[List[str]]:
+        """Checked fields still below the threshold; None before any tier ran."""
+        if not self.tiers:
+            return None
+        scores = self.scores
+        return [f for f in self.checked if scores.get(f, 0.0) < self.threshold]
+
+    def result(self) -> Dict[str, Any]:
+        scores = self.scores
+        data = dict(self.values)
+        data["confidence"] = {f: round(scores.get(f, 0.0), 3) for f in self.values}
+        data["extraction_tier"] = self.tiers[-1] if self.tiers else None
+        return data
@@ -0,0 +1,228 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Label phrases per field (normalized tokens). A label matches when its first
+# tokens appear consecutively on one line, so wrapped labels still anchor.
+LABELS: Dict[str, Sequence[Tuple[str, ...]]] = {
+    "employee_ssn": [("employees", "social", "security", "number"), ("employee", "ssn")],
+    "employer_ein": [("employer", "identification", "number"), ("employer", "identitication", "number"),
+                     ("employer", "ein")],
+    "employer_name": [("employers", "name", "and", "address"), ("employers", "name")],
+    "employee_name": [("employees", "name", "and", "address"), ("employees", "first", "name")],
+    "wages": [("wages", "tips", "other", "compensation")],
+    "federal_withholding": [("federal", "income", "tax", "withheld")],
+    "social_security_wages": [("social", "security", "wages")],
+    "social_security_tax": [("social", "security", "tax", "withheld")],
+    "medicare_wages": [("medicare", "wages", "and", "tips")],
+    "medicare_tax": [("medicare", "tax", "withheld")],
+    "state_wages": [("state", "wages", "tips")],
+    "state_withholding": [("state", "income", "tax")],
+}
+ANCHOR_TOKENS = 3
+
+KINDS = {
+    "employee_ssn": "ssn", "employer_ein": "ein",
+    "employer_name": "text", "employee_name": "text",
+    "wages": "money", "federal_withholding": "money",
+    "social_security_wages": "money", "social_security_tax": "money",
+    "medicare_wages": "money", "medicare_tax": "money",
+    "state_wages": "money", "state_withholding": "money",
+}
+
+# Two-digit numbers are box labels ("12", "16"), not amounts
+_MONEY_RE = re.compile(r"^\$?(?:\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+\.\d{2}|\d{3,})$")
+_SSN_RE = re.compile(r"^(?:\d{3}-\d{2}-\d{4}|\d{9}|X{3}-X{2}-\d{4})$")
+_EIN_RE = re.compile(r"^\d{2}-?\d{7}$")
+_PATTERNS = {"money": _MONEY_RE, "ssn": _SSN_RE, "ein": _EIN_RE}
+
+LINE_TOLERANCE = 3.0   # points; words whose tops differ less share a line
+MAX_BELOW = 40.0       # how far under a label a value may sit
+COLUMN_SLACK = 60.0    # how far past a label's right edge a value below may start
+
+
+@dataclass
+class Box:
+    text: str
+    x0: float
+    top: float
+    x1: float
+    bottom: float
+
+
+def _norm(token: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", token.lower())
+
+
+class SpatialIndex:
+    """Uniform grid over word boxes for rectangle queries."""
+
+    def __init__(self, boxes: Iterable[Box], cell: float = 50.0):
+        self.cell = cell
+        self._grid: Dict[Tuple[int, int], List[Box]] = defaultdict(list)
+        for box in boxes:
+            for key in self._cells(box.x0, box.top, box.x1, box.bottom):
+                self._grid[key].append(box)
+
+    def _cells(self, x0: float, top: float, x1: float, bottom: float):
+        c = self.cell
+        for gx in range(int(x0 // c), int(x1 // c) + 1):
+            for gy in range(int(top // c), int(bottom // c) + 1):
+                yield gx, gy
+
+    def query(self, x0: float, top: float, x1: float, bottom: float) -> List[Box]:
+        seen, out = set(), []
+        for key in self._cells(x0, top, x1, bottom):
+            for box in self._grid.get(key, ()):
+                if id(box) in seen:
+                    continue
+                seen.add(id(box))
+                if box.x1 >= x0 and box.x0 <= x1 and box.bottom >= top and box.top <= bottom:
+                    out.append(box)
+        return out
+
+
+def _lines(boxes: List[Box]) -> List[List[Box]]:
+    lines: List[List[Box]] = []
+    for box in sorted(boxes, key=lambda b: (b.top, b.x0)):
+        if lines and abs(lines[-1][0].top - box.top) <= LINE_TOLERANCE:
+            lines[-1].append(box)
+        else:
+            lines.append([box])
+    return [sorted(line, key=lambda b: b.x0) for line in lines]
+
+
+def find_labels(lines: List[List[Box]]) -> Dict[str, Box]:
+    """Bounding box of the first occurrence of each field's label."""
+    anchors = {field: [alt[:ANCHOR_TOKENS] for alt in alts] for field, alts in LABELS.items()}
+    found: Dict[str, Box] = {}
+    for line in lines:
+        tokens = [_norm(b.text) for b in line]
+        for field, alts in anchors.items():
+            if field in found:
+                continue
+            for alt in alts:
+                n = len(alt)
+                for i in range(len(tokens) - n + 1):
+                    if tuple(tokens[i:i + n]) == alt:
+                        # Extend over the rest of the label phrase on this line
+                        j = i + n
+                        full = next(a for a in LABELS[field] if a[:n] == alt)
+                        while j < len(tokens) and j - i < len(full) and tokens[j] == full[j - i]:
+                            j += 1
+                        words = line[i:j]
+                        found[field] = Box(" ".join(w.text for w in words), words[0].x0,
+                                           min(w.top for w in words), words[-1].x1,
+                                           max(w.bottom for w in words))
+                        break
+                if field in found:
+                    break
+    return found
+
+
+def _candidates(label: Box, index: SpatialIndex, width: float) -> List[Tuple[float, Box]]:
+    """Words right of the label on its line, or below it in its column, with distances."""
+    out = []
+    for box in index.query(label.x1, label.top - LINE_TOLERANCE, width, label.bottom + LINE_TOLERANCE):
+        if box.x0 >= label.x1 - 0.5:
+            out.append((box.x0 - label.x1, box))
+    for box in index.query(label.x0 - COLUMN_SLACK / 4, label.bottom + 0.5,
+                           label.x1 + COLUMN_SLACK, label.bottom + MAX_BELOW):
+        if box.top > label.bottom - 0.5 and box.x0 <= label.x1 + COLUMN_SLACK:
+            out.append((box.top - label.bottom + 0.1 * abs(box.x0 - label.x0), box))
+    return out
+
+
+def _text_after(label: Box, lines: List[List[Box]]) -> Optional[str]:
+    """Rest of the label's line, or else the line directly under it in its column."""
+    for line in lines:
+        if abs(line[0].top - label.top) <= LINE_TOLERANCE:
+            rest = [b.text for b in line if b.x0 >= label.x1 - 0.5]
+            if rest:
+                return " ".join(rest)
+    for line in lines:
+        if label.bottom < line[0].top <= label.bottom + MAX_BELOW:
+            col = [b.text for b in line if label.x0 - COLUMN_SLACK / 4 <= b.x0 <= label.x1 + COLUMN_SLACK]
+            if col:
+                return " ".join(col)
+    return None
+
+
+def _value(kind: str, text: str) -> Any:
+    if kind == "money":
+        return float(text.replace("$", "").replace(",", ""))
+    return text
+
+
+def extract_page(words: List[Dict[str, Any]], width: float) -> Dict[str, Any]:
+    """Locate each labelled field on one page from pdfplumber word dicts."""
+    boxes = [Box(w["text"], w["x0"], w["top"], w["x1"], w["bottom"]) for w in words]
+    lines = _lines(boxes)
+    labels = find_labels(lines)
+    label_ids = {id(b) for line in lines for b in line
+                 if any(lab.x0 <= b.x0 and b.x1 <= lab.x1 and abs(b.top - lab.top) <= LINE_TOLERANCE
+                        for lab in labels.values())}
+    index = SpatialIndex(b for b in boxes if id(b) not in label_ids)
+
+    # Assign values greedily by distance so each word feeds at most one field
+    scored = []
+    for field, label in labels.items():
+        kind = KINDS[field]
+        if kind == "text":
+            continue
+        pattern = _PATTERNS[kind]
+        for dist, box in _candidates(label, index, width):
+            token = box.text.rstrip(":")
+            if pattern.match(token):
+                scored.append((dist, field, id(box), token))
+    data: Dict[str, Any] = {}
+    used = set()
+    for dist, field, box_id, token in sorted(scored, key=lambda s: s[0]):
+        if field in data or box_id in used:
+            continue
+        data[field] = _value(KINDS[field], token)
+        used.add(box_id)
+
+    for field in ("employer_name", "employee_name"):
+        if field in labels:
+            text = _text_after(labels[field], lines)
+            if text:
+                data[field] = text
+    return data
+
+
+def extract_fields(pages: List[Tuple[List[Dict[str, Any]], float]]) -> Dict[str, Any]:
+    """Geometry fields of a document given each page's (word dicts, width)."""
+    return merge_pages(extract_page(words, width) for words, width in pages)
+
+
+def merge_pages(page_results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-page ``extract_page`` results (earlier pages win) into the
+    parser's field dict. Missing fields are None.
+    """
+    merged: Dict[str, Any] = {}
+    for result in page_results:
+        for field, value in result.items():
+            merged.setdefault(field, value)
+
+    first = last = None
+    name = merged.pop("employee_name", None)
+    if name:
+        parts = re.findall(r"[A-Za-z]+", name)
+        first = parts[0] if parts else None
+        last = parts[1] if len(parts) > 1 else None
+    data = {
+        "employee_ssn": merged.get("employee_ssn"),
+        "employer_ein": merged.get("employer_ein"),
+        "employer_name": merged.get("employer_name"),
+        "employee_first_name": first,
+        "employee_last_name": last,
+        "state": None,
+        "employer_state_id": None,
+    }
+    for field, kind in KINDS.items():
+        if kind == "money":
+            data[field] = merged.get(field)
+    return data
@@ -0,0 +1,182 @@
+import re
+import string
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+MONEY_FIELDS = frozenset({"wages", "federal_withholding", "social_security_wages", "social_security_tax",
+                          "medicare_wages", "medicare_tax", "state_wages", "state_withholding"})
+
+
+# Lower-case ASCII and straighten curly apostrophes without changing offsets,
+# so anchor matches on the folded text index straight into the original
+_FOLD = str.maketrans(string.ascii_uppercase + "\u2019", string.ascii_lowercase + "'")
+
+
+def fold(txt: str) -> str:
+    folded = txt.lower().replace("\u2019", "'")
+    if len(folded) != len(txt):
+        # A few non-ASCII letters (e.g. "\u0130") lower-case to two code points, which
+        # would shift offsets; fold only ASCII and apostrophes instead
+        folded = txt.translate(_FOLD)
+    return folded
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A label anchor and the values read after it.
+
+    ``anchor`` is matched against the folded (lower-case) text and should
+    start with a literal so the regex engine can skip ahead with a fast
+    prefix search. ``before``, if set, must match the text just ahead of the
+    anchor (e.g. a box number).
+
+    ``values`` are (field, regex) pairs, matched case-insensitively, each with
+    one capture group. In ``adjacent`` mode they must follow the anchor one
+    after another and the first anchor whose leading value parses wins;
+    ``atomic`` rules need every value. In ``search`` mode each value is
+    searched for independently within ``window`` characters after the anchor.
+    Lower ``priority`` wins when several rules fill a field.
+    """
+    anchor: str
+    values: Tuple[Tuple[str, str], ...]
+    mode: str = "adjacent"
+    window: int = 120
+    atomic: bool = False
+    priority: int = 0
+    before: Optional[str] = None
+
+
+@dataclass
+class _CompiledRule:
+    rule: Rule
+    anchor: "re.Pattern"
+    before: Optional["re.Pattern"]
+    values: List[Tuple[str, "re.Pattern"]]
+    # Adjacent rules: anchor and values in one pattern, so a single C-level
+    # search finds the first anchor whose values parse
+    fused: Optional["re.Pattern"] = None
+
+
+def _fuse(rule: Rule) -> "re.Pattern":
+    parts = [f"(?:{p})" if i == 0 or rule.atomic else f"(?:{p})?" for i, (_, p) in enumerate(rule.values)]
+    # Case-insensitive only inside the values so the anchor keeps its literal prefix
+    return re.compile(f"{rule.anchor}(?is:{''.join(parts)})")
+
+
+@dataclass
+class ExtractionTable:
+    """
+    A set of Rules compiled once at import. Each anchor is found with a
+    prefix-accelerated scan of the folded text and values are parsed from a
+    bounded window after it, so no pattern can backtrack over the whole
+    document.
+    """
+    rules: Sequence[Rule]
+    # Anchorless fields: (field, regex) tried in order over the folded text
+    standalone: Sequence[Tuple[str, str]] = ()
+    # Every output field with its default when nothing matched
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    # Fields converted to float amounts
+    money: FrozenSet[str] = MONEY_FIELDS
+
+    def __post_init__(self):
+        self._rules = [
+            _CompiledRule(r, re.compile(r.anchor),
+                          re.compile(f"(?:{r.before})$") if r.before else None,
+                          [(f, re.compile(p, re.I | re.S)) for f, p in r.values],
+                          _fuse(r) if r.mode == "adjacent" else None)
+            for r in self.rules
+        ]
+        self._standalone = [(f, re.compile(p)) for f, p in self.standalone]
+
+    def _search_window(self, compiled: _CompiledRule, txt: str, start: int,
+                       scanned_to: int) -> List[Tuple[str, str]]:
+        # A failed search already covered up to scanned_to; values are short,
+        # so only the last few characters before it need another look
+        end = min(len(txt), start + compiled.rule.window)
+        start = max(start, scanned_to - MAX_VALUE_LEN)
+        found = []
+        for name, pattern in compiled.values:
+            vm = pattern.search(txt, start, end)
+            if vm:
+                found.append((name, vm.group(1)))
+        return found
+
+    def _first_fused(self, compiled: _CompiledRule, folded: str):
+        m = compiled.fused.search(folded)
+        before = compiled.before
+        while m is not None and before is not None \
+                and not before.search(folded, max(0, m.start() - 8), m.start()):
+            m = compiled.fused.search(folded, m.start() + 1)
+        return m
+
+    def extract(self, txt: str) -> Dict[str, Any]:
+        folded = txt.translate(_FOLD)
+        best: Dict[str, Tuple[int, int, str]] = {}  # field -> (priority, position, raw value)
+
+        def offer(name: str, priority: int, pos: int, raw: str) -> None:
+            current = best.get(name)
+            if current is None or (priority, pos) < current[:2]:
+                best[name] = (priority, pos, raw)
+
+        for compiled in self._rules:
+            rule = compiled.rule
+            if best and all(f in best and best[f][0] < rule.priority for f, _ in compiled.values):
+                continue
+            if compiled.fused is not None:
+                m = self._first_fused(compiled, folded)
+                if m is not None:
+                    for group, (name, _) in enumerate(compiled.values, start=1):
+                        if m.start(group) >= 0:
+                            # Offsets match between folded and original text
+                            offer(name, rule.priority, m.start(), txt[m.start(group):m.end(group)])
+                continue
+            scanned_to = 0
+            m = compiled.anchor.search(folded)
+            while m is not None:
+                start = m.start()
+                if compiled.before is None or compiled.before.search(folded, max(0, start - 8), start):
+                    found = self._search_window(compiled, txt, m.end(), scanned_to)
+                    scanned_to = m.end() + rule.window
+                    if found:
+                        for name, raw in found:
+                            offer(name, rule.priority, start, raw)
+                        # Later matches of this anchor can only sit further into the text
+                        break
+                m = compiled.anchor.search(folded, m.end())
+
+        data = dict(self.defaults)
+        for name, (_, _, raw) in best.items():
+            value = _convert(name, raw, self.money)
+            if value is not None:
+                data[name] = value
+        for name, pattern in self._standalone:
+            if data.get(name) is None:
+                sm = pattern.search(folded)
+                if sm:
+                    data[name] = _convert(name, txt[sm.start(1):sm.end(1)], self.money)
+        return data
+
+
+def _convert(name: str, raw: str, money: FrozenSet[str] = MONEY_FIELDS) -> Optional[Any]:
+    val = raw.replace(',', '').replace('$', '').strip()
+    if name in money:
+        try:
+            return float(val)
+        except ValueError:
+            return None
+    return val
+
+
+# Longest value a search-mode pattern is expected to match
+MAX_VALUE_LEN = 32
+
+W2_DEFAULTS: Dict[str, Any] = {
+    "employee_ssn": None, "employer_ein": None, "employer_name": None,
+    "employee_first_name": None, "employee_last_name": None,
+    "wages": 0.0, "federal_withholding": 0.0,
+    "social_security_wages": 0.0, "social_security_tax": 0.0,
+    "medicare_wages": 0.0, "medicare_tax": 0.0,
+    "state": None, "employer_state_id": None, "state_wages": 0.0, "state_withholding": 0.0,
+}
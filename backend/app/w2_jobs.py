@@ -0,0 +1,365 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.errors import ParseWorkerError, W2ParseError
+from app.parse_cache import CacheValue, ParseCache, cache_key
+from app.parse_lanes import ParseScheduler
+from app.parse_pool import parse_w2
+from app.upload_spool import SpooledUpload
+from app.w2_parser import PARSER_VERSION
+
+logger = logging.getLogger("w2_jobs")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS w2_jobs (
+    id TEXT PRIMARY KEY,
+    job_key TEXT NOT NULL UNIQUE,
+    sha256 TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    filename TEXT,
+    input_path TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    file_type TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS w2_jobs_queue ON w2_jobs (status, created_at);
+"""
+
+
+class JobStore:
+    """
+    The durable W-2 job table in one SQLite file. Pool workers open their own
+    store on the same file to report progress; WAL mode lets them write while
+    the API reads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _row(self, sql: str, args: tuple = ()) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(sql, args).fetchone()
+        return dict(row) if row else None
+
+    def _write(self, sql: str, args: tuple = ()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, args).rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._row("SELECT * FROM w2_jobs WHERE id = ?", (job_id,))
+
+    def find(self, job_key: str) -> Optional[Dict[str, Any]]:
+        return self._row("SELECT * FROM w2_jobs WHERE job_key = ?", (job_key,))
+
+    def create(self, job_key: str, sha256: str, content_type: str, filename: str,
+               input_path: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        """Insert a queued job, or return the existing one for ``job_key`` (created=False)."""
+        now = time.time()
+        inserted = self._write(
+            "INSERT OR IGNORE INTO w2_jobs (id, job_key, sha256, content_type, filename, input_path, status,"
+            " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (uuid.uuid4().hex, job_key, sha256, content_type, filename, input_path, QUEUED, now, now))
+        return self.find(job_key), bool(inserted)
+
+    def retry(self, job_id: str, input_path: str) -> None:
+        self._write("UPDATE w2_jobs SET status = ?, stage = NULL, attempts = 0, error = NULL, input_path = ?,"
+                    " updated_at = ? WHERE id = ? AND status = ?",
+                    (QUEUED, input_path, time.time(), job_id, FAILED))
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job and mark it running."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT id FROM w2_jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                                         (QUEUED,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE w2_jobs SET status = ?, stage = NULL, attempts = attempts + 1,"
+                                       " updated_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        self._write("UPDATE w2_jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id))
+
+    def complete(self, job_id: str, parsed: Dict[str, Any], file_type: str) -> None:
+        self._write("UPDATE w2_jobs SET status = ?, stage = NULL, result = ?, file_type = ?, error = NULL,"
+                    " input_path = NULL, updated_at = ? WHERE id = ?",
+                    (DONE, json.dumps(parsed), file_type, time.time(), job_id))
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._write("UPDATE w2_jobs SET status = ?, stage = NULL, error = ?, input_path = NULL, updated_at = ?"
+                    " WHERE id = ?", (FAILED, error, time.time(), job_id))
+
+    def release(self, job_id: str, refund: bool = False) -> None:
+        """Put a running job back in the queue; ``refund`` undoes its attempt (clean shutdown)."""
+        self._write("UPDATE w2_jobs SET status = ?, stage = NULL, attempts = attempts - ?, updated_at = ?"
+                    " WHERE id = ? AND status = ?", (QUEUED, int(refund), time.time(), job_id, RUNNING))
+
+    def recover(self, max_attempts: int) -> List[Dict[str, Any]]:
+        """
+        Requeue jobs left running by a crashed process, or fail them once they
+        have used up their attempts. Returns the jobs that failed for good.
+        """
+        now = time.time()
+        with self._lock:
+            gave_up = [dict(r) for r in self._conn.execute(
+                "SELECT * FROM w2_jobs WHERE status = ? AND attempts >= ?", (RUNNING, max_attempts)).fetchall()]
+        self._write("UPDATE w2_jobs SET status = ?, stage = NULL, input_path = NULL,"
+                    " error = 'Parsing crashed too many times', updated_at = ?"
+                    " WHERE status = ? AND attempts >= ?", (FAILED, now, RUNNING, max_attempts))
+        requeued = self._write("UPDATE w2_jobs SET status = ?, stage = NULL, updated_at = ? WHERE status = ?",
+                               (QUEUED, now, RUNNING))
+        if requeued or gave_up:
+            logger.warning("Recovered W-2 jobs: %d requeued, %d failed", requeued, len(gave_up))
+        return gave_up
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM w2_jobs GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def run_job(db_path: str, job_id: str, source: str, content_type: str,
+            text_only: bool = False, tenant: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+    """Parse one job's input inside a pool worker, recording each stage in the job table."""
+    store = JobStore(db_path)
+    try:
+        return parse_w2(source, content_type, text_only, tenant, lambda stage: store.set_stage(job_id, stage))
+    finally:
+        store.close()
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A job as the API returns it."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "filename": job["filename"],
+        "sha256": job["sha256"],
+        "attempts": job["attempts"],
+        "file_type": job["file_type"],
+        "parsed_data": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+class JobRunner:
+    """
+    Asynchronous W-2 parse jobs on a durable SQLite queue.
+
+    Submitting persists the upload under ``directory`` and returns at once;
+    ``concurrency`` worker tasks claim queued jobs and parse them on the
+    shared ParseScheduler. Jobs are keyed by file hash, so resubmitting a file
+    returns its existing job.
+
+    Every API process accepts jobs, but only the one holding the directory's
+    lock file runs them; the others wait for the lock, so a process taking
+    over after the runner dies is the only one requeueing the jobs it left
+    running. SQLite calls run in threads, off the event loop.
+    """
+
+    def __init__(self, directory: str, scheduler: ParseScheduler, cache: ParseCache, concurrency: int = 2,
+                 max_attempts: int = 3, poll: float = 1.0, lock_poll: float = 5.0):
+        self.directory = directory
+        self.scheduler = scheduler
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.poll = poll
+        self.lock_poll = lock_poll
+        self._store: Optional[JobStore] = None
+        self._lock_file = None
+        self._leader: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_settings(cls, settings, scheduler: ParseScheduler, cache: ParseCache) -> "JobRunner":
+        return cls(settings.w2_jobs_dir, scheduler, cache, concurrency=settings.w2_job_concurrency,
+                   max_attempts=settings.w2_job_max_attempts)
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            os.makedirs(os.path.join(self.directory, "inputs"), exist_ok=True)
+            self._store = JobStore(os.path.join(self.directory, "jobs.sqlite3"))
+        return self._store
+
+    def _input_path(self, job_key: str) -> str:
+        return os.path.join(self.directory, "inputs", job_key)
+
+    async def _db(self, method: Callable[..., Any], *args) -> Any:
+        """Run a JobStore method in a thread; the store itself is opened there too."""
+        return await asyncio.to_thread(lambda: method(self.store, *args))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._db(JobStore.get, job_id)
+
+    async def submit(self, upload: SpooledUpload, content_type: str, filename: str) -> Tuple[Dict[str, Any], bool]:
+        """Queue a finished upload; returns (job, created). Identical files share one job."""
+        key = cache_key(upload.sha256, PARSER_VERSION, content_type)
+        cached = await self.cache.get(key)
+        job, created = await asyncio.to_thread(self._submit, key, cached, upload, content_type, filename)
+        if job["status"] == QUEUED and self._wakeup is not None:
+            self._wakeup.set()
+        return job, created
+
+    def _submit(self, key: str, cached: Optional[CacheValue], upload: SpooledUpload, content_type: str,
+                filename: str) -> Tuple[Dict[str, Any], bool]:
+        job = self.store.find(key)
+        if job is not None and job["status"] != FAILED:
+            return job, False
+        input_path = None
+        if cached is None:
+            input_path = self._input_path(key)
+            upload.save(input_path)
+        if job is not None:
+            # Resubmitting a failed file retries it
+            self.store.retry(job["id"], input_path)
+            created = True
+        else:
+            job, created = self.store.create(key, upload.sha256, content_type, filename, input_path)
+        if cached is not None:
+            self.store.complete(job["id"], *cached)
+        return self.store.get(job["id"]), created
+
+    def _try_lock(self) -> bool:
+        """Take the jobs directory's runner lock without blocking; released when the process exits."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, "runner.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def start(self) -> None:
+        if self._leader is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._leader = asyncio.create_task(self._lead())
+
+    async def _lead(self) -> None:
+        """Wait for the runner lock, then recover the last runner's jobs and start the workers."""
+        while not await asyncio.to_thread(self._try_lock):
+            logger.debug("W-2 jobs in %s are run by another process", self.directory)
+            await asyncio.sleep(self.lock_poll)
+        for job in await self._db(JobStore.recover, self.max_attempts):
+            self._remove_input(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        tasks = self._tasks + ([self._leader] if self._leader is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks, self._leader = [], None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._db(JobStore.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        try:
+            parsed, file_type = await self.scheduler.run(job["input_path"], job["content_type"], run_job,
+                                                         (self.store.path, job_id), wait=True)
+        except asyncio.CancelledError:
+            # Shutting down: a quick write, done in place rather than awaited
+            self.store.release(job_id, refund=True)
+            raise
+        except ParseWorkerError:
+            # The worker process died; retry unless it keeps happening
+            if job["attempts"] >= self.max_attempts:
+                await self._db(JobStore.fail, job_id, "Parsing crashed too many times")
+                self._remove_input(job)
+            else:
+                await self._db(JobStore.release, job_id)
+            return
+        except W2ParseError as e:
+            await self._db(JobStore.fail, job_id, f"Unable to parse W-2: {e}")
+        except Exception as e:
+            logger.exception("Unexpected error in W-2 job %s: %s", job_id, e)
+            await self._db(JobStore.fail, job_id, "Internal server error while parsing W-2")
+        else:
+            await self.cache.put(job["job_key"], parsed, file_type)
+            await self._db(JobStore.complete, job_id, parsed, file_type)
+        self._remove_input(job)
+
+    def _remove_input(self, job: Dict[str, Any]) -> None:
+        if job.get("input_path"):
+            try:
+                os.unlink(job["input_path"])
+            except FileNotFoundError:
+                pass
+
+    async def events(self, job_id: str, poll: float = 0.25, heartbeat: float = 15.0) -> AsyncIterator[str]:
+        """Server-Sent Events for one job: a ``progress`` event per change, then ``done`` or ``failed``."""
+        last = None
+        quiet_since = time.monotonic()
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+                return
+            state = (job["status"], job["stage"])
+            if state != last:
+                last = state
+                event = job["status"] if job["status"] in FINISHED else "progress"
+                yield f"event: {event}\ndata: {json.dumps(public_job(job))}\n\n"
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= heartbeat:
+                yield ": keep-alive\n\n"
+                quiet_since = time.monotonic()
+            if job["status"] in FINISHED:
+                return
+            await asyncio.sleep(poll)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"running": self._lock_file is not None, "workers": len(self._tasks),
+                "jobs": await self._db(JobStore.counts)}
@@ -0,0 +1,160 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.ocr import OCRBackend
+
+# Width / height of the boxed area of a standard W-2 (Copy B/C/2)
+FORM_ASPECT = 2.08
+# Normalized size the aligned form is warped to before cropping zones
+FORM_WIDTH = 2400
+FORM_HEIGHT = round(FORM_WIDTH / FORM_ASPECT)
+
+MONEY_CONFIG = "--psm 7 -c tessedit_char_whitelist=0123456789.,$"
+ID_CONFIG = "--psm 7 -c tessedit_char_whitelist=0123456789-"
+# State employer IDs mix letters in (e.g. "CA 123-4567-8", "IL1234567")
+STATE_ID_CONFIG = "--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-"
+TEXT_CONFIG = "--psm 7"
+BLOCK_CONFIG = "--psm 6"
+
+
+@dataclass(frozen=True)
+class Zone:
+    field: str
+    box: Tuple[float, float, float, float]  # x0, y0, x1, y1 as fractions of the form
+    kind: str  # money | ssn | ein | state_id | text | block
+
+    @property
+    def config(self) -> str:
+        return {"money": MONEY_CONFIG, "ssn": ID_CONFIG, "ein": ID_CONFIG, "state_id": STATE_ID_CONFIG,
+                "text": TEXT_CONFIG, "block": BLOCK_CONFIG}[self.kind]
+
+
+def _value(x0: float, y0: float, x1: float, y1: float) -> Tuple[float, float, float, float]:
+    """Value area of a cell: everything below the printed box label."""
+    return (x0, y0 + 0.4 * (y1 - y0), x1, y1)
+
+
+# Rows are 1/12 of the form height; columns follow the IRS layout
+_ROW = 1 / 12
+W2_TEMPLATE: Tuple[Zone, ...] = (
+    Zone("employee_ssn", _value(0.22, 0.0, 0.46, _ROW), "ssn"),
+    Zone("employer_ein", _value(0.0, _ROW, 0.58, 2 * _ROW), "ein"),
+    Zone("wages", _value(0.58, _ROW, 0.79, 2 * _ROW), "money"),
+    Zone("federal_withholding", _value(0.79, _ROW, 1.0, 2 * _ROW), "money"),
+    Zone("social_security_wages", _value(0.58, 2 * _ROW, 0.79, 3 * _ROW), "money"),
+    Zone("social_security_tax", _value(0.79, 2 * _ROW, 1.0, 3 * _ROW), "money"),
+    Zone("medicare_wages", _value(0.58, 3 * _ROW, 0.79, 4 * _ROW), "money"),
+    Zone("medicare_tax", _value(0.79, 3 * _ROW, 1.0, 4 * _ROW), "money"),
+    Zone("employer_name", (0.0, 2 * _ROW + 0.02, 0.58, 3 * _ROW + 0.02), "text"),
+    Zone("box12", (0.79, 6 * _ROW, 1.0, 10 * _ROW), "block"),
+    Zone("state", _value(0.0, 10 * _ROW, 0.06, 11 * _ROW), "text"),
+    Zone("employer_state_id", _value(0.06, 10 * _ROW, 0.25, 11 * _ROW), "state_id"),
+    Zone("state_wages", _value(0.25, 10 * _ROW, 0.40, 11 * _ROW), "money"),
+    Zone("state_withholding", _value(0.40, 10 * _ROW, 0.52, 11 * _ROW), "money"),
+)
+
+_MONEY_RE = re.compile(r"\d[\d,]*(?:\.\d{1,2})?")
+_STATE_RE = re.compile(r"\b([A-Z]{2})\b")
+# Box 12 codes: A-Z except I and O (Q is nontaxable combat pay)
+_BOX12_RE = re.compile(r"\b([A-HJ-NP-Z]{1,2})\s*\$?\s*(\d[\d,]*\.\d{2})")
+
+
+def align_to_template(gray: np.ndarray) -> np.ndarray:
+    """
+    Warp the W-2's outer border onto a FORM_WIDTH x FORM_HEIGHT canvas. If no
+    plausible border is found the whole image is treated as the form.
+    """
+    h, w = gray.shape[:2]
+    binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    quad = None
+    if contours:
+        largest = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(largest) > 0.25 * w * h:
+            approx = cv2.approxPolyDP(largest, 0.02 * cv2.arcLength(largest, True), True)
+            if len(approx) == 4:
+                quad = approx.reshape(4, 2).astype(np.float32)
+    if quad is None:
+        return cv2.resize(gray, (FORM_WIDTH, FORM_HEIGHT), interpolation=cv2.INTER_AREA)
+
+    # Order corners: top-left, top-right, bottom-right, bottom-left
+    s, d = quad.sum(axis=1), np.diff(quad, axis=1).ravel()
+    src = np.array([quad[np.argmin(s)], quad[np.argmin(d)], quad[np.argmax(s)], quad[np.argmax(d)]])
+    dst = np.array([[0, 0], [FORM_WIDTH - 1, 0], [FORM_WIDTH - 1, FORM_HEIGHT - 1], [0, FORM_HEIGHT - 1]],
+                   dtype=np.float32)
+    M = cv2.getPerspectiveTransform(src, dst)
+    return cv2.warpPerspective(gray, M, (FORM_WIDTH, FORM_HEIGHT), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+
+def crop_zone(form: np.ndarray, zone: Zone, pad: int = 4) -> np.ndarray:
+    h, w = form.shape[:2]
+    x0, y0, x1, y1 = zone.box
+    return form[max(0, int(y0 * h) + pad):min(h, int(y1 * h) - pad),
+                max(0, int(x0 * w) + pad):min(w, int(x1 * w) - pad)]
+
+
+def ocr_zones(form: np.ndarray, backend: OCRBackend, max_workers: int = 4,
+              fields: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """OCR the template zones of an aligned form concurrently; all of them unless ``fields`` is given."""
+    wanted = None if fields is None else set(fields)
+    zones = [z for z in W2_TEMPLATE if wanted is None or z.field in wanted]
+
+    def run(zone: Zone) -> Tuple[str, str]:
+        crop = np.ascontiguousarray(crop_zone(form, zone))
+        return zone.field, backend.image_to_string(crop, config=zone.config).strip()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(run, zones))
+
+
+def _money(text: str) -> Optional[float]:
+    m = _MONEY_RE.search(text.replace(' ', ''))
+    if not m:
+        return None
+    try:
+        return float(m.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _digits(text: str, groups: Tuple[int, ...]) -> Optional[str]:
+    digits = re.sub(r"\D", "", text)
+    if len(digits) != sum(groups):
+        return None
+    parts, i = [], 0
+    for n in groups:
+        parts.append(digits[i:i + n])
+        i += n
+    return "-".join(parts)
+
+
+def zones_to_fields(texts: Dict[str, str]) -> Dict[str, Any]:
+    """Turn raw zone OCR text into the parser's field dict."""
+    state = _STATE_RE.search(texts.get("state", ""))
+    name = texts.get("employer_name", "").strip()
+    state_id = texts.get("employer_state_id", "").strip()
+    return {
+        "employee_ssn": _digits(texts.get("employee_ssn", ""), (3, 2, 4)),
+        "employer_ein": _digits(texts.get("employer_ein", ""), (2, 7)),
+        "employer_name": name or None,
+        "employee_first_name": None,
+        "employee_last_name": None,
+        "wages": _money(texts.get("wages", "")),
+        "federal_withholding": _money(texts.get("federal_withholding", "")),
+        "social_security_wages": _money(texts.get("social_security_wages", "")),
+        "social_security_tax": _money(texts.get("social_security_tax", "")),
+        "medicare_wages": _money(texts.get("medicare_wages", "")),
+        "medicare_tax": _money(texts.get("medicare_tax", "")),
+        "box12": [{"code": c, "amount": float(a.replace(',', ''))}
+                  for c, a in _BOX12_RE.findall(texts.get("box12", ""))],
+        "state": state.group(1) if state else None,
+        "employer_state_id": state_id or None,
+        "state_wages": _money(texts.get("state_wages", "")),
+        "state_withholding": _money(texts.get("state_withholding", "")),
+    }
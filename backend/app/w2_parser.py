@@ -1,290 +1,548 @@
+import hashlib
+import io
+import mmap
 import os
 import re
-import tempfile
 import logging
-from typing import Dict, Any, Tuple
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple, Union, BinaryIO, Iterator
+
+from app.lazy_import import lazy_import
+
+# Heavy optional dependencies load on first use (or in warm_up), not at import
+pdfplumber = lazy_import("pdfplumber")
+pdfplumber_page = lazy_import("pdfplumber.page")
+pdfpage = lazy_import("pdfminer.pdfpage")
+pdftypes = lazy_import("pdfminer.pdftypes")
+Image = lazy_import("PIL.Image")
+ImageFilter = lazy_import("PIL.ImageFilter")
+ImageOps = lazy_import("PIL.ImageOps")
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+w2_layout = lazy_import("app.w2_layout")
+deskew = lazy_import("app.deskew")
+image_decode = lazy_import("app.image_decode")
+phash = lazy_import("app.phash")
+
+from app.config import get_settings
+from app.errors import W2ParseError
+from app.form_schemas import FORMS, W2_FORM, FormSchema, detect_form, get_form
+from app.ocr import OCRBackend, get_ocr_backend
+from app.w2_confidence import TieredExtraction
+from app.w2_geometry import extract_page, merge_pages
+from app.w2_profiles import get_profile_index
+from app.tracing import span
+from app.w2_split import PageRead, employee_name, merge_instances, segment_pages
 
-try:
-    import pdfplumber
-except ImportError:
-    pdfplumber = None
+logger = logging.getLogger("w2_parser")
+logging.basicConfig(level=logging.INFO)
 
-try:
-    from PIL import Image, ImageFilter, ImageOps
-except ImportError:
-    Image = None
+# Bump whenever extraction output can change (rules, profiles, OCR configs, text
+# normalization); it is part of the parse-cache and job keys
+PARSER_VERSION = "10"
 
-try:
-    import pytesseract
-except ImportError:
-    pytesseract = None
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 4 * 1024 * 1024
 
-try:
-    import cv2
-except ImportError:
-    cv2 = None
+STATE_ZIP_RE = re.compile(r"([A-Z]{2}) [0-9]{5}")
+# The only text that differs between copies B, C and 2 of one W-2
+COPY_LEGEND_RE = re.compile(r"\bcopy\s+([a-d12])\b[^\n]*", re.I)
 
-from app.errors import W2ParseError
+# A path, the raw bytes, or a binary file object
+Source = Union[str, bytes, bytearray, BinaryIO]
 
-logger = logging.getLogger("w2_parser")
-logging.basicConfig(level=logging.INFO)
+# An extraction tier: given the fields still failing (None = all), return what it found
+Tier = Tuple[str, Callable[[Optional[Sequence[str]]], Optional[Dict[str, Any]]]]
+# Called with the stage name (text_extraction, ocr, parse) as parsing moves through it
+Progress = Optional[Callable[[str], None]]
+# Progress stage reported while each extraction tier runs
+TIER_STAGES = {"text": "parse", "geometry": "parse", "zonal": "ocr", "ocr": "ocr"}
 
 class W2Parser:
-    """Robust W-2 parser for both text-based and scanned PDFs."""
+    """
+    Robust parser for W-2s and 1099s (NEC, INT, DIV, R), text-based or
+    scanned. Every form shares the decode, preprocess, OCR and cache stages;
+    the form type (app.form_schemas) is detected from the document's text
+    unless given, and each result carries it as ``form_type``.
+    """
+
+    def __init__(self, ocr_backend: Optional[OCRBackend] = None):
+        self._ocr_backend = ocr_backend
+        self._ocr_cache = None
+
+    def warm_up(self, ocr: bool = True) -> Dict[str, float]:
+        """
+        Load the lazily imported PDF/image/OCR libraries and layout profiles
+        and, if ``ocr``, run a tiny OCR so the first real parse isn't the one
+        paying for it. Returns milliseconds per step; a missing dependency or
+        OCR engine is logged, not raised.
+        """
+        timings: Dict[str, float] = {}
+
+        def step(name: str, fn: Callable[[], Any]) -> None:
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                logger.warning("W-2 parser warm-up step %s failed: %s", name, e)
+            timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+        step("imports", lambda: [module.load() for module in
+                                 (pdfplumber, pdfplumber_page, pdfpage, pdftypes, Image, ImageFilter,
+                                  ImageOps, cv2, np, w2_layout, deskew, image_decode, phash)])
+        step("profiles", lambda: [get_profile_index(form) for form in FORMS]
+             + [self._parse_text("Employee's social security number 123-45-6789")])
+        if ocr and Image:
+            step("ocr", lambda: self._ocr(Image.new("L", (64, 32), 255)))
+        return timings
+
+    @property
+    def ocr_backend(self) -> OCRBackend:
+        if self._ocr_backend is None:
+            self._ocr_backend = get_ocr_backend()
+        return self._ocr_backend
+
+    @property
+    def ocr_cache(self) -> "phash.OCRCache":
+        """OCR text of recently seen images, found by perceptual hash."""
+        if self._ocr_cache is None:
+            self._ocr_cache = phash.OCRCache.from_settings(get_settings())
+        return self._ocr_cache
 
     def _clean_text(self, txt: str) -> str:
         return re.sub(r"\s+", " ", txt)
 
-    def _parse_text(self, txt: str) -> Dict[str, Any]:
+    def _parse_text(self, txt: str, form: Optional[FormSchema] = None) -> Dict[str, Any]:
+        """Fields of ``form`` (detected from the text, else W-2) read from plain text."""
         if not txt:
             raise W2ParseError('Empty text extracted from document')
-        txt = self._clean_text(txt)
-        logger.info(f"Extracted W-2 text: {txt[:500]}...")  # Log first 500 chars
-
-        data: Dict[str, Any] = {}
-
-        # Strategy 1: Clean format with colons and dollar signs (like w2-wages-2024.pdf)
-        if "Employee's social security number:" in txt and "$" in txt:
-            data = self._parse_clean_format(txt)
-        # Strategy 2: Jumbled format (like w2 1 page.pdf)
-        elif "Employer identitication number (EIN)" in txt:
-            data = self._parse_jumbled_format(txt)
-        # Strategy 3: Fallback - try to extract what we can
-        else:
-            data = self._parse_fallback_format(txt)
-
-        return data
-
-    def _parse_clean_format(self, txt: str) -> Dict[str, Any]:
-        """Parse clean, colon-separated format with dollar signs."""
-
-        def extract(pattern, is_money=False):
-            m = re.search(pattern, txt, re.I)
-            if m:
-                val = m.group(1).replace(',', '').replace('$', '').strip()
-                return float(val) if is_money else val
-            return None if not is_money else 0.0
-
-        return {
-            "employee_ssn": extract(r"Employee'?s? social security number[:\s]*([0-9\-]{9,})"),
-            "employer_ein": extract(r"Employer identification number[:\s]*([0-9\-]{9,})"),
-            "employer_name": extract(r"Employer'?s? name and address:\s*([A-Za-z0-9 ,.&'-]+)"),
-            "employee_first_name": extract(r"Employee'?s? name and address:\s*([A-Za-z]+)"),
-            "employee_last_name": extract(r"Employee'?s? name and address:\s*[A-Za-z]+ ([A-Za-z]+)"),
-            "wages": extract(r"1[.\)]? Wages, tips, other compensation[:\s]*\$?([0-9,\.]+)", is_money=True),
-            "federal_withholding": extract(r"2[.\)]? Federal income tax withheld[:\s]*\$?([0-9,\.]+)", is_money=True),
-            "social_security_wages": extract(r"3[.\)]? Social security wages[:\s]*\$?([0-9,\.]+)", is_money=True),
-            "social_security_tax": extract(r"4[.\)]? Social security tax withheld[:\s]*\$?([0-9,\.]+)", is_money=True),
-            "medicare_wages": extract(r"5[.\)]? Medicare wages and tips[:\s]*\$?([0-9,\.]+)", is_money=True),
-            "medicare_tax": extract(r"6[.\)]? Medicare tax withheld[:\s]*\$?([0-9,\.]+)", is_money=True),
-            "state": extract(r"([A-Z]{2}) [0-9]{5}"),
-            "employer_state_id": None,
-            "state_wages": 0.0,
-            "state_withholding": 0.0
-        }
-
-    def _parse_jumbled_format(self, txt: str) -> Dict[str, Any]:
-        """Parse jumbled format where values follow labels in sequence."""
-
-        data: Dict[str, Any] = {}
-
-        # EIN, Wages, Federal Withholding (all together)
-        ein_block = re.search(
-            r"Employer identitication number \(EIN\) 1 Wages, tips, other compensation 2 Federal income tax withheld\s*([A-Z0-9]+)\s+([0-9]+)\s+([0-9]+)",
-            txt, re.I)
-        if ein_block:
-            data["employer_ein"] = ein_block.group(1)
-            data["wages"] = float(ein_block.group(2))
-            data["federal_withholding"] = float(ein_block.group(3))
-        else:
-            data["employer_ein"] = None
-            data["wages"] = 0.0
-            data["federal_withholding"] = 0.0
-
-        # Social Security Wages & Tax
-        ss_block = re.search(
-            r"3 Social security wages 4 Social security tax withheld\s*([0-9]+)\s+([0-9]+)",
-            txt, re.I)
-        if ss_block:
-            data["social_security_wages"] = float(ss_block.group(1))
-            data["social_security_tax"] = float(ss_block.group(2))
+        with span("regex"):
+            txt = self._clean_text(txt)
+            form = form or detect_form(txt) or W2_FORM
+            # Dispatch on the document's label fingerprint to one of the form's layout profiles
+            profile = get_profile_index(form.form_type).match(txt)
+            logger.debug("%s layout profile: %s", form.title, profile.name)
+            return profile.table.extract(txt)
+
+    @contextmanager
+    def _open_source(self, source: Source) -> Iterator[BinaryIO]:
+        """Yield a seekable binary stream over ``source`` without copying it to disk."""
+        if isinstance(source, (bytes, bytearray)):
+            yield io.BytesIO(source)
+        elif isinstance(source, str):
+            with open(source, 'rb') as fh:
+                size = os.fstat(fh.fileno()).st_size
+                if size >= MMAP_THRESHOLD:
+                    with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        yield mm
+                else:
+                    yield io.BytesIO(fh.read())
         else:
-            data["social_security_wages"] = 0.0
-            data["social_security_tax"] = 0.0
-
-        # Medicare Wages & Tax
-        med_block = re.search(
-            r"5 Medicare wages and tips 6 Medicare tax withheld\s*([0-9]+)\s+([0-9]+)",
-            txt, re.I)
-        if med_block:
-            data["medicare_wages"] = float(med_block.group(1))
-            data["medicare_tax"] = float(med_block.group(2))
-        else:
-            data["medicare_wages"] = 0.0
-            data["medicare_tax"] = 0.0
-
-        # Employer name/address (grab everything after "ZIP code" up to "3 Social security wages")
-        emp_addr_block = re.search(
-            r"ZIP code\s*(.*?)3 Social security wages", txt, re.I)
-        if emp_addr_block:
-            data["employer_name"] = emp_addr_block.group(1).strip()
-        else:
-            data["employer_name"] = None
-
-        # Employee SSN (try to find it)
-        ssn_block = re.search(r"Employee'?s? social security number.*?([0-9]{3}-[0-9]{2}-[0-9]{4})", txt, re.I)
-        if ssn_block:
-            data["employee_ssn"] = ssn_block.group(1)
-        else:
-            data["employee_ssn"] = None
-
-        # Employee name (not always extractable in this format)
-        data["employee_first_name"] = None
-        data["employee_last_name"] = None
-
-        # State info (not present in this sample format)
-        data["state"] = None
-        data["employer_state_id"] = None
-        data["state_wages"] = 0.0
-        data["state_withholding"] = 0.0
-
+            source.seek(0)
+            yield source
+
+    def _buffer(self, stream: BinaryIO):
+        """Zero-copy view of a stream's bytes where possible."""
+        if isinstance(stream, io.BytesIO):
+            return stream.getbuffer()
+        if isinstance(stream, mmap.mmap):
+            return stream
+        stream.seek(0)
+        return stream.read()
+
+    def _iter_pdf_pages(self, stream: BinaryIO, start: int = 0,
+                        stop: Optional[int] = None) -> Iterator[Tuple[int, str, List[Dict[str, Any]], float]]:
+        """
+        Yield (page number, text, word boxes, width) for pages ``start`` to
+        ``stop`` (0-based, exclusive) one at a time. Pages are created lazily
+        and their parsed layout is dropped once read, so memory stays flat
+        however many pages the PDF has.
+        """
+        if not pdfplumber:
+            raise W2ParseError('pdfplumber not installed')
+        with pdfplumber.open(stream) as pdf:
+            doctop = 0.0
+            for index, pdf_page in enumerate(pdfpage.PDFPage.create_pages(pdf.doc)):
+                if stop is not None and index >= stop:
+                    break
+                page = pdfplumber_page.Page(pdf, pdf_page, page_number=index + 1, initial_doctop=doctop)
+                doctop += page.height
+                if index < start:
+                    continue
+                try:
+                    with span("pdf_text"):
+                        text, words = page.extract_text() or '', page.extract_words()
+                    yield index + 1, text, words, float(page.width)
+                finally:
+                    page.flush_cache()
+
+    def _page_count(self, stream: BinaryIO) -> int:
+        with pdfplumber.open(stream) as pdf:
+            return int(pdftypes.resolve1(pdf.doc.catalog["Pages"]).get("Count", 0))
+
+    def _page_digest(self, text: str) -> bytes:
+        """Hash of a page's text that is equal for every copy of the same W-2."""
+        normalized = " ".join(COPY_LEGEND_RE.sub("", text).split())
+        return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+    def _geometry_extract(self, page_fields: List[Dict[str, Any]], txt: str = '') -> Optional[Dict[str, Any]]:
+        """Merge per-page ``extract_page`` results; None without a text layer."""
+        if not page_fields:
+            return None
+        with span("geometry"):
+            data = merge_pages(page_fields)
+        if data["state"] is None:
+            m = STATE_ZIP_RE.search(txt)
+            data["state"] = m.group(1) if m else None
         return data
 
-    def _parse_fallback_format(self, txt: str) -> Dict[str, Any]:
-        """Fallback parser for unknown formats - extract what we can."""
-
-        data: Dict[str, Any] = {}
-
-        # Try to find common patterns with flexible matching
-        patterns = {
-            "employee_ssn": [
-                r"([0-9]{3}-[0-9]{2}-[0-9]{4})",
-                r"([0-9]{9})"
-            ],
-            "employer_ein": [
-                r"EIN.*?([0-9]{2}-[0-9]{7})",
-                r"identification.*?([0-9]{2}-[0-9]{7})"
-            ],
-            "wages": [
-                r"Wages.*?([0-9,]+\.?[0-9]*)",
-                r"1.*?compensation.*?([0-9,]+\.?[0-9]*)"
-            ],
-            "federal_withholding": [
-                r"Federal.*?withheld.*?([0-9,]+\.?[0-9]*)",
-                r"2.*?Federal.*?([0-9,]+\.?[0-9]*)"
-            ]
-        }
-
-        # Extract using flexible patterns
-        for field, field_patterns in patterns.items():
-            data[field] = None
-            for pattern in field_patterns:
-                match = re.search(pattern, txt, re.I)
-                if match:
-                    val = match.group(1).replace(',', '').strip()
-                    if field in ["wages", "federal_withholding"]:
-                        try:
-                            data[field] = float(val)
-                            break
-                        except ValueError:
-                            continue
-                    else:
-                        data[field] = val
-                        break
-
-            # Set default values for numeric fields
-            if field in ["wages", "federal_withholding"] and data[field] is None:
-                data[field] = 0.0
-
-        # Set remaining fields to defaults
-        for field in ["employer_name", "employee_first_name", "employee_last_name",
-                      "state", "employer_state_id"]:
-            if field not in data:
-                data[field] = None
-
-        for field in ["social_security_wages", "social_security_tax",
-                      "medicare_wages", "medicare_tax", "state_wages", "state_withholding"]:
-            if field not in data:
+    def _fill_money_defaults(self, data: Dict[str, Any], form: FormSchema = W2_FORM) -> Dict[str, Any]:
+        for field in form.money_fields:
+            if data.get(field) is None:
                 data[field] = 0.0
-
         return data
 
-    def _parse_pdf(self, path: str) -> str:
-        if not pdfplumber:
-            raise W2ParseError('pdfplumber not installed')
-        text_parts = []
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text() or ''
-                text_parts.append(text)
-        full_text = "\n".join(text_parts)
-        print("=== W2 Extracted Text ===")
-        print(full_text)
-        return full_text
-
-    def _preprocess_image(self, img_path: str) -> str:
+    def _preprocess_image(self, stream: BinaryIO) -> "Union[np.ndarray, Image.Image]":
+        """Decode once and clean up for OCR; a uint8 grayscale array when OpenCV is available."""
+        with span("preprocess"):
+            if cv2:
+                try:
+                    return self._preprocess_array(stream)
+                except Exception as e:
+                    logger.warning(f"OpenCV processing failed: {e}, using PIL only")
+            return self._preprocess_pil(stream)
+
+    def _preprocess_array(self, stream: BinaryIO) -> "np.ndarray":
+        # Decoded straight to one channel at OCR resolution, already upright
+        gray, _ = image_decode.decode_array_for_ocr(self._buffer(stream), stream, get_settings().w2_ocr_dpi)
+        gray = cv2.medianBlur(gray, 3)
+        # Autocontrast as a single in-place LUT pass over the denoised pixels
+        lo, hi = int(gray.min()), int(gray.max())
+        if hi > lo:
+            lut = np.clip((np.arange(256, dtype=np.float32) - lo) * (255.0 / (hi - lo)), 0, 255).astype(np.uint8)
+            cv2.LUT(gray, lut, dst=gray)
+        return self._deskew(gray)
+
+    def _deskew(self, gray: "np.ndarray") -> "np.ndarray":
+        with span("deskew"):
+            gray, skew = deskew.deskew(gray)
+        logger.debug("Deskew angle=%.2f applied=%s in %.1fms", skew.angle, skew.applied, skew.elapsed_ms)
+        return gray
+
+    def _preprocess_pil(self, stream: BinaryIO) -> "Image.Image":
         if not Image:
             raise W2ParseError('Pillow not installed')
-        img = Image.open(img_path)
-        img = ImageOps.grayscale(img)
+        img, _ = image_decode.decode_for_ocr(stream, get_settings().w2_ocr_dpi)
         img = img.filter(ImageFilter.MedianFilter())
-        img = ImageOps.autocontrast(img)
-        if cv2:
-            try:
-                cv_img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                coords = cv2.findNonZero(cv2.threshold(cv_img, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1])
-                if coords is not None:
-                    angle = cv2.minAreaRect(coords)[-1]
-                    if angle < -45:
-                        angle = -(90 + angle)
-                    else:
-                        angle = -angle
-                    (h, w) = cv_img.shape[:2]
-                    M = cv2.getRotationMatrix2D((w//2, h//2), angle, 1.0)
-                    cv_img = cv2.warpAffine(cv_img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-                    tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                    cv2.imwrite(tmp.name, cv_img)
-                    img = Image.open(tmp.name)
-            except Exception as e:
-                logger.warning(f"OpenCV processing failed: {e}, using PIL only")
-
-        processed = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        img.save(processed.name, dpi=(300,300))
-        return processed.name
+        return ImageOps.autocontrast(img)
 
-    def _ocr(self, img_path: str) -> str:
-        if not pytesseract:
-            raise W2ParseError('pytesseract not installed')
+    def _ocr(self, img: "Union[np.ndarray, Image.Image]", config: Optional[str] = None) -> str:
+        config = config or f'--psm 6 --dpi {get_settings().w2_ocr_dpi}'
+        backend = self.ocr_backend
         try:
-            text = pytesseract.image_to_string(Image.open(img_path), config='--psm 6')
-            return text
+            with span("ocr"):
+                return backend.image_to_string(img, config=config)
         except Exception as e:
             logger.error(f"OCR failed: {e}")
             raise W2ParseError(f"OCR processing failed: {e}")
 
-    def _parse_image(self, path: str) -> str:
-        processed = self._preprocess_image(path)
-        return self._ocr(processed)
+    def _cached_ocr(self, img: "Union[np.ndarray, Image.Image]", texts: Dict[str, Any]) -> str:
+        """Full-page OCR text, read once per cache entry ``texts``."""
+        if "page" not in texts:
+            texts["page"] = self._ocr(img)
+        return texts["page"]
+
+    def _zonal_extract(self, img: "Union[np.ndarray, Image.Image]", fields: Optional[Sequence[str]] = None,
+                       texts: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        OCR only the template boxes of an aligned W-2, restricted to ``fields``
+        if given. Zones already in the cache entry ``texts`` are not read
+        again. Returns None when zonal OCR is off or fails.
+        """
+        settings = get_settings()
+        if not settings.w2_zonal_ocr or not cv2:
+            return None
+        wanted = [zone.field for zone in w2_layout.W2_TEMPLATE if fields is None or zone.field in fields]
+        zones = texts.setdefault("zones", {}) if texts is not None else {}
+        missing = [field for field in wanted if field not in zones]
+        if missing:
+            gray = img if isinstance(img, np.ndarray) else np.asarray(img.convert('L'))
+            try:
+                with span("zonal"):
+                    zones.update(w2_layout.ocr_zones(w2_layout.align_to_template(gray), self.ocr_backend,
+                                                     settings.w2_zonal_threads, missing))
+            except Exception as e:
+                logger.warning(f"Zonal OCR failed: {e}")
+                return None
+        return w2_layout.zones_to_fields({field: zones[field] for field in wanted})
+
+    def _run_tiers(self, tiers: List[Tier], progress: Progress = None,
+                   result: Optional[TieredExtraction] = None, form: FormSchema = W2_FORM) -> TieredExtraction:
+        """
+        Run extraction tiers cheapest first, stopping as soon as every checked
+        field of ``form`` is confident enough. Later tiers only replace values
+        they score higher on, so a good text layer never pays for OCR.
+        ``result`` carries on from tiers that already ran.
+        """
+        if result is None:
+            result = self._new_result(form)
+        stage = None
+        for name, tier in tiers:
+            if result.tiers and not result.failing():
+                break
+            if progress and TIER_STAGES[name] != stage:
+                stage = TIER_STAGES[name]
+                progress(stage)
+            try:
+                data = tier(result.failing())
+            except Exception as e:
+                logger.warning("W-2 %s extraction failed: %s", name, e)
+                result.error = e
+                continue
+            if data is not None:
+                result.offer(name, data)
+        return result
+
+    def _new_result(self, form: FormSchema) -> TieredExtraction:
+        return TieredExtraction(get_settings().w2_min_confidence, form.checked_fields)
+
+    def _finish(self, result: TieredExtraction, form: FormSchema = W2_FORM) -> Dict[str, Any]:
+        if not result.tiers:
+            if isinstance(result.error, W2ParseError):
+                raise result.error
+            raise W2ParseError(str(result.error) if result.error else f'No {form.title} fields could be extracted')
+        logger.debug("%s extraction stopped at %s; failing fields: %s", form.title, result.tiers[-1],
+                     result.failing())
+        return {**self._fill_money_defaults(result.result(), form), "form_type": form.form_type}
+
+    def _text_layer(self, texts: List[str], page_fields: List[Dict[str, Any]],
+                    form: Optional[FormSchema] = None) -> Tuple[Optional[FormSchema], TieredExtraction]:
+        """
+        Text and geometry tiers over the pages read so far, as ``form`` if
+        given or else the form the text names (None if it names none, parsed
+        as a W-2). Geometry reads W-2 box labels, so only W-2s use it.
+        """
+        raw = "\n".join(texts)
+        form = form or detect_form(raw)
+        return form, self._run_tiers(self._layer_tiers(raw, page_fields, form or W2_FORM), None, None, form or W2_FORM)
+
+    def _layer_tiers(self, raw: str, page_fields: List[Dict[str, Any]], form: FormSchema) -> List[Tier]:
+        """Text then geometry tiers over ``raw`` and its pages' word fields."""
+        tiers: List[Tier] = [("text", lambda fields: self._parse_text(raw, form) if raw.strip() else None)]
+        if form.layout and page_fields:
+            tiers.append(("geometry", lambda fields: self._geometry_extract(page_fields, raw)))
+        return tiers
+
+    def _ocr_tiers(self, image: Callable[[], Any], texts: Dict[str, Any], form: Optional[FormSchema],
+                   result: Optional[TieredExtraction], progress: Progress = None) -> Dict[str, Any]:
+        """
+        Finish a parse with zonal then full-page OCR of ``image()``, reading
+        OCR text through the cache entry ``texts``. Zonal OCR reads the W-2
+        template's boxes, so it only runs for a W-2 or a form not known yet
+        (``form`` None); the page text then settles an unknown form, and a
+        form other than a W-2 is extracted from that text alone.
+        """
+        expected = form or W2_FORM
+        detected: List[FormSchema] = []
+
+        def full_page(fields: Optional[Sequence[str]]) -> Optional[Dict[str, Any]]:
+            page = self._cached_ocr(image(), texts)
+            found = form or detect_form(page) or W2_FORM
+            if found is not expected:
+                # Not the form the earlier tiers read; start over below
+                detected.append(found)
+                return None
+            return self._parse_text(page, found)
+
+        tiers: List[Tier] = [("ocr", full_page)]
+        if expected.layout:
+            tiers.insert(0, ("zonal", lambda fields: self._zonal_extract(image(), fields, texts)))
+        result = self._run_tiers(tiers, progress, result, expected)
+        if detected:
+            expected = detected[0]
+            result = self._run_tiers([("ocr", lambda fields: self._parse_text(texts["page"], expected))],
+                                     progress, None, expected)
+        return self._finish(result, expected)
+
+    def _with_ocr(self, stream: BinaryIO, page_number: int, result: Optional[TieredExtraction],
+                  progress: Progress = None, form: Optional[FormSchema] = None) -> Dict[str, Any]:
+        """Finish a PDF parse with the OCR tiers on one page, if the text layer fell short."""
+        rendered: List[Any] = []
+
+        def page_image():
+            # Rendered at most once, and only if an OCR tier runs
+            if not rendered:
+                stream.seek(0)
+                with span("rasterize"), pdfplumber.open(stream) as pdf:
+                    if len(pdf.pages) < page_number:
+                        raise W2ParseError('PDF has no pages' if page_number == 1 else f'PDF has no page {page_number}')
+                    rendered.append(pdf.pages[page_number - 1].to_image(resolution=get_settings().w2_ocr_dpi).original)
+            return rendered[0]
+
+        return self._ocr_tiers(page_image, {}, form, result, progress)
+
+    def _parse_pdf_tiers(self, stream: BinaryIO, progress: Progress = None, text_only: bool = False,
+                         form: Optional[FormSchema] = None) -> Dict[str, Any]:
+        if progress:
+            progress("text_extraction")
+        texts: List[str] = []
+        page_fields: List[Dict[str, Any]] = []
+        seen = set()
+        result: Optional[TieredExtraction] = None
+        found = form
+        for _, text, words, width in self._iter_pdf_pages(stream):
+            digest = self._page_digest(text)
+            if digest in seen:
+                # Another copy (B, C, 2) of a page already read
+                continue
+            seen.add(digest)
+            texts.append(text)
+            fields: List[Dict[str, Any]] = []
+            if words:
+                with span("geometry"):
+                    fields.append(extract_page(words, width))
+                page_fields.extend(fields)
+            named = found or detect_form(text)
+            if result is not None and found is None and named not in (None, W2_FORM):
+                # The first page to name a form other than a W-2; the pages
+                # before it were read as a W-2, so read them all again once
+                found, result = self._text_layer(texts, page_fields, named)
+            else:
+                # Only the new page is extracted; offering it to the running
+                # result keeps each field's best value from the pages before
+                found = named
+                result = self._run_tiers(self._layer_tiers(text, fields, found or W2_FORM), None,
+                                         result, found or W2_FORM)
+            if not result.failing():
+                # Every checked field is in; the remaining pages can't improve it
+                break
+        if get_settings().w2_debug_text:
+            logger.info("Extracted document text:\n%s", "\n".join(texts))
+        if text_only:
+            return self._finish(result or self._new_result(found or W2_FORM), found or W2_FORM)
+        return self._with_ocr(stream, 1, result, progress, found)
+
+    def read_pages(self, source: Source, start: int = 0,
+                   stop: Optional[int] = None) -> Tuple[List[PageRead], int]:
+        """
+        Read pages ``start`` to ``stop`` of a PDF for splitting, plus the
+        document's page count. Each page is read with the profiles of the
+        form it names (a W-2 if none), and a W-2 page's geometry is
+        extracted here so it is not read twice.
+        """
+        try:
+            with self._open_source(source) as stream:
+                reads = []
+                for number, text, words, width in self._iter_pdf_pages(stream, start, stop):
+                    form = detect_form(text) or W2_FORM
+                    with span("regex"):
+                        data = get_profile_index(form.form_type).match(text).table.extract(text) \
+                            if text.strip() else {}
+                    with span("geometry"):
+                        fields = extract_page(words, width) if words and form.layout else None
+                    legend = COPY_LEGEND_RE.search(text)
+                    reads.append(PageRead(number, text, fields, self._page_digest(text).hex(),
+                                          data.get(form.recipient_fields[0]),
+                                          legend.group(1).lower() if legend else None,
+                                          employee_name(data, form) or employee_name(fields)))
+                stream.seek(0)
+                return reads, self._page_count(stream)
+        except W2ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"W2ParseError: {e}")
+            raise W2ParseError(str(e)) from e
 
-    def parse_file(self, path: str, content_type: str = '') -> Tuple[Dict[str, Any], str]:
+    def parse_segment(self, source: Source, segment: Sequence[PageRead], progress: Progress = None,
+                      text_only: bool = False) -> Dict[str, Any]:
+        """Parse one form instance of a split PDF from its pages' reads, each copy read once."""
+        unique = list({p.digest: p for p in reversed(segment)}.values())[::-1]
         try:
-            if content_type == 'application/pdf' or path.lower().endswith('.pdf'):
-                raw = self._parse_pdf(path)
-                # Fallback: If text is too short, try OCR on first page image
-                if len(raw.strip()) < 50 and pdfplumber:
-                    try:
-                        with pdfplumber.open(path) as pdf:
-                            if pdf.pages:
-                                img = pdf.pages[0].to_image(resolution=300)
-                                tmp_img = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                                img.save(tmp_img.name, format='PNG')
-                                raw = self._ocr(tmp_img.name)
-                    except Exception as e:
-                        logger.warning(f"OCR fallback failed: {e}")
-                return self._parse_text(raw), 'pdf'
+            form, result = self._text_layer([p.text for p in unique], [p.fields for p in unique if p.fields])
+            if text_only or not result.failing():
+                data = self._finish(result, form or W2_FORM)
             else:
-                raw = self._parse_image(path)
-                return self._parse_text(raw), 'image'
+                with self._open_source(source) as stream:
+                    data = self._with_ocr(stream, segment[0].number, result, progress, form)
+        except Exception as e:
+            logger.error(f"W2ParseError: {e}")
+            raise W2ParseError(str(e)) from e
+        data["pages"] = [p.number for p in segment]
+        return data
+
+    def _parse_image(self, stream: BinaryIO, progress: Progress = None,
+                     form: Optional[FormSchema] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        if progress:
+            progress("ocr")
+        processed = self._preprocess_image(stream)
+        fp, texts = self._ocr_cache_entry(processed, tenant)
+        if form is None and "page" in texts:
+            # A near-duplicate's page text already says which form this is
+            form = detect_form(texts["page"])
+        try:
+            return self._ocr_tiers(lambda: processed, texts, form, None, progress)
+        finally:
+            if fp is not None:
+                self.ocr_cache.put(tenant, fp, texts)
+
+    def _ocr_cache_entry(self, img: "Union[np.ndarray, Image.Image]",
+                         tenant: Optional[str]) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """
+        The image's fingerprint and the OCR texts of a verified near-duplicate
+        ``tenant`` uploaded before (empty if none). Needs OpenCV, which
+        verification uses. Without a tenant the cache is not used at all.
+        """
+        if tenant is None or self.ocr_cache.max_entries <= 0 or not cv2 or not isinstance(img, np.ndarray):
+            return None, {}
+        try:
+            with span("phash"):
+                fp = phash.fingerprint(img)
+                texts = self.ocr_cache.get(tenant, fp)
+        except Exception as e:
+            logger.warning("Perceptual hash lookup failed: %s", e)
+            return None, {}
+        if texts is None:
+            return fp, {}
+        logger.debug("Reusing OCR text of a near-duplicate image")
+        return fp, texts
+
+    def _is_pdf(self, source: Source, content_type: str) -> bool:
+        if content_type == 'application/pdf':
+            return True
+        return isinstance(source, str) and source.lower().endswith('.pdf')
+
+    def parse_all(self, source: Source, content_type: str = '') -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Parse every W-2 in a file: a PDF holding several employees' forms is
+        split into one result per employee (see app.w2_split), each with the
+        ``pages`` it came from. ParseScheduler.run_all does the same in
+        parallel across pool workers.
+        """
+        if not self._is_pdf(source, content_type):
+            data, file_type = self.parse_file(source, content_type)
+            return [{**data, "pages": [1]}], file_type
+        reads, _ = self.read_pages(source)
+        return merge_instances([self.parse_segment(source, seg) for seg in segment_pages(reads)]), 'pdf'
+
+    def parse_file(self, source: Source, content_type: str = '', progress: Progress = None,
+                   text_only: bool = False, form_type: Optional[str] = None,
+                   tenant: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Parse a W-2 or 1099 given as a file path, raw bytes or a binary file
+        object. ``progress``, if given, is called with each stage name as it
+        starts. ``text_only`` skips the OCR tiers for PDFs. ``form_type``
+        (see app.form_schemas) skips form detection. ``tenant`` names whose
+        upload this is; a photo only reuses OCR text of the same tenant's
+        earlier photos, and none without a tenant.
+        """
+        form = get_form(form_type) if form_type else None
+        try:
+            with self._open_source(source) as stream:
+                if self._is_pdf(source, content_type):
+                    return self._parse_pdf_tiers(stream, progress, text_only, form), 'pdf'
+                else:
+                    return self._parse_image(stream, progress, form, tenant), 'image'
         except Exception as e:
             logger.error(f"W2ParseError: {e}")
             raise W2ParseError(str(e)) from e
@@ -0,0 +1,196 @@
+import glob
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from app.form_schemas import W2, get_form
+from app.w2_grammar import W2_DEFAULTS, ExtractionTable, Rule, fold
+
+logger = logging.getLogger("w2_profiles")
+
+# One directory of profiles per form type; profiles/1099 holds rules every 1099 extends
+PROFILE_ROOT = os.path.join(os.path.dirname(__file__), "profiles")
+PROFILE_DIR = os.path.join(PROFILE_ROOT, W2)
+SHARED_1099_DIR = os.path.join(PROFILE_ROOT, "1099")
+FALLBACK_PROFILE = "fallback"
+
+
+@dataclass
+class LayoutProfile:
+    """
+    A known W-2 layout. It applies when every ``required`` marker occurs in
+    the folded document text; ``hints`` only break ties between profiles.
+    """
+    name: str
+    description: str
+    priority: int
+    required: Tuple[str, ...]
+    hints: Tuple[str, ...]
+    table: ExtractionTable
+    source: str = ''
+
+
+def _rule(spec: Dict[str, Any]) -> Rule:
+    return Rule(anchor=spec["anchor"],
+                values=tuple((f, p) for f, p in spec["values"]),
+                mode=spec.get("mode", "adjacent"),
+                window=spec.get("window", 120),
+                atomic=spec.get("atomic", False),
+                priority=spec.get("priority", 0),
+                before=spec.get("before"))
+
+
+def load_profiles(dirs: Iterable[str], defaults: Optional[Dict[str, Any]] = None) -> List[LayoutProfile]:
+    """
+    Load ``*.json`` profile specs. Later directories override earlier ones by
+    name, and ``extends`` inherits the parent's rules after the child's own.
+    ``defaults`` are the form's output fields (W-2 unless given); those
+    defaulting to a float are amounts.
+    """
+    defaults = W2_DEFAULTS if defaults is None else defaults
+    money = frozenset(f for f, v in defaults.items() if isinstance(v, float))
+    specs: Dict[str, Dict[str, Any]] = {}
+    for directory in dirs:
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path) as fh:
+                spec = json.load(fh)
+            spec["_source"] = path
+            specs[spec["name"]] = spec
+
+    def resolved(name: str, seen: Tuple[str, ...] = ()) -> Tuple[List[Dict], List[List[str]]]:
+        if name in seen:
+            raise ValueError(f"W-2 profile inheritance cycle: {' -> '.join(seen + (name,))}")
+        spec = specs[name]
+        rules, standalone = list(spec.get("rules", [])), list(spec.get("standalone", []))
+        if spec.get("extends"):
+            parent_rules, parent_standalone = resolved(spec["extends"], seen + (name,))
+            rules += parent_rules
+            standalone += parent_standalone
+        return rules, standalone
+
+    def priority(spec: Dict[str, Any]) -> int:
+        # A profile adding no rules of its own only relabels its parent's layout, so it
+        # ranks just above the parent and never above another layout's own rules
+        own = spec.get("priority", 0)
+        if spec.get("extends") and not spec.get("rules") and not spec.get("standalone"):
+            cap = priority(specs[spec["extends"]]) + 1
+            if own > cap:
+                logger.warning("Profile %s adds no rules; priority %d capped at %d", spec["name"], own, cap)
+                own = cap
+        return own
+
+    profiles = []
+    for name, spec in specs.items():
+        rules, standalone = resolved(name)
+        table = ExtractionTable(rules=[_rule(r) for r in rules],
+                                standalone=[(f, p) for f, p in standalone],
+                                defaults=defaults, money=money)
+        profiles.append(LayoutProfile(name=name, description=spec.get("description", ''),
+                                      priority=priority(spec),
+                                      required=tuple(m.lower() for m in spec.get("required", [])),
+                                      hints=tuple(m.lower() for m in spec.get("hints", [])),
+                                      table=table, source=spec["_source"]))
+    return profiles
+
+
+def _marker_pattern(marker: str) -> "re.Pattern":
+    # Word boundaries only where the marker starts or ends with a word character ("$" has none)
+    start = r"(?<!\w)" if re.match(r"\w", marker) else ""
+    end = r"(?!\w)" if re.search(r"\w$", marker) else ""
+    return re.compile(start + re.escape(marker) + end)
+
+
+class ProfileIndex:
+    """
+    Picks the layout profile for a document.
+
+    The fingerprint is the set of known label markers present in the text.
+    Each distinct fingerprint is resolved once, via an inverted index from
+    marker to profiles, and memoized, so repeat layouts dispatch with a
+    single dict lookup.
+    """
+
+    def __init__(self, profiles: Sequence[LayoutProfile], memo_size: int = 1024):
+        self.profiles = {p.name: p for p in profiles}
+        if FALLBACK_PROFILE not in self.profiles:
+            raise ValueError("Layout profiles must include a 'fallback' profile")
+        self._vocabulary: Tuple[str, ...] = tuple(sorted({m for p in profiles for m in p.required + p.hints}))
+        self._patterns = {m: _marker_pattern(m) for m in self._vocabulary}
+        self._by_marker: Dict[str, List[LayoutProfile]] = {}
+        for p in profiles:
+            for m in set(p.required + p.hints):
+                self._by_marker.setdefault(m, []).append(p)
+        self._memo: "OrderedDict[FrozenSet[str], LayoutProfile]" = OrderedDict()
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+
+    def fingerprint(self, txt: str) -> FrozenSet[str]:
+        """Markers occurring as whole words ("adp" is not in "broadpoint")."""
+        folded = fold(txt)
+        # The substring test is a cheap filter before the word-boundary search
+        return frozenset(m for m in self._vocabulary if m in folded and self._patterns[m].search(folded))
+
+    def _resolve(self, fp: FrozenSet[str]) -> LayoutProfile:
+        hits: Dict[str, int] = {}
+        for marker in fp:
+            for p in self._by_marker.get(marker, ()):
+                hits[p.name] = hits.get(p.name, 0) + 1
+        best, best_key = self.profiles[FALLBACK_PROFILE], None
+        for name, count in hits.items():
+            p = self.profiles[name]
+            if not all(m in fp for m in p.required):
+                continue
+            hint_score = sum(m in fp for m in p.hints) / len(p.hints) if p.hints else 0.0
+            key = (p.priority, hint_score, count)
+            if best_key is None or key > best_key:
+                best, best_key = p, key
+        return best
+
+    def match(self, txt: str) -> LayoutProfile:
+        fp = self.fingerprint(txt)
+        with self._lock:
+            profile = self._memo.get(fp)
+            if profile is not None:
+                self._memo.move_to_end(fp)
+                return profile
+        profile = self._resolve(fp)
+        with self._lock:
+            self._memo[fp] = profile
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        return profile
+
+    def get(self, name: str) -> LayoutProfile:
+        return self.profiles[name]
+
+
+_indexes: Dict[str, ProfileIndex] = {}
+
+
+def profile_dirs(form_type: str, extra: Sequence[str] = ()) -> List[str]:
+    """
+    Where ``form_type``'s profiles come from: its built-in directory, plus
+    each extra directory itself for W-2s or its ``<form_type>`` subdirectory
+    for other forms.
+    """
+    if form_type == W2:
+        return [PROFILE_DIR, *extra]
+    dirs = [SHARED_1099_DIR, os.path.join(PROFILE_ROOT, form_type)]
+    return dirs + [os.path.join(d, form_type) for d in extra]
+
+
+def get_profile_index(form_type: str = W2) -> ProfileIndex:
+    """A form's built-in profiles plus any directories listed in TAX_W2_PROFILE_DIRS."""
+    index = _indexes.get(form_type)
+    if index is None:
+        from app.config import get_settings
+        form = get_form(form_type)
+        extra = [d for d in get_settings().w2_profile_dirs.split(os.pathsep) if d]
+        index = _indexes[form_type] = ProfileIndex(load_profiles(profile_dirs(form_type, extra), form.defaults))
+        logger.info("Loaded %s layout profiles: %s", form.title, ", ".join(sorted(index.profiles)))
+    return index
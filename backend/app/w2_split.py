@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.form_schemas import W2_FORM, FormSchema, get_form
+
+
+@dataclass(frozen=True)
+class PageRead:
+    """What the splitter needs from one PDF page, read once by W2Parser.read_pages."""
+    number: int
+    text: str
+    # Geometry extraction of the page (w2_geometry.extract_page), None without words
+    fields: Optional[Dict[str, Any]]
+    # Page digest with the copy legend stripped; equal for copies B, C, 2 of a form
+    digest: str
+    # SSN of the employee (or 1099 recipient) the page is for
+    employee_ssn: Optional[str]
+    # Copy legend ("b", "c", "2", ...) if the page carries one
+    copy: Optional[str] = None
+    # Folded "first last" of the employee, if read; tells apart masked SSNs
+    employee_name: Optional[str] = None
+
+
+def is_masked(ssn: Optional[str]) -> bool:
+    """Truncated SSNs (XXX-XX-1234) are shared by different employees."""
+    return bool(ssn) and not ssn.replace("-", "").isdigit()
+
+
+def employee_name(fields: Optional[Dict[str, Any]], form: FormSchema = W2_FORM) -> Optional[str]:
+    """Folded "first last" from fields extracted as ``form``, None if neither was read."""
+    if not fields:
+        return None
+    _, first, last = form.recipient_fields
+    name = " ".join(n for n in (fields.get(first), fields.get(last)) if n)
+    return " ".join(name.lower().split()) or None
+
+
+def _same_employee(ssn: Optional[str], name: Optional[str], other_ssn: Optional[str],
+                   other_name: Optional[str]) -> bool:
+    # A masked SSN only identifies the employee together with a matching name
+    return ssn == other_ssn and (not is_masked(ssn) or (name is not None and name == other_name))
+
+
+def segment_pages(reads: Sequence[PageRead]) -> List[List[PageRead]]:
+    """
+    Group the pages of a multi-W-2 PDF into one list per form instance.
+
+    A page whose employee SSN differs from the current instance's starts a
+    new one, as does a page with the same masked SSN (XXX-XX-1234) unless the
+    employee name matches too; pages without an SSN (instructions, continuation pages) belong
+    to the instance before them, unless they repeat a copy legend that
+    instance already has. Pages with no text at all (scans) are each their
+    own instance. Copies of a page already taken join that page's instance
+    wherever they appear; W2Parser.parse_segment reads them only once.
+    """
+    segments: List[List[PageRead]] = []
+    owner: Dict[str, List[PageRead]] = {}
+    current: List[PageRead] = []
+    ssn: Optional[str] = None
+    name: Optional[str] = None
+    copies: set = set()
+
+    def start() -> None:
+        nonlocal current, ssn, name, copies
+        current, ssn, name, copies = [], None, None, set()
+        segments.append(current)
+
+    for page in reads:
+        if not page.text.strip():
+            segments.append([page])
+            start()
+            continue
+        if page.digest in owner:
+            owner[page.digest].append(page)
+            continue
+        if not segments \
+                or (page.employee_ssn and ssn and not _same_employee(ssn, name, page.employee_ssn,
+                                                                     page.employee_name)) \
+                or (not page.employee_ssn and page.copy and page.copy in copies):
+            start()
+        current.append(page)
+        owner[page.digest] = current
+        if page.employee_ssn and not ssn:
+            ssn, name = page.employee_ssn, page.employee_name
+        if page.copy:
+            copies.add(page.copy)
+    return [sorted(segment, key=lambda page: page.number) for segment in segments if segment]
+
+
+def _confidence(parsed: Dict[str, Any]) -> float:
+    confidence = parsed.get("confidence") or {}
+    return sum(confidence.get(f, 0.0) for f in get_form(parsed.get("form_type")).checked_fields)
+
+
+def merge_instances(results: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse segment results that are the same form (same form type,
+    employee or recipient SSN and employer or payer EIN, e.g. copies whose
+    text differs) into the most confident one, with the pages of all of
+    them. A masked SSN must come with the same name. Ordered by first page.
+    """
+    merged: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for n, parsed in enumerate(results):
+        form = get_form(parsed.get("form_type"))
+        ssn = parsed.get(form.recipient_fields[0])
+        ident = (form.form_type, ssn, parsed.get(form.payer_tin_field)) \
+            + ((employee_name(parsed, form),) if is_masked(ssn) else ())
+        key = ident if all(ident) else ("segment", n)
+        kept = merged.get(key)
+        if kept is None:
+            merged[key] = parsed
+            continue
+        pages = sorted(set(kept["pages"]) | set(parsed["pages"]))
+        if _confidence(parsed) > _confidence(kept):
+            kept = merged[key] = parsed
+        kept["pages"] = pages
+    return sorted(merged.values(), key=lambda parsed: parsed["pages"][0])
@@ -0,0 +1,87 @@
+"""
+Compare skew estimation on rotated synthetic W-2 pages.
+
+    python -m benchmarks.bench_deskew [--size 4032x3024] [--repeat 3]
+
+``legacy`` is the full-resolution findNonZero/minAreaRect method the parser
+used before; ``projection`` is app.deskew.estimate_skew.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.deskew import estimate_skew
+
+ANGLES = [-7.0, -3.5, -1.2, 0.0, 0.8, 2.5, 6.0]
+
+
+def synthetic_w2(width: int, height: int) -> np.ndarray:
+    """A light page with W-2-style box grid and label/value text lines."""
+    img = np.full((height, width), 235, np.uint8)
+    rng = np.random.default_rng(0)
+    margin = width // 12
+    rows = 12
+    row_h = (height - 2 * margin) // rows
+    scale = width / 1600
+    for r in range(rows + 1):
+        y = margin + r * row_h
+        cv2.line(img, (margin, y), (width - margin, y), 30, max(1, int(2 * scale)))
+    for x in (margin, width // 2, 3 * width // 4, width - margin):
+        cv2.line(img, (x, margin), (x, margin + rows * row_h), 30, max(1, int(2 * scale)))
+    labels = ["1 Wages, tips, other compensation", "2 Federal income tax withheld",
+              "3 Social security wages", "4 Social security tax withheld",
+              "5 Medicare wages and tips", "6 Medicare tax withheld"]
+    for r in range(rows):
+        y = margin + r * row_h
+        cv2.putText(img, labels[r % len(labels)], (margin + 10, y + row_h // 3),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, 20, max(1, int(scale)))
+        cv2.putText(img, f"{rng.integers(1000, 99999)}.00", (width // 2 + 10, y + 2 * row_h // 3),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9 * scale, 20, max(1, int(2 * scale)))
+    noise = rng.normal(0, 6, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def rotate(gray: np.ndarray, angle: float) -> np.ndarray:
+    h, w = gray.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=235)
+
+
+def legacy_angle(gray: np.ndarray) -> float:
+    coords = cv2.findNonZero(cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1])
+    angle = cv2.minAreaRect(coords)[-1]
+    return -(90 + angle) if angle < -45 else -angle
+
+
+def projection_angle(gray: np.ndarray) -> float:
+    return estimate_skew(gray).angle
+
+
+def run(width: int, height: int, repeat: int) -> None:
+    page = synthetic_w2(width, height)
+    methods = {"legacy": legacy_angle, "projection": projection_angle}
+    print(f"page {width}x{height}, {len(ANGLES)} angles x {repeat} runs")
+    print(f"{'method':<12}{'mean ms':>10}{'max ms':>10}{'mean err':>10}{'max err':>10}")
+    for name, fn in methods.items():
+        times, errors = [], []
+        for angle in ANGLES:
+            skewed = rotate(page, angle)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                found = fn(skewed)
+                times.append((time.perf_counter() - start) * 1000)
+            # The correction angle should undo the applied rotation
+            errors.append(abs(found + angle))
+        print(f"{name:<12}{np.mean(times):>10.1f}{np.max(times):>10.1f}"
+              f"{np.mean(errors):>10.2f}{np.max(errors):>10.2f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--size", default="3024x4032", help="WIDTHxHEIGHT of the synthetic page")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.split("x"))
+    run(w, h, args.repeat)
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark the compiled W-2 extraction tables against the legacy
+per-field regex strategies on a corpus of extracted W-2 texts.
+
+    python -m benchmarks.bench_grammar [--docs 300] [--repeat 5]
+
+Texts are generated for the clean, jumbled and fallback layouts, each
+followed by a varying amount of the instruction text printed on the back of
+Copy B/C, which is what the old fallback patterns backtracked across.
+"""
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.w2_profiles import get_profile_index
+from benchmarks.legacy_w2_regex import LegacyStrategies
+
+INSTRUCTIONS = (
+    "Notice to Employee Do you have to file? Refer to the Form 1040 instructions to determine "
+    "if you are required to file a tax return. Even if you don't have to file a tax return, you "
+    "may be eligible for a refund if box 2 shows an amount or if you are eligible for any credit. "
+    "Earned income credit (EIC). You may be able to take the EIC for 2023 if your adjusted gross "
+    "income (AGI) is less than a certain amount. Clergy and religious workers. If you aren't subject "
+    "to social security and Medicare taxes, see Pub. 517. Corrections. If your name, SSN, or address "
+    "is incorrect, correct Copies B, C, and 2 and ask your employer to correct your employment record. "
+)
+
+
+def _money(rng: random.Random, lo: int, hi: int) -> str:
+    return f"{rng.randint(lo, hi):,}.{rng.randint(0, 99):02d}"
+
+
+def clean_text(rng: random.Random) -> str:
+    return (f"Employee's social security number: {rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)} "
+            f"Employer identification number: {rng.randint(10, 99)}-{rng.randint(1000000, 9999999)} "
+            f"Employer's name and address: Acme Widgets Inc 100 Main St Springfield, IL 62704 "
+            f"Employee's name and address: Jane Doe 12 Oak Ave Springfield, IL 62704 "
+            f"1. Wages, tips, other compensation: ${_money(rng, 20000, 150000)} "
+            f"2. Federal income tax withheld: ${_money(rng, 1000, 30000)} "
+            f"3. Social security wages: ${_money(rng, 20000, 150000)} "
+            f"4. Social security tax withheld: ${_money(rng, 1000, 9000)} "
+            f"5. Medicare wages and tips: ${_money(rng, 20000, 150000)} "
+            f"6. Medicare tax withheld: ${_money(rng, 300, 3000)} ")
+
+
+def jumbled_text(rng: random.Random) -> str:
+    return (f"a Employee's social security number {rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)} "
+            f"OMB No. 1545-0008 c Employer's name, address, and ZIP code Acme Widgets Inc 100 Main St "
+            f"3 Social security wages 4 Social security tax withheld {rng.randint(20000, 150000)} {rng.randint(1000, 9000)} "
+            f"b Employer identitication number (EIN) 1 Wages, tips, other compensation 2 Federal income tax withheld "
+            f"{rng.randint(10, 99)}{rng.randint(1000000, 9999999)} {rng.randint(20000, 150000)} {rng.randint(1000, 30000)} "
+            f"5 Medicare wages and tips 6 Medicare tax withheld {rng.randint(20000, 150000)} {rng.randint(300, 3000)} ")
+
+
+def fallback_text(rng: random.Random) -> str:
+    return (f"W-2 Wage and Tax Statement SSN {rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)} "
+            f"EIN {rng.randint(10, 99)}-{rng.randint(1000000, 9999999)} "
+            f"Wages {_money(rng, 20000, 150000)} Federal tax withheld {_money(rng, 1000, 30000)} ")
+
+
+def ocr_noise_text(rng: random.Random) -> str:
+    """Full-page OCR output where the ID and amount boxes came out unreadable."""
+    return ("W-2 Wage and Tax Statement Employer identification number EIN being read "
+            "Wages tips other compensation ~~ Federal income tax withheld ~~ ")
+
+
+_PROFILES = get_profile_index()
+LAYOUTS: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "clean": (clean_text, LegacyStrategies()._parse_clean_format, _PROFILES.get("clean").table.extract),
+    "jumbled": (jumbled_text, LegacyStrategies()._parse_jumbled_format, _PROFILES.get("jumbled").table.extract),
+    "fallback": (fallback_text, LegacyStrategies()._parse_fallback_format, _PROFILES.get("fallback").table.extract),
+    "ocr-noise": (ocr_noise_text, LegacyStrategies()._parse_fallback_format,
+                  _PROFILES.get("fallback").table.extract),
+}
+
+
+def corpus(make: Callable, docs: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(docs):
+        body = make(rng) + INSTRUCTIONS * rng.randint(0, 12)
+        texts.append(re.sub(r"\s+", " ", body))
+    return texts
+
+
+def timed(fn: Callable, texts: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for txt in texts:
+            fn(txt)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+
+def run(docs: int, repeat: int) -> None:
+    print(f"{docs} docs per layout, best of {repeat}")
+    print(f"{'layout':<10}{'legacy us':>12}{'table us':>12}{'speedup':>10}{'diffs':>8}")
+    for name, (make, legacy, table) in LAYOUTS.items():
+        texts = corpus(make, docs)
+        diffs = sum(1 for t in texts
+                    if {k: v for k, v in legacy(t).items()} != {k: v for k, v in table(t).items()
+                                                               if k in legacy(t)})
+        old, new = timed(legacy, texts, repeat), timed(table, texts, repeat)
+        print(f"{name:<10}{old:>12.1f}{new:>12.1f}{old / new:>9.1f}x{diffs:>8}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--docs", type=int, default=300)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    run(args.docs, args.repeat)
@@ -0,0 +1,97 @@
+"""
+Time and peak memory of W-2 photo preprocessing, full-size vs decode-time downscaling.
+
+    python -m benchmarks.bench_image_decode [--repeat 3]
+
+``legacy`` decodes the whole photo with cv2.imdecode before denoising,
+autocontrast and deskew; ``downscaled`` is W2Parser._preprocess_image,
+which decodes straight to OCR resolution (app.image_decode). ``pixels`` is
+what tesseract gets, which dominates OCR time. Each run happens in a fresh
+process so ru_maxrss reflects only that run.
+"""
+import argparse
+import io
+import multiprocessing
+import resource
+import time
+from typing import Tuple
+
+# (name, size, encoder): phone photos of a Letter page and of a single form
+PHOTOS = [("12mp-page", (4032, 3024), "JPEG"), ("24mp-page", (6000, 4000), "JPEG"),
+          ("12mp-form", (4032, 2016), "JPEG"), ("12mp-page", (4032, 3024), "PNG")]
+
+
+def make_photo(size: Tuple[int, int], fmt: str) -> bytes:
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, (228, 226, 220))
+    draw = ImageDraw.Draw(img)
+    for y in range(40, size[1] - 40, size[1] // 40):
+        draw.text((size[0] // 20, y), "1 Wages, tips, other compensation   48213.00   "
+                  "2 Federal income tax withheld   5785.56", fill=(30, 30, 30))
+    exif = img.getexif()
+    exif[0x0112] = 6  # taken with the phone held upright
+    buf = io.BytesIO()
+    img.save(buf, fmt, **({"quality": 90, "exif": exif.tobytes()} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def _legacy(data: bytes):
+    import cv2
+    import numpy as np
+    from app.deskew import deskew
+    gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    gray = cv2.medianBlur(gray, 3)
+    lo, hi = int(gray.min()), int(gray.max())
+    lut = np.clip((np.arange(256, dtype=np.float32) - lo) * (255.0 / (hi - lo)), 0, 255).astype(np.uint8)
+    cv2.LUT(gray, lut, dst=gray)
+    return deskew(gray)[0]
+
+
+def _downscaled(data: bytes):
+    from app.w2_parser import W2Parser
+    return W2Parser()._preprocess_image(io.BytesIO(data))
+
+
+def _measure(variant: str, data: bytes, queue) -> None:
+    import logging
+    logging.disable(logging.CRITICAL)
+    import cv2  # noqa: F401
+    import app.deskew  # noqa: F401  (imports are not part of the measurement)
+    import app.image_decode  # noqa: F401
+    import app.w2_parser  # noqa: F401
+    fn = _legacy if variant == "legacy" else _downscaled
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    out = fn(data)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - base) / 1024, out.size))
+
+
+def measure(variant: str, data: bytes) -> Tuple[float, float, int]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(variant, data, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def run(repeat: int) -> None:
+    print(f"best of {repeat} (RSS growth over the imported baseline)")
+    print(f"{'photo':<11}{'format':<8}{'variant':<12}{'time ms':>10}{'peak MB':>10}{'pixels':>12}")
+    for name, size, fmt in PHOTOS:
+        data = make_photo(size, fmt)
+        for variant in ("legacy", "downscaled"):
+            runs = [measure(variant, data) for _ in range(repeat)]
+            elapsed = min(r[0] for r in runs)
+            peak = min(r[1] for r in runs)
+            print(f"{name:<11}{fmt:<8}{variant:<12}{elapsed * 1000:>10.1f}{peak:>10.1f}{runs[0][2]:>12,}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    run(args.repeat)
@@ -0,0 +1,129 @@
+"""
+Peak memory and time of W-2 text-layer extraction on multi-page payroll PDFs.
+
+    python -m benchmarks.bench_pdf_pages [--pages 50] [--repeat 3]
+
+``legacy`` opens every page through ``pdf.pages``, extracts all text and
+word boxes, then parses; ``streaming`` is W2Parser's page-at-a-time path
+with copy de-duplication and early stop. Each run happens in a fresh
+process so ru_maxrss reflects only that run.
+
+Layouts:
+  copies   - employees' W-2s as copies B, C, 2, 2 (the common payroll export)
+  trailing - instruction pages first and the W-2 last, so nothing stops early
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from typing import List, Tuple
+
+from benchmarks.pdf_writer import make_pdf
+
+COPIES = ["Copy B--To Be Filed With Employee's FEDERAL Tax Return",
+          "Copy C--For EMPLOYEE'S RECORDS",
+          "Copy 2--To Be Filed With Employee's State, City, or Local Income Tax Return",
+          "Copy 2--To Be Filed With Employee's State, City, or Local Income Tax Return"]
+
+INSTRUCTIONS = [
+    "Notice to Employee",
+    "Do you have to file? Refer to the Form 1040 instructions to determine if you are required to file.",
+    "Earned income credit (EIC). You may be able to take the EIC if your adjusted gross income is low.",
+    "Clergy and religious workers. If you aren't subject to social security and Medicare taxes, see Pub. 517.",
+    "Corrections. If your name, SSN, or address is incorrect, correct Copies B, C, and 2.",
+] * 8
+
+
+def w2_page(n: int, copy: str) -> List[str]:
+    wages = 40000 + 1000 * n
+    return [
+        f"Employee's social security number: {123 + n:03d}-45-{6789 - n:04d}",
+        f"Employer identification number: 12-{3456789 - n:07d}",
+        "Employer's name and address: Acme Corp",
+        f"Employee's name and address: Employee{n} Tester",
+        f"1. Wages, tips, other compensation: ${wages:,.2f}",
+        f"2. Federal income tax withheld: ${wages * 0.12:,.2f}",
+        f"3. Social security wages: ${wages:,.2f}",
+        f"4. Social security tax withheld: ${wages * 0.062:,.2f}",
+        f"5. Medicare wages and tips: ${wages:,.2f}",
+        f"6. Medicare tax withheld: ${wages * 0.0145:,.2f}",
+        "Springfield, IL 62704",
+        "Form W-2 Wage and Tax Statement",
+        copy,
+    ] + INSTRUCTIONS[:20]
+
+
+def build(layout: str, pages: int) -> bytes:
+    if layout == "copies":
+        body = [w2_page(i // 4, COPIES[i % 4]) for i in range(pages)]
+    else:
+        body = [INSTRUCTIONS for _ in range(pages - 1)] + [w2_page(0, COPIES[0])]
+    return make_pdf(body)
+
+
+def _legacy(pdf_bytes: bytes) -> None:
+    import io
+    import pdfplumber
+    from app.w2_geometry import extract_fields
+    from app.w2_parser import W2Parser
+    parser = W2Parser()
+    texts, pages = [], []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or '')
+            pages.append((page.extract_words(), float(page.width)))
+    parser._parse_text("\n".join(texts))
+    extract_fields(pages)
+
+
+def _streaming(pdf_bytes: bytes) -> None:
+    import io
+    from app.w2_parser import W2Parser
+    W2Parser()._parse_pdf_tiers(io.BytesIO(pdf_bytes), text_only=True)
+
+
+def _measure(variant: str, pdf_bytes: bytes, queue) -> None:
+    import contextlib
+    import logging
+    import os
+    logging.disable(logging.CRITICAL)
+    fn = _legacy if variant == "legacy" else _streaming
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        import app.w2_parser  # noqa: F401  (imports are not part of the measurement)
+        import pdfplumber  # noqa: F401
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        fn(pdf_bytes)
+        elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - base) / 1024))
+
+
+def measure(variant: str, pdf_bytes: bytes) -> Tuple[float, float]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(variant, pdf_bytes, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def run(pages: int, repeat: int) -> None:
+    print(f"{pages}-page PDFs, best of {repeat} (RSS growth over the imported baseline)")
+    print(f"{'layout':<10}{'variant':<11}{'time ms':>10}{'peak MB':>10}")
+    for layout in ("copies", "trailing"):
+        pdf_bytes = build(layout, pages)
+        for variant in ("legacy", "streaming"):
+            runs = [measure(variant, pdf_bytes) for _ in range(repeat)]
+            elapsed = min(r[0] for r in runs)
+            peak = min(r[1] for r in runs)
+            print(f"{layout:<10}{variant:<11}{elapsed * 1000:>10.1f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    run(args.pages, args.repeat)
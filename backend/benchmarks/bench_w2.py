@@ -0,0 +1,310 @@
+"""
+W-2 parser benchmark and regression harness on the synthetic corpus.
+
+    python -m benchmarks.bench_w2 [--docs 10] [--workers N] [--rounds 3]
+                                  [--json out.json] [--baseline base.json]
+
+For each extraction strategy (the tiered pipeline, the fast lane's
+text-only parse, and each tier on its own) over the documents it applies
+to, reports latency percentiles, mean time per pipeline stage, peak memory
+and field-level accuracy against the corpus ground truth. Each strategy
+runs in a fresh process so ru_maxrss reflects only that run. Throughput
+runs the tiered parse on ``--workers`` processes, as the parse pool does.
+
+Stage times are inclusive (``preprocess`` contains ``deskew``, ``zonal``
+its own OCR calls) and only count stages the strategy reaches.
+
+With ``--baseline`` the run is compared with an earlier ``--json`` output
+and the exit status is 1 if accuracy dropped or p50 latency grew past the
+tolerances below.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.w2_corpus import Sample, generate
+
+# Parser methods timed as pipeline stages
+STAGES = {"pdf_text": "_iter_pdf_pages", "preprocess": "_preprocess_image", "deskew": "_deskew",
+          "zonal": "_zonal_extract", "ocr": "_ocr", "regex": "_parse_text", "geometry": "_geometry_extract"}
+FIELDS = ("employee_ssn", "employer_ein", "employer_name", "employee_first_name", "employee_last_name",
+          "wages", "federal_withholding", "social_security_wages", "social_security_tax",
+          "medicare_wages", "medicare_tax", "state")
+# Regression tolerances for --baseline
+MAX_ACCURACY_DROP = 0.01
+MAX_P50_GROWTH = 1.25
+
+
+def _pages(parser, data: bytes) -> Tuple[str, List[Dict[str, Any]]]:
+    from app.w2_geometry import extract_page
+    texts, fields = [], []
+    for _, text, words, width in parser._iter_pdf_pages(io.BytesIO(data)):
+        texts.append(text)
+        if words:
+            fields.append(extract_page(words, width))
+    return "\n".join(texts), fields
+
+
+def _text(parser, sample: Sample) -> Optional[Dict[str, Any]]:
+    return parser._parse_text(_pages(parser, sample.data)[0])
+
+
+def _geometry(parser, sample: Sample) -> Optional[Dict[str, Any]]:
+    raw, fields = _pages(parser, sample.data)
+    return parser._geometry_extract(fields, raw)
+
+
+def _zonal(parser, sample: Sample) -> Optional[Dict[str, Any]]:
+    return parser._zonal_extract(parser._preprocess_image(io.BytesIO(sample.data)))
+
+
+def _ocr(parser, sample: Sample) -> Optional[Dict[str, Any]]:
+    return parser._parse_text(parser._ocr(parser._preprocess_image(io.BytesIO(sample.data))))
+
+
+# name -> (parse function, kinds of document it applies to)
+STRATEGIES: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {
+    "tiered": (lambda parser, s: parser.parse_file(s.data, s.content_type)[0], ("pdf", "scan")),
+    "text_only": (lambda parser, s: parser.parse_file(s.data, s.content_type, text_only=True)[0], ("pdf",)),
+    "text": (_text, ("pdf",)),
+    "geometry": (_geometry, ("pdf",)),
+    "zonal": (_zonal, ("scan",)),
+    "ocr": (_ocr, ("scan",)),
+}
+
+
+def _normalize(field: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return round(value, 2)
+    value = str(value).strip().casefold()
+    if field in ("employee_ssn", "employer_ein"):
+        return "".join(ch for ch in value if ch.isalnum())
+    return value
+
+
+def score(truth: Dict[str, Any], parsed: Optional[Dict[str, Any]]) -> Dict[str, bool]:
+    """Which truth fields the parse got right; money to the cent, IDs ignoring dashes."""
+    parsed = parsed or {}
+    return {f: _normalize(f, parsed.get(f)) == _normalize(f, truth[f]) for f in FIELDS}
+
+
+class StageTimer:
+    """Wraps a parser instance's stage methods to add up the time spent in each."""
+
+    def __init__(self, parser):
+        self.totals: Dict[str, float] = {}
+        for stage, method in STAGES.items():
+            setattr(parser, method, self._wrap(stage, getattr(parser, method)))
+
+    def _wrap(self, stage: str, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                self._add(stage, start)
+            if stage == "pdf_text":
+                return self._timed_iter(stage, result)
+            return result
+        return timed
+
+    def _timed_iter(self, stage: str, it: Iterator) -> Iterator:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self._add(stage, start)
+                return
+            self._add(stage, start)
+            yield item
+
+    def _add(self, stage: str, start: float) -> None:
+        self.totals[stage] = self.totals.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+    def take(self) -> Dict[str, float]:
+        totals, self.totals = self.totals, {}
+        return totals
+
+
+def _run_strategy(strategy: str, samples: List[Sample], queue) -> None:
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app.w2_parser import W2Parser
+    parser = W2Parser()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        parser.warm_up()
+        timer = StageTimer(parser)
+        fn, kinds = STRATEGIES[strategy]
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        records = []
+        for sample in samples:
+            if sample.kind not in kinds:
+                continue
+            timer.take()
+            start = time.perf_counter()
+            error = None
+            try:
+                parsed = fn(parser, sample)
+            except Exception as e:
+                parsed, error = None, f"{type(e).__name__}: {e}"
+            records.append({"name": sample.name, "kind": sample.kind, "layout": sample.layout,
+                            "ms": (time.perf_counter() - start) * 1000, "stages": timer.take(),
+                            "error": error, "fields": score(sample.truth, parsed)})
+        peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 1024
+    queue.put((records, peak))
+
+
+def run_strategy(strategy: str, samples: List[Sample]) -> Tuple[List[Dict[str, Any]], float]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_strategy, args=(strategy, samples, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def _pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 2) if values else 0.0
+
+
+def summarize(records: List[Dict[str, Any]], peak_mb: float) -> Dict[str, Any]:
+    n = len(records)
+    stages: Dict[str, float] = {}
+    for record in records:
+        for stage, ms in record["stages"].items():
+            stages[stage] = stages.get(stage, 0.0) + ms
+    fields = {f: round(sum(r["fields"][f] for r in records) / n, 3) for f in FIELDS}
+    return {
+        "docs": n,
+        "errors": sum(r["error"] is not None for r in records),
+        "p50_ms": _pct([r["ms"] for r in records], 0.5),
+        "p95_ms": _pct([r["ms"] for r in records], 0.95),
+        "stage_mean_ms": {s: round(ms / n, 2) for s, ms in stages.items()},
+        "peak_mb": round(peak_mb, 1),
+        "accuracy": round(sum(fields.values()) / len(fields), 3),
+        "exact_docs": round(sum(all(r["fields"].values()) for r in records) / n, 3),
+        "fields": fields,
+        "first_error": next((r["error"] for r in records if r["error"]), None),
+    }
+
+
+def _throughput_task(data: bytes, content_type: str) -> bool:
+    from app.parse_pool import parse_w2
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            parse_w2(data, content_type)
+            return True
+        except Exception:
+            return False
+
+
+def _quiet_worker() -> None:
+    import logging
+    from app.parse_pool import _init_worker
+    logging.disable(logging.CRITICAL)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        _init_worker(1, True)
+
+
+def throughput(samples: List[Sample], workers: int, rounds: int) -> Dict[str, Any]:
+    """Tiered parses per second on ``workers`` processes, by kind of document."""
+    result = {}
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_quiet_worker) as pool:
+        # Start and warm every worker before timing
+        list(pool.map(_throughput_task, [b""] * workers, ["application/pdf"] * workers))
+        for kind in ("pdf", "scan"):
+            docs = [s for s in samples if s.kind == kind] * rounds
+            if not docs:
+                continue
+            start = time.perf_counter()
+            list(pool.map(_throughput_task, [s.data for s in docs], [s.content_type for s in docs]))
+            per_sec = len(docs) / (time.perf_counter() - start)
+            result[kind] = {"docs_per_sec": round(per_sec, 2), "per_core": round(per_sec / workers, 2)}
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    problems = []
+    for key, row in current["strategies"].items():
+        base = baseline.get("strategies", {}).get(key)
+        if base is None:
+            continue
+        if row["accuracy"] < base["accuracy"] - MAX_ACCURACY_DROP:
+            problems.append(f"{key}: accuracy {base['accuracy']:.3f} -> {row['accuracy']:.3f}")
+        if base["p50_ms"] and row["p50_ms"] > base["p50_ms"] * MAX_P50_GROWTH:
+            problems.append(f"{key}: p50 {base['p50_ms']:.1f}ms -> {row['p50_ms']:.1f}ms")
+    return problems
+
+
+def report(results: Dict[str, Any]) -> None:
+    rows = results["strategies"]
+    print(f"{'strategy':<16}{'docs':>5}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'peak MB':>9}"
+          f"{'acc':>7}{'exact':>7}  stages (mean ms)")
+    for key, row in rows.items():
+        stages = " ".join(f"{s}={ms:.1f}" for s, ms in sorted(row["stage_mean_ms"].items()))
+        print(f"{key:<16}{row['docs']:>5}{row['errors']:>5}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['peak_mb']:>9.1f}{row['accuracy']:>7.2f}{row['exact_docs']:>7.2f}  {stages}")
+    print()
+    print(f"{'field accuracy':<22}" + "".join(f"{key:>16}" for key in rows))
+    for f in FIELDS:
+        print(f"{f:<22}" + "".join(f"{row['fields'][f]:>16.2f}" for row in rows.values()))
+    errors = [(key, row["first_error"]) for key, row in rows.items() if row["first_error"]]
+    if errors:
+        print()
+        for key, error in errors:
+            print(f"{key}: first error: {error}")
+    print()
+    for kind, row in results["throughput"].items():
+        print(f"throughput {kind}: {row['docs_per_sec']:.2f} docs/s on {results['workers']} workers "
+              f"({row['per_core']:.2f} per core)")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--docs", type=int, default=10, help="documents per layout")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--rounds", type=int, default=3, help="passes over the corpus for throughput")
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--baseline", help="compare with an earlier --json output")
+    args = ap.parse_args()
+
+    samples = list(generate(args.docs, args.seed))
+    results: Dict[str, Any] = {"docs": args.docs, "seed": args.seed, "workers": args.workers, "strategies": {}}
+    for strategy, (_, kinds) in STRATEGIES.items():
+        records, peak = run_strategy(strategy, samples)
+        for kind in kinds:
+            subset = [r for r in records if r["kind"] == kind]
+            if subset:
+                results["strategies"][f"{strategy}/{kind}"] = summarize(subset, peak)
+    results["throughput"] = throughput(samples, args.workers, args.rounds)
+    report(results)
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=1)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            problems = compare(results, json.load(fh))
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
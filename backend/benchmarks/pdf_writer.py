@@ -0,0 +1,39 @@
+"""
+Minimal multi-page text PDF writer for benchmarks (Helvetica, one text
+block per page, uncompressed content streams).
+"""
+from typing import List, Sequence
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: Sequence[Sequence[str]], font_size: int = 10) -> bytes:
+    """A PDF with one page per entry of ``pages``, each a list of text lines."""
+    leading = font_size + 2
+    n = len(pages)
+    font_id = 3 + 2 * n
+    objs: List[str] = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3 + 2 * i} 0 R" for i in range(n)), n),
+    ]
+    for i, lines in enumerate(pages):
+        content = (f"BT /F1 {font_size} Tf 40 750 Td {leading} TL "
+                   + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET")
+        objs.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                    "/Resources << /Font << /F1 %d 0 R >> >> >>" % (4 + 2 * i, font_id))
+        objs.append("<< /Length %d >>\nstream\n%s\nendstream" % (len(content.encode("latin-1")), content))
+    objs.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer << /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
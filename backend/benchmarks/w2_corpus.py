@@ -0,0 +1,184 @@
+"""
+Synthetic W-2 corpus with ground truth, for benchmarking W2Parser.
+
+    python -m benchmarks.w2_corpus --out /tmp/w2-corpus [--docs 20] [--seed 0]
+
+Every document exists as a text PDF in each layout the parser targets
+(``clean``: colon-separated export, ``jumbled``: IRS box labels run
+together with the values after them) and as a rasterized scan of that PDF
+with paper noise, blur, a small skew and, for some phone photos, a
+90-degree rotation recorded only in the EXIF orientation tag.
+"""
+import argparse
+import io
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Sequence
+
+from benchmarks.pdf_writer import make_pdf
+
+LAYOUTS = ("clean", "jumbled")
+KINDS = ("pdf", "scan")
+
+FIRST_NAMES = ["Jane", "John", "Maria", "Wei", "Aisha", "Carlos", "Emily", "Omar", "Grace", "Liam"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Chen", "Khan", "Lopez", "Nguyen", "Brown", "Patel", "Olsen"]
+EMPLOYERS = ["Acme Corp", "Globex Inc", "Initech LLC", "Umbrella Foods", "Stark Tooling", "Wayne Logistics"]
+CITIES = [("Springfield", "IL", "62704"), ("Austin", "TX", "73301"), ("Denver", "CO", "80202"),
+          ("Albany", "NY", "12207"), ("Salem", "OR", "97301")]
+# Two-digit EIN prefixes the IRS assigns (a subset)
+EIN_PREFIXES = [10, 12, 20, 27, 35, 46, 52, 61, 74, 83, 91]
+
+SOCIAL_SECURITY_RATE = 0.062
+MEDICARE_RATE = 0.0145
+
+
+@dataclass
+class Sample:
+    name: str
+    layout: str
+    kind: str
+    content_type: str
+    data: bytes
+    truth: Dict[str, Any]
+    # How the scan was degraded (empty for PDFs)
+    distortion: Dict[str, Any] = field(default_factory=dict)
+
+
+def make_truth(rng: random.Random, whole_dollars: bool = False) -> Dict[str, Any]:
+    """Ground-truth field values; taxes are consistent with the wages like a real W-2's."""
+    wages = rng.randint(18000, 180000) + (0 if whole_dollars else rng.randint(0, 99) / 100)
+    city, state, _ = rng.choice(CITIES)
+    money = (lambda x: float(round(x))) if whole_dollars else (lambda x: round(x, 2))
+    return {
+        "employee_ssn": f"{rng.randint(100, 665)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+        "employer_ein": f"{rng.choice(EIN_PREFIXES)}-{rng.randint(1000000, 9999999)}",
+        "employer_name": rng.choice(EMPLOYERS),
+        "employee_first_name": rng.choice(FIRST_NAMES),
+        "employee_last_name": rng.choice(LAST_NAMES),
+        "wages": money(wages),
+        "federal_withholding": money(wages * rng.uniform(0.08, 0.2)),
+        "social_security_wages": money(wages),
+        "social_security_tax": money(wages * SOCIAL_SECURITY_RATE),
+        "medicare_wages": money(wages),
+        "medicare_tax": money(wages * MEDICARE_RATE),
+        "state": state,
+    }
+
+
+def _zip_line(rng: random.Random, truth: Dict[str, Any]) -> str:
+    city, zip_code = next((c, z) for c, s, z in CITIES if s == truth["state"])
+    return f"{city}, {truth['state']} {zip_code}"
+
+
+def clean_lines(rng: random.Random, truth: Dict[str, Any]) -> List[str]:
+    return [
+        f"Employee's social security number: {truth['employee_ssn']}",
+        f"Employer identification number: {truth['employer_ein']}",
+        f"Employer's name and address: {truth['employer_name']}",
+        f"Employee's name and address: {truth['employee_first_name']} {truth['employee_last_name']}",
+        f"1. Wages, tips, other compensation: ${truth['wages']:,.2f}",
+        f"2. Federal income tax withheld: ${truth['federal_withholding']:,.2f}",
+        f"3. Social security wages: ${truth['social_security_wages']:,.2f}",
+        f"4. Social security tax withheld: ${truth['social_security_tax']:,.2f}",
+        f"5. Medicare wages and tips: ${truth['medicare_wages']:,.2f}",
+        f"6. Medicare tax withheld: ${truth['medicare_tax']:,.2f}",
+        _zip_line(rng, truth),
+    ]
+
+
+def jumbled_lines(rng: random.Random, truth: Dict[str, Any]) -> List[str]:
+    # The IRS form as a text layer reads it: box labels first, then their values,
+    # whole dollars, an undashed EIN and the form's own "identitication" misprint
+    return [
+        f"a Employee's social security number {truth['employee_ssn']} OMB No. 1545-0008",
+        "b Employer identitication number (EIN) 1 Wages, tips, other compensation 2 Federal income tax withheld",
+        f"{truth['employer_ein'].replace('-', '')} {truth['wages']:.0f} {truth['federal_withholding']:.0f}",
+        f"c Employer's name, address, and ZIP code {truth['employer_name']} "
+        "3 Social security wages 4 Social security tax withheld",
+        f"{truth['social_security_wages']:.0f} {truth['social_security_tax']:.0f}",
+        "5 Medicare wages and tips 6 Medicare tax withheld",
+        f"{truth['medicare_wages']:.0f} {truth['medicare_tax']:.0f}",
+        f"e Employee's first name and initial Last name {truth['employee_first_name']} "
+        f"{truth['employee_last_name']}",
+        _zip_line(rng, truth),
+    ]
+
+
+def _rasterize(pdf: bytes, rng: random.Random) -> "tuple":
+    """Render page 1 and degrade it like a scan or phone photo."""
+    import pdfplumber
+    from PIL import Image, ImageFilter
+
+    dpi = rng.choice([150, 200, 300])
+    with pdfplumber.open(io.BytesIO(pdf)) as doc:
+        img = doc.pages[0].to_image(resolution=dpi).original.convert("L")
+    skew = round(rng.uniform(-4.0, 4.0), 2)
+    img = img.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    noise = Image.effect_noise(img.size, rng.uniform(8, 30))
+    img = Image.blend(img, noise, 0.15)
+    blur = round(rng.uniform(0.0, 1.0), 2)
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    photo = rng.random() < 0.5
+    kwargs: Dict[str, Any] = {}
+    orientation = 1
+    if photo:
+        # Stored sideways, upright only once the EXIF tag is applied
+        orientation = rng.choice([6, 8])
+        img = img.transpose(Image.ROTATE_90 if orientation == 6 else Image.ROTATE_270)
+        exif = img.getexif()
+        exif[0x0112] = orientation
+        kwargs = {"quality": rng.randint(70, 92), "exif": exif.tobytes()}
+    else:
+        kwargs = {"dpi": (dpi, dpi)}
+    fmt = "JPEG" if photo else "PNG"
+    buf = io.BytesIO()
+    img.save(buf, fmt, **kwargs)
+    distortion = {"dpi": dpi, "skew": skew, "blur": blur, "orientation": orientation, "format": fmt}
+    return buf.getvalue(), "image/jpeg" if photo else "image/png", distortion
+
+
+def generate(docs: int = 10, seed: int = 0, layouts: Sequence[str] = LAYOUTS,
+             kinds: Sequence[str] = KINDS) -> Iterator[Sample]:
+    """``docs`` documents per layout, each as every kind (text PDF, scan)."""
+    rng = random.Random(seed)
+    for i in range(docs):
+        for layout in layouts:
+            truth = make_truth(rng, whole_dollars=layout == "jumbled")
+            lines = (clean_lines if layout == "clean" else jumbled_lines)(rng, truth)
+            pdf = make_pdf([lines])
+            for kind in kinds:
+                name = f"{i:03d}-{layout}-{kind}"
+                if kind == "pdf":
+                    yield Sample(name, layout, kind, "application/pdf", pdf, truth)
+                else:
+                    data, content_type, distortion = _rasterize(pdf, rng)
+                    yield Sample(name, layout, kind, content_type, data, truth, distortion)
+
+
+def write(samples: Sequence[Sample], out: str) -> None:
+    """Write each sample's file plus a truth.json manifest."""
+    os.makedirs(out, exist_ok=True)
+    manifest = []
+    for sample in samples:
+        ext = {"application/pdf": ".pdf", "image/png": ".png", "image/jpeg": ".jpg"}[sample.content_type]
+        with open(os.path.join(out, sample.name + ext), "wb") as fh:
+            fh.write(sample.data)
+        manifest.append({"file": sample.name + ext, "layout": sample.layout, "kind": sample.kind,
+                         "content_type": sample.content_type, "truth": sample.truth,
+                         "distortion": sample.distortion})
+    with open(os.path.join(out, "truth.json"), "w") as fh:
+        json.dump(manifest, fh, indent=1)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--docs", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    samples = list(generate(args.docs, args.seed))
+    write(samples, args.out)
+    print(f"Wrote {len(samples)} files to {args.out}")
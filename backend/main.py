@@ -1,12 +1,34 @@
 from fastapi import FastAPI
 from app.api_endpoints import router as api_router
-from app.routes.w2_routes import router as w2_router
+from app.config import get_settings
+from app.tracing import trace_requests
+from app.upload_spool import BodySizeLimit
+from app.routes.w2_routes import router as w2_router, job_runner, parse_scheduler, scratch_space
 
 app = FastAPI(title="Tax Filing API")
+app.middleware("http")(trace_requests)
+app.add_middleware(BodySizeLimit, limits={
+    "/api/w2/upload": lambda: get_settings().w2_upload_max_bytes,
+    "/api/w2/jobs": lambda: get_settings().w2_upload_max_bytes,
+    "/api/w2/batch": lambda: get_settings().w2_batch_max_bytes,
+})
 
 app.include_router(api_router, prefix="/api")
 app.include_router(w2_router, prefix="/api")
 
+@app.on_event("startup")
+async def start_w2_jobs():
+    if get_settings().w2_warm_up:
+        await parse_scheduler.warm_up()
+    await scratch_space.start()
+    await job_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_parse_pool():
+    await job_runner.stop()
+    await scratch_space.stop()
+    parse_scheduler.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Tax Filing API is running"}
@@ -0,0 +1,35 @@
+"""Record the upload each income record was parsed from
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Both stay NULL for records entered by hand, which the unique constraint ignores
+    with op.batch_alter_table("income_records") as batch:
+        batch.add_column(sa.Column("source_sha256", sa.String(length=64), nullable=True))
+        batch.add_column(sa.Column("source_index", sa.Integer(), nullable=True))
+        batch.create_index("ix_income_records_source_sha256", ["source_sha256"])
+        batch.create_unique_constraint("uq_income_records_source",
+                                       ["tax_return_id", "source_sha256", "source_index"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("income_records") as batch:
+        batch.drop_constraint("uq_income_records_source", type_="unique")
+        batch.drop_index("ix_income_records_source_sha256")
+        batch.drop_column("source_index")
+        batch.drop_column("source_sha256")
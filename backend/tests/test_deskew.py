@@ -0,0 +1,20 @@
+import cv2
+import numpy as np
+from app.deskew import deskew, estimate_skew
+
+def _page(angle):
+    img = np.full((900, 700), 240, np.uint8)
+    for i in range(12):
+        cv2.putText(img, "3 Social security wages 48213.00", (40, 80 + 60 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, 20, 2)
+    M = cv2.getRotationMatrix2D((350, 450), angle, 1.0)
+    return cv2.warpAffine(img, M, (700, 900), borderValue=240)
+
+def test_estimate_skew_recovers_rotation():
+    assert abs(estimate_skew(_page(4.0)).angle + 4.0) <= 0.3
+
+def test_small_skew_is_not_applied():
+    page = _page(0.0)
+    out, est = deskew(page)
+    assert not est.applied
+    assert out is page
@@ -0,0 +1,84 @@
+import io
+import json
+import os
+
+import pdfplumber
+from fastapi.testclient import TestClient
+
+from app.form_schemas import F1099_DIV, F1099_INT, F1099_NEC, W2, detect_form
+from app.w2_parser import W2Parser
+from main import app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+INT_TEXT = ("Form 1099-INT Interest Income 2024 PAYER'S name: First Harbor Bank PAYER'S TIN: 52-7654321 "
+            "RECIPIENT'S TIN: XXX-XX-1234 RECIPIENT'S name: Wei Chen 1 Interest income: $1,204.55 "
+            "4 Federal income tax withheld: $0.00")
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), "rb") as fh:
+        return fh.read()
+
+
+class IntOCR:
+    def __init__(self):
+        self.calls = 0
+
+    def image_to_string(self, img, config=''):
+        self.calls += 1
+        return INT_TEXT
+
+
+def test_detects_form_from_markers():
+    assert detect_form("Form W-2 Wage and Tax Statement").form_type == W2
+    assert detect_form("FORM 1099-NEC Nonemployee Compensation").form_type == F1099_NEC
+    assert detect_form("1a Total ordinary dividends 1b Qualified dividends").form_type == F1099_DIV
+    assert detect_form("SSN 123-45-6789 wages 10.00") is None
+
+
+def test_1099_pdfs_parse_with_their_schema():
+    parser = W2Parser()
+    nec, _ = parser.parse_file(_read("f1099_nec.pdf"), "application/pdf")
+    assert nec["form_type"] == F1099_NEC and nec["extraction_tier"] == "text"
+    # The title's "Nonemployee Compensation 2024" is not box 1
+    assert nec["nonemployee_compensation"] == 18250.0
+    assert (nec["payer_name"], nec["payer_tin"], nec["recipient_tin"]) == ("Bright Design LLC", "35-1234567",
+                                                                          "XXX-XX-6789")
+    assert (nec["state"], nec["state_withholding"]) == ("IL", 412.5)
+    assert "wages" not in nec
+
+    div, _ = parser.parse_file(_read("f1099_div.pdf"), "application/pdf")
+    assert div["form_type"] == F1099_DIV
+    # Payer and recipient TINs share one row on the IRS layout
+    assert (div["payer_tin"], div["recipient_tin"]) == ("46-7654321", "XXX-XX-4321")
+    assert (div["total_ordinary_dividends"], div["qualified_dividends"]) == (2340.17, 1980.0)
+
+
+def test_photo_form_is_detected_from_ocr_text_and_cached():
+    with pdfplumber.open(os.path.join(FIXTURES, "f1099_nec.pdf")) as doc:
+        img = doc.pages[0].to_image(resolution=200).original
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    ocr = IntOCR()
+    parser = W2Parser(ocr_backend=ocr)
+    data, _ = parser.parse_file(buf.getvalue(), "image/png", tenant="1")
+    # Zonal W-2 reads are dropped once the page text names another form
+    assert data["form_type"] == F1099_INT and data["extraction_tier"] == "ocr"
+    assert data["interest_income"] == 1204.55 and "wages" not in data
+
+    calls = ocr.calls
+    again, _ = parser.parse_file(buf.getvalue(), "image/png", tenant="1")
+    # The cached page text settles the form, so no zone is read
+    assert again == data and ocr.calls == calls
+
+
+def test_batch_mixes_form_types():
+    files = [("files", ("w2.pdf", _read("w2_clean.pdf"), "application/pdf")),
+             ("files", ("nec.pdf", _read("f1099_nec.pdf"), "application/pdf"))]
+    resp = TestClient(app).post("/api/w2/batch", files=files)
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    by_name = {line.get("filename"): line for line in lines}
+    assert by_name["w2.pdf"]["form_type"] == W2
+    assert by_name["nec.pdf"]["form_type"] == F1099_NEC
+    assert lines[-1]["summary"]["forms"] == {W2: 1, F1099_NEC: 1}
@@ -0,0 +1,49 @@
+import io
+
+from PIL import Image
+
+from app.image_decode import decode_array_for_ocr, decode_for_ocr, estimate_dpi
+
+
+def _photo(size, fmt="JPEG", orientation=None, dpi=None):
+    img = Image.new("RGB", size, (230, 230, 225))
+    # A dark mark in the top-left corner as stored, to check the rotation
+    img.paste((0, 0, 0), (0, 0, size[0] // 10, size[1] // 10))
+    kwargs = {}
+    if orientation:
+        exif = img.getexif()
+        exif[0x0112] = orientation
+        kwargs["exif"] = exif.tobytes()
+    if dpi:
+        kwargs["dpi"] = (dpi, dpi)
+    buf = io.BytesIO()
+    img.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+def test_estimate_dpi():
+    # A Letter page filling a 12 MP frame, a single wide form, a 300 dpi scan
+    assert round(estimate_dpi(Image.new("L", (3024, 4032)))) == 367
+    assert round(estimate_dpi(Image.new("L", (4250, 2000)))) == 500
+    scan = Image.open(io.BytesIO(_photo((2550, 3300), "PNG", dpi=300)))
+    assert round(estimate_dpi(scan)) == 300
+
+
+def test_large_jpeg_is_reduced_while_decoding_and_turned_upright():
+    data = _photo((6000, 4000), orientation=6)
+    img, info = decode_for_ocr(io.BytesIO(data))
+    gray, array_info = decode_array_for_ocr(data, io.BytesIO(data))
+    for size, decoded in ((img.size, info), ((gray.shape[1], gray.shape[0]), array_info)):
+        assert decoded.reduction == 2
+        # Rotated to portrait, close to 300 dpi along the page's 11 in
+        assert size[0] < size[1]
+        assert 0.8 * 3300 <= size[1] <= 3300
+    assert img.mode == "L"
+    # Orientation 6 turns the stored top-left corner to the top-right
+    assert img.getpixel((img.width - 5, 5)) < 50 and img.getpixel((5, 5)) > 200
+
+
+def test_scans_at_ocr_resolution_are_left_alone():
+    data = _photo((2550, 3300), "PNG", dpi=300)
+    img, info = decode_for_ocr(io.BytesIO(data))
+    assert img.size == (2550, 3300) and info.reduction == 1
@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select, text
+
+from app.errors import TaxReturnNotFoundError
+from app.income_records import IncomeRecordStore
+from app.models import Base, IncomeRecord, IncomeType, TaxReturn
+from app.routes import w2_routes
+from main import app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+W2 = {"form_type": "w2", "employer_ein": "12-3456789", "employer_name": "Acme Corp", "wages": 50000.0,
+      "federal_withholding": 6000.0, "social_security_wages": 50000.0, "medicare_wages": 50000.0,
+      "state_withholding": 1200.0}
+NEC = {"form_type": "1099-nec", "payer_tin": "35-1234567", "payer_name": "Bright Design LLC",
+       "nonemployee_compensation": 18250.0, "federal_withholding": 0.0, "state_withholding": 412.5}
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), "rb") as fh:
+        return fh.read()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IncomeRecordStore(create_engine(f"sqlite:///{tmp_path / 'tax.db'}"))
+    Base.metadata.create_all(store.engine)
+    with store.sessions() as session, session.begin():
+        session.add(TaxReturn(id=1, tax_year=2024))
+    return store
+
+
+def _inserts(store):
+    statements = []
+    event.listen(store.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement)
+                 if statement.startswith("INSERT") else None)
+    return statements
+
+
+def test_batch_is_one_insert_and_deduplicated(store):
+    inserts = _inserts(store)
+    # The second W-2 is the same file again
+    assert store.save(1, [(W2, "a" * 64, 0), (NEC, "b" * 64, 0), (W2, "a" * 64, 0)]) == {"inserted": 2, "duplicates": 1}
+    assert len(inserts) == 1
+
+    with store.sessions() as session:
+        rows = {r.income_type: r for r in session.scalars(select(IncomeRecord))}
+    w2, nec = rows[IncomeType.W2_WAGES], rows[IncomeType.SELF_EMPLOYMENT]
+    assert (w2.amount, w2.wages_tips, w2.medicare_wages, w2.payer_ein) == (50000.0, 50000.0, 50000.0, "12-3456789")
+    assert (w2.federal_withholding, w2.state_withholding) == (6000.0, 1200.0)
+    assert (nec.amount, nec.nonemployee_compensation, nec.payer_ein) == (18250.0, 18250.0, "35-1234567")
+
+    # Uploading the same files again stores nothing; another file from the same employer does
+    assert store.save(1, [(W2, "a" * 64, 0), (W2, "c" * 64, 0)]) == {"inserted": 1, "duplicates": 1}
+
+
+def test_split_upload_keeps_every_employee(store):
+    # Two employees' W-2s from one employer in one PDF, one with no EIN read
+    first = {**W2, "employee_ssn": "111-11-1111"}
+    second = {**W2, "employee_ssn": "222-22-2222", "employer_ein": None}
+    assert store.save(1, [(first, "a" * 64, 0), (second, "a" * 64, 1)]) == {"inserted": 2, "duplicates": 0}
+    assert store.save(1, [(first, "a" * 64, 0), (second, "a" * 64, 1)]) == {"inserted": 0, "duplicates": 2}
+
+
+def test_migration_adds_sources_to_existing_tables(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # income_records as created before uploads were recorded
+        conn.execute(text("DROP TABLE income_records"))
+        conn.execute(text(
+            "CREATE TABLE income_records (id INTEGER PRIMARY KEY, tax_return_id INTEGER REFERENCES tax_returns(id),"
+            " income_type VARCHAR(16), amount FLOAT, payer_name VARCHAR, payer_ein VARCHAR,"
+            " federal_withholding FLOAT, state_withholding FLOAT, wages_tips FLOAT, social_security_wages FLOAT,"
+            " medicare_wages FLOAT, nonemployee_compensation FLOAT)"))
+        conn.execute(text("INSERT INTO tax_returns (id, tax_year) VALUES (1, 2024)"))
+    config = Config(os.path.join(BACKEND, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND, "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+    store = IncomeRecordStore(engine)
+    assert store.save(1, [(W2, "a" * 64, 0), (W2, "a" * 64, 0)]) == {"inserted": 1, "duplicates": 1}
+    with store.sessions() as session, session.begin():
+        # Records entered by hand have no source and never conflict
+        session.add_all([IncomeRecord(tax_return_id=1, income_type=IncomeType.INTEREST, amount=10.0)
+                         for _ in range(2)])
+    with store.sessions() as session:
+        assert len(session.scalars(select(IncomeRecord)).all()) == 3
+    command.downgrade(config, "base")
+
+
+def test_unknown_tax_return_is_rejected(store):
+    with pytest.raises(TaxReturnNotFoundError):
+        store.save(2, [(W2, "a" * 64, 0)])
+
+
+def test_upload_and_batch_save_income_records(store, monkeypatch):
+    monkeypatch.setattr(w2_routes, "income_store", store)
+    client = TestClient(app)
+    assert client.post("/api/w2/upload?tax_return_id=2",
+                       files={"file": ("w2.pdf", _read("w2_clean.pdf"), "application/pdf")}).status_code == 404
+
+    resp = client.post("/api/w2/upload?tax_return_id=1",
+                       files={"file": ("w2.pdf", _read("w2_clean.pdf"), "application/pdf")})
+    assert resp.json()["income_records"] == {"inserted": 1, "duplicates": 0}
+
+    resp = client.post("/api/w2/upload?tax_return_id=1&split=true",
+                       files={"file": ("w2.pdf", _read("w2_multi.pdf"), "application/pdf")})
+    assert resp.json()["income_records"] == {"inserted": 3, "duplicates": 0}
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("w2.pdf", _read("w2_clean.pdf"))
+        zf.writestr("nec.pdf", _read("f1099_nec.pdf"))
+    resp = client.post("/api/w2/batch?tax_return_id=1",
+                       files=[("files", ("forms.zip", archive.getvalue(), "application/zip"))])
+    summary = json.loads(resp.text.splitlines()[-1])["summary"]
+    assert summary["income_records"] == {"inserted": 1, "duplicates": 1}
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+from app.lazy_import import lazy_import
+from app.w2_parser import W2Parser
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pdfplumber", "pdfminer", "PIL", "cv2", "numpy", "pytesseract", "tesserocr")
+# Generous: the heavy libraries alone take several times this to import
+ROUTES_IMPORT_BUDGET_MS = 500
+
+
+def _import_times(module):
+    """``python -X importtime`` of ``module`` in a fresh interpreter: {module: cumulative ms}."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BACKEND,
+                         capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in out.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_app_import_skips_heavy_dependencies():
+    times = _import_times("main")
+    assert not [m for m in times if m.split(".")[0] in HEAVY]
+    assert times["app.routes.w2_routes"] < ROUTES_IMPORT_BUDGET_MS
+
+
+def test_lazy_module_and_warm_up():
+    missing = lazy_import("no_such_module_for_w2")
+    assert not missing and not missing.loaded
+    timings = W2Parser().warm_up()
+    # No tesseract is needed: a failed OCR step is logged, and timed all the same
+    assert set(timings) == {"imports", "profiles", "ocr"}
+    assert "pdfplumber" in sys.modules
+
+
+def test_image_decode_import_skips_opencv():
+    times = _import_times("app.image_decode")
+    assert not [m for m in times if m.split(".")[0] in HEAVY]
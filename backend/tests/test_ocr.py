@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from app.ocr import OCRBackend, parse_config
+from app.parse_pool import ParsePool
+
+def test_parse_config_maps_cli_flags_to_variables():
+    psm, variables = parse_config("--psm 7 --dpi 300 -c tessedit_char_whitelist=0123456789.,")
+    assert psm == 7
+    assert variables == {"user_defined_dpi": "300", "tessedit_char_whitelist": "0123456789.,"}
+
+def test_backends_must_implement_image_to_string():
+    class NoOCR(OCRBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        NoOCR()
+
+
+def test_pool_caps_omp_threads_before_starting_workers(monkeypatch):
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    pool = ParsePool(max_workers=1, omp_threads=3)
+    try:
+        pool._get_executor()
+        assert os.environ["OMP_THREAD_LIMIT"] == "3"
+    finally:
+        pool.shutdown()
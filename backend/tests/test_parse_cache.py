@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from app.parse_cache import ParseCache, cache_key
+
+def test_cache_key_includes_parser_version():
+    assert cache_key("abc", "1", "application/pdf") != cache_key("abc", "2", "application/pdf")
+
+def test_memory_lru_and_disk_tier(tmp_path):
+    cache = ParseCache(max_entries=1, directory=str(tmp_path), max_disk_bytes=10_000)
+
+    async def scenario():
+        await cache.put("a", {"wages": 1.0}, "pdf")
+        await cache.put("b", {"wages": 2.0}, "pdf")
+        # "a" fell out of memory but is still on disk
+        assert await cache.get("a") == ({"wages": 1.0}, "pdf")
+        assert await cache.get("missing") is None
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+def test_disk_tier_evicts_by_size(tmp_path):
+    cache = ParseCache(max_entries=0, directory=str(tmp_path), max_disk_bytes=120)
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await cache.put(key, {"employer_name": "x" * 40}, "pdf")
+        return await cache.get("c")
+
+    assert asyncio.run(scenario()) is not None
+    assert cache.stats()["disk_bytes"] <= 120
+
+def test_disk_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ParseCache(max_entries=0, directory=str(tmp_path))
+    threads = []
+
+    def spy(method):
+        def call(*args):
+            threads.append(threading.current_thread())
+            return method(*args)
+        return call
+
+    monkeypatch.setattr(cache, "_disk_get", spy(cache._disk_get))
+    monkeypatch.setattr(cache, "_disk_put", spy(cache._disk_put))
+
+    async def scenario():
+        await cache.put("a", {"wages": 1.0}, "pdf")
+        return await cache.get("a")
+
+    assert asyncio.run(scenario()) == ({"wages": 1.0}, "pdf")
+    assert len(threads) == 2 and threading.main_thread() not in threads
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import threading
+import time
+import zlib
+
+from app import parse_lanes
+from app.parse_lanes import FAST, SLOW, ParseScheduler, pdf_has_text_layer
+from app.parse_pool import ParsePool
+from app.w2_confidence import CHECKED_FIELDS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+CONFIDENT = {"confidence": {f: 0.95 for f in CHECKED_FIELDS}}
+
+
+def fake_parse(source, content_type, text_only, tenant=None):
+    if not text_only:
+        time.sleep(0.5)
+    return CONFIDENT, "pdf"
+
+
+def test_text_layer_detection():
+    with open(os.path.join(FIXTURES, "w2_clean.pdf"), "rb") as fh:
+        assert pdf_has_text_layer(fh.read())
+    scanned = b"%PDF-1.4\n1 0 obj << /Type /XObject /Subtype /Image >> endobj"
+    assert not pdf_has_text_layer(scanned)
+    packed = zlib.compress(b"5 0 obj << /Font << /F1 6 0 R >> >>")
+    assert pdf_has_text_layer(b"%PDF-1.5\n7 0 obj << /Type /ObjStm /N 1 >>\nstream\r\n" + packed)
+
+
+def test_text_pdfs_do_not_queue_behind_ocr():
+    with open(os.path.join(FIXTURES, "w2_clean.pdf"), "rb") as fh:
+        pdf = fh.read()
+    scheduler = ParseScheduler(ParsePool(max_workers=1, max_queue=4), ParsePool(max_workers=1, max_queue=4))
+    assert asyncio.run(scheduler.classify(pdf, "application/pdf")) == FAST
+    assert asyncio.run(scheduler.classify(b"\x89PNG", "image/png")) == SLOW
+
+    async def scenario():
+        # Warm up the fast lane's worker process
+        await scheduler.run(pdf, "application/pdf", fake_parse)
+        scans = [asyncio.ensure_future(scheduler.run(b"\x89PNG", "image/png", fake_parse)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        await scheduler.run(pdf, "application/pdf", fake_parse)
+        fast_ms = (time.perf_counter() - start) * 1000
+        await asyncio.gather(*scans)
+        return fast_ms
+
+    try:
+        fast_ms = asyncio.run(scenario())
+    finally:
+        scheduler.shutdown()
+    assert fast_ms < 400
+    stats = scheduler.stats()
+    assert stats["routed"] == {FAST: 2, SLOW: 3}
+    assert stats["escalated"] == 0
+    assert stats[SLOW]["completed"] == 3
+
+
+def test_classify_scans_pdfs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def scan(buf):
+        threads.append(threading.current_thread())
+        return True
+
+    monkeypatch.setattr(parse_lanes, "pdf_has_text_layer", scan)
+    scheduler = ParseScheduler(ParsePool(max_workers=1), ParsePool(max_workers=1))
+    assert asyncio.run(scheduler.classify(b"%PDF-1.4", "application/pdf")) == FAST
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import time
+import pytest
+from app.errors import ParseQueueFullError, ParseWorkerError
+from app.parse_pool import ParsePool
+
+def test_pool_rejects_when_saturated():
+    pool = ParsePool(max_workers=1, max_queue=0, retry_after=7)
+
+    async def scenario():
+        slow = asyncio.ensure_future(pool.run(time.sleep, 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(ParseQueueFullError) as exc:
+            await pool.run(abs, -1)
+        assert exc.value.retry_after == 7
+        await slow
+        assert await pool.run(abs, -1) == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["queue_depth"] == 0
+
+
+def test_waiters_get_free_slots_in_order():
+    pool = ParsePool(max_workers=1, max_queue=0)
+    order = []
+
+    async def waiter(n):
+        await pool.run_when_free(abs, -n)
+        order.append(n)
+
+    async def scenario():
+        slow = asyncio.ensure_future(pool.run(time.sleep, 0.3))
+        await asyncio.sleep(0)
+        waiters = []
+        for n in range(1, 5):
+            waiters.append(asyncio.ensure_future(waiter(n)))
+            await asyncio.sleep(0)
+        await asyncio.gather(slow, *waiters)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert order == [1, 2, 3, 4]
+    assert pool.stats()["rejected"] == 0
+
+
+def test_dead_worker_is_reported_and_the_executor_replaced():
+    pool = ParsePool(max_workers=1, max_queue=0)
+
+    async def scenario():
+        broken = pool._get_executor()
+        with pytest.raises(ParseWorkerError):
+            await pool.run(os._exit, 1)
+        assert pool._executor is None and broken._shutdown_thread
+        return await pool.run(abs, -1)
+
+    try:
+        assert asyncio.run(scenario()) == 1
+    finally:
+        pool.shutdown()
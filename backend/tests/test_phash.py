@@ -0,0 +1,89 @@
+import io
+import os
+import random
+
+import numpy as np
+import pdfplumber
+from PIL import Image
+
+from app.phash import MAX_MISMATCH, Fingerprint, OCRCache, fingerprint, mismatch
+from app.w2_parser import W2Parser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# Pages 1 and 3 are two employees' W-2s, a few digits apart
+MULTI = os.path.join(FIXTURES, "w2_multi.pdf")
+
+
+def _photo(page: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    with pdfplumber.open(MULTI) as doc:
+        img = doc.pages[page].to_image(resolution=rng.choice([200, 300])).original.convert("L")
+    img = img.rotate(rng.uniform(-1.5, 1.5), resample=Image.BICUBIC, expand=True, fillcolor=255)
+    img = Image.blend(img, Image.effect_noise(img.size, 20), 0.1)
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+class CountingOCR:
+    def __init__(self):
+        self.calls = 0
+
+    def image_to_string(self, img, config=''):
+        self.calls += 1
+        return "Employee's social security number: 124-45-6788\nWages, tips, other compensation: $41,000.00"
+
+
+def _fp(h: int) -> Fingerprint:
+    return Fingerprint(h, np.zeros((1, 1), np.uint8), 1, np.zeros((0, 2), np.float32), None)
+
+
+def test_index_finds_neighbours_and_evicts_lru():
+    cache = OCRCache(max_entries=2, max_distance=3)
+    for h in (0b0000, 0b1111 << 100, 0b0111):
+        cache.put("1", _fp(h), {"page": str(h)})
+    # The first entry was evicted, from the chunk tables too
+    assert cache.candidates("1", 0b0001) == [(2, 0b0111)]
+    assert cache.candidates("1", 1 << 200) == []
+    assert cache.stats()["entries"] == 2
+
+
+def test_tenants_never_see_each_others_entries():
+    cache = OCRCache(max_entries=4, max_distance=3)
+    cache.put("1", _fp(0b0111), {"page": "first"})
+    cache.put("2", _fp(0b0111), {"page": "second"})
+    assert cache.candidates("3", 0b0111) == []
+    assert cache.stats()["entries"] == 2
+    # Evicting one tenant's entry leaves the other's copy of the hash indexed
+    cache.max_entries = 2
+    cache.put("2", _fp(0b0110), {"page": "third"})
+    assert cache.candidates("1", 0b0111) == []
+    assert cache.candidates("2", 0b0111) == [(0, 0b0111), (1, 0b0110)]
+
+
+def test_verification_tells_rephotos_from_other_employees():
+    decode = lambda data: W2Parser()._preprocess_image(io.BytesIO(data))
+    first, again, other = (fingerprint(decode(_photo(page, seed))) for page, seed in ((0, 1), (0, 2), (2, 3)))
+    assert mismatch(first, again) <= MAX_MISMATCH < mismatch(first, other)
+
+
+def test_rephotographed_w2_reuses_ocr_text():
+    ocr = CountingOCR()
+    parser = W2Parser(ocr_backend=ocr)
+    data, _ = parser.parse_file(_photo(0, 1), "image/png", tenant="1")
+    assert data["employee_ssn"] == "124-45-6788" and ocr.calls > 0
+
+    calls = ocr.calls
+    again, _ = parser.parse_file(_photo(0, 2), "image/png", tenant="1")
+    assert again == data and ocr.calls == calls
+
+    parser.parse_file(_photo(2, 3), "image/png", tenant="1")
+    assert ocr.calls > calls
+    assert parser.ocr_cache.stats()["hits"] == 1
+
+    # Another tax return's photo of the same form, or one with no tax return, is read afresh
+    for tenant in ("2", None):
+        calls = ocr.calls
+        parser.parse_file(_photo(0, 2), "image/png", tenant=tenant)
+        assert ocr.calls > calls
+    assert parser.ocr_cache.stats()["hits"] == 1
@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+import pytest
+
+from app.errors import ScratchQuotaError
+from app.scratch import ScratchSpace
+from app.upload_spool import SpooledUpload
+
+
+def test_spool_counts_against_quota_until_cleanup(tmp_path):
+    scratch = ScratchSpace(str(tmp_path), quota_bytes=100)
+    spool = SpooledUpload(max_memory=4, suffix=".pdf", scratch=scratch)
+    spool.write(b"abc")
+    spool.write(b"defgh")
+    spool.finish()
+    assert os.path.dirname(os.path.dirname(spool.source)) == str(tmp_path)
+    assert scratch.bytes_in_use == 8
+    spool.cleanup()
+    assert scratch.bytes_in_use == 0 and os.listdir(tmp_path) == []
+
+
+def test_saved_upload_leaves_scratch(tmp_path):
+    scratch = ScratchSpace(str(tmp_path / "scratch"), quota_bytes=100)
+    with SpooledUpload(max_memory=1, scratch=scratch) as spool:
+        spool.write(b"abcdef")
+        spool.finish()
+        spool.save(str(tmp_path / "kept"))
+        assert scratch.bytes_in_use == 0
+    assert (tmp_path / "kept").read_bytes() == b"abcdef"
+
+
+def test_full_quota_waits_then_rejects(tmp_path):
+    scratch = ScratchSpace(str(tmp_path), quota_bytes=4, wait_seconds=0.2, poll=0.01)
+    spool = SpooledUpload(max_memory=0, scratch=scratch)
+    spool.write(b"abcd")
+
+    async def wait_and_free():
+        asyncio.get_running_loop().call_later(0.05, spool.cleanup)
+        await scratch.wait_for_room()
+
+    asyncio.run(wait_and_free())
+    spool = SpooledUpload(max_memory=0, scratch=scratch)
+    spool.write(b"abcd")
+    with pytest.raises(ScratchQuotaError):
+        asyncio.run(scratch.wait_for_room())
+    assert scratch.stats()["rejected"] == 1
+    spool.cleanup()
+
+
+def test_reaper_removes_orphans_only(tmp_path):
+    scratch = ScratchSpace(str(tmp_path), orphan_seconds=3600)
+    live = scratch.scope()
+    # Left by this process without a live scope, by a dead process, and by a live one
+    for name in (f"{os.getpid()}-leaked", "999999999-crashed", "1-busy", "unrelated"):
+        os.makedirs(tmp_path / name)
+    assert scratch.reap() == 2
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(live.path), "1-busy", "unrelated"])
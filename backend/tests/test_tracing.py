@@ -0,0 +1,41 @@
+import os
+
+from fastapi.testclient import TestClient
+from main import app
+
+from app.tracing import Histogram, span, tracing
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_spans_collect_into_trace_and_histogram():
+    hist = Histogram("t_seconds", "test", "stage", buckets=(0.01, 1.0))
+    with tracing() as trace:
+        with span("regex"):
+            pass
+        with span("regex"):
+            pass
+    assert [stage for stage, _ in trace.spans] == ["regex", "regex"]
+    assert trace.server_timing().startswith("regex;dur=")
+    hist.observe("ocr", 0.5)
+    text = hist.exposition()
+    assert 't_seconds_bucket{stage="ocr",le="0.01"} 0' in text
+    assert 't_seconds_bucket{stage="ocr",le="1.0"} 1' in text
+    assert 't_seconds_count{stage="ocr"} 1' in text
+
+
+def test_upload_returns_server_timing_when_asked():
+    with open(os.path.join(FIXTURES, "w2_clean.pdf"), "rb") as fh:
+        # A trailing comment changes the hash, so the upload is parsed, not served from cache
+        data = fh.read() + b"\n% tracing test\n"
+    client = TestClient(app)
+    files = {"file": ("w2.pdf", data, "application/pdf")}
+
+    resp = client.post("/api/w2/upload", files=files, headers={"X-W2-Trace": "1"})
+    assert resp.status_code == 200
+    stages = {part.split(";")[0] for part in resp.headers["server-timing"].split(", ")}
+    assert {"upload_copy", "queue_wait", "pdf_text", "regex"} <= stages
+
+    assert "server-timing" not in client.post("/api/w2/upload", files=files).headers
+    metrics = client.get("/api/w2/metrics")
+    assert 'w2_stage_seconds_count{stage="pdf_text"}' in metrics.text
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import os
+
+from fastapi.testclient import TestClient
+from main import app
+
+from app.config import get_settings
+from app.file_types import sniff_type
+from app.upload_spool import MULTIPART_OVERHEAD, SpooledUpload
+
+def test_small_upload_stays_in_memory():
+    with SpooledUpload(max_memory=16) as spool:
+        spool.write(b"%PDF-1.4")
+        spool.finish()
+        assert spool.path is None
+        assert spool.source == b"%PDF-1.4"
+        assert spool.sha256 == hashlib.sha256(b"%PDF-1.4").hexdigest()
+
+def test_large_upload_spools_once_and_is_removed():
+    spool = SpooledUpload(max_memory=4, suffix=".pdf")
+    spool.write(b"abc")
+    spool.write(b"defgh")
+    spool.finish()
+    path = spool.source
+    with open(path, "rb") as fh:
+        assert fh.read() == b"abcdefgh"
+    spool.cleanup()
+    assert not os.path.exists(path)
+
+def test_sniff_type_reads_magic_bytes():
+    assert sniff_type(b"%PDF-1.7\n") == "application/pdf"
+    assert sniff_type(b"\r\n%PDF-1.4") == "application/pdf"
+    assert sniff_type(b"\x89PNG\r\n\x1a\n....") == "image/png"
+    assert sniff_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert sniff_type(b"<html>") is None
+
+def test_upload_type_and_size_are_checked_before_spooling():
+    client = TestClient(app)
+    png = b"\x89PNG\r\n\x1a\n" + b"\0" * 32
+    resp = client.post("/api/w2/upload", files={"file": ("w2.pdf", png, "application/pdf")})
+    assert resp.status_code == 415 and "image/png" in resp.json()["detail"]
+    resp = client.post("/api/w2/upload", files={"file": ("w2.exe", b"MZ\x90\0", "application/octet-stream")})
+    assert resp.status_code == 415
+
+    limit = get_settings().w2_upload_max_bytes
+    huge = b"%PDF-1.4\n" + b"\0" * (limit + MULTIPART_OVERHEAD)
+    resp = client.post("/api/w2/upload", files={"file": ("w2.pdf", huge, "application/pdf")})
+    assert resp.status_code == 413
+
+def test_chunked_and_batch_bodies_are_cut_off_at_the_limit(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "w2_upload_max_bytes", 1024)
+    monkeypatch.setattr(settings, "w2_batch_max_bytes", 1024)
+    head = (b'--b\r\nContent-Disposition: form-data; name="file"; filename="w2.pdf"\r\n'
+            b"Content-Type: application/pdf\r\n\r\n%PDF-1.4\n")
+    chunks = [head] + [b"\0" * 1024] * (10 * MULTIPART_OVERHEAD // 1024) + [b"\r\n--b--\r\n"]
+    received, sent = [], []
+
+    async def receive():
+        # A chunked body: no Content-Length, one message per chunk
+        chunk = chunks[len(received)]
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": len(received) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/w2/upload", "raw_path": b"/api/w2/upload",
+             "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+             "headers": [(b"content-type", b"multipart/form-data; boundary=b")],
+             "client": ("test", 1), "server": ("test", 80)}
+    asyncio.run(app(scope, receive, send))
+    # Cut off once past the limit, not after the whole body was buffered
+    assert sent[0]["status"] == 413
+    assert sum(map(len, received)) <= 1024 + MULTIPART_OVERHEAD + 2 * 1024
+
+    huge = b"%PDF-1.4\n" + b"\0" * (1024 + MULTIPART_OVERHEAD)
+    resp = TestClient(app).post("/api/w2/batch", files=[("files", ("w2.pdf", huge, "application/pdf"))])
+    assert resp.status_code == 413
@@ -0,0 +1,38 @@
+import io
+import json
+import os
+import zipfile
+
+from fastapi.testclient import TestClient
+from main import app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), "rb") as fh:
+        return fh.read()
+
+
+def test_batch_streams_ndjson_and_dedupes_zip_members():
+    clean = _read("w2_clean.pdf")
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("client/w2_copy.pdf", clean)
+        zf.writestr("client/notes.txt", b"not a w-2")
+    files = [("files", ("w2.pdf", clean, "application/pdf")),
+             ("files", ("bundle.zip", archive.getvalue(), "application/zip"))]
+
+    resp = TestClient(app).post("/api/w2/batch", files=files)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    by_name = {line.get("filename"): line for line in lines}
+
+    assert by_name["bundle.zip/client/notes.txt"]["status"] == "error"
+    first, copy = by_name["w2.pdf"], by_name["bundle.zip/client/w2_copy.pdf"]
+    assert first["status"] == copy["status"] == "ok"
+    assert first["parsed_data"]["wages"] == 50000.0
+    assert copy["duplicate_of"] == first["index"] and copy["sha256"] == first["sha256"]
+    assert set(first["timing"]) == {"queued_ms", "parse_ms", "finished_ms"}
+    assert lines[-1]["summary"] == {**lines[-1]["summary"], "files": 3, "unique": 1, "failed": 1}
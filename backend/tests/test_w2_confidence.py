@@ -0,0 +1,42 @@
+from app.w2_confidence import CHECKED_FIELDS, score_fields, valid_ein, valid_ssn
+from app.w2_parser import W2Parser
+
+GOOD = {"employee_ssn": "123-45-6789", "employer_ein": "12-3456789", "employer_name": "Acme Corp",
+        "wages": 50000.0, "federal_withholding": 6000.0,
+        "social_security_wages": 50000.0, "social_security_tax": 3100.0,
+        "medicare_wages": 250000.0, "medicare_tax": 4075.0}
+
+
+def test_id_validity_rules():
+    assert valid_ssn("123-45-6789") and not valid_ssn("666-45-6789") and not valid_ssn("123-00-6789")
+    assert valid_ein("12-3456789") and not valid_ein("07-3456789") and not valid_ein("AB1234567")
+
+
+def test_cross_checks_penalize_both_fields_of_a_mismatch():
+    scores = score_fields(GOOD, "text")
+    # Box 6 includes the additional 0.9% withheld on wages above $200,000
+    assert all(scores[f] == 0.9 for f in CHECKED_FIELDS)
+    scores = score_fields({**GOOD, "social_security_tax": 310.0}, "text")
+    assert scores["social_security_tax"] == scores["social_security_wages"] == 0.45
+    assert scores["medicare_tax"] == 0.9
+
+
+def test_tiers_stop_early_and_escalate_only_failing_fields():
+    calls = []
+
+    def tier(name, data):
+        def run(fields):
+            calls.append((name, fields))
+            return data
+        return name, run
+
+    parser = W2Parser()
+    data = parser._finish(parser._run_tiers([
+        tier("text", {**GOOD, "social_security_tax": 31.0, "employer_name": None}),
+        tier("geometry", {"social_security_tax": 3100.0, "employer_name": "Acme Corp"}),
+        tier("ocr", GOOD)]))
+    assert [name for name, _ in calls] == ["text", "geometry"]
+    assert calls[1][1] == ["employer_name", "social_security_wages", "social_security_tax"]
+    assert (data["social_security_tax"], data["employer_name"], data["extraction_tier"]) == \
+        (3100.0, "Acme Corp", "geometry")
+    assert data["confidence"]["social_security_wages"] == 0.9
@@ -0,0 +1,24 @@
+from app.w2_geometry import extract_fields
+
+def _words(line, top, x=40.0):
+    out = []
+    for token in line.split():
+        out.append({"text": token, "x0": x, "x1": x + 6 * len(token), "top": top, "bottom": top + 8})
+        x += 6 * len(token) + 4
+    return out
+
+def test_values_below_boxed_labels():
+    words = (_words("1 Wages, tips, other compensation", 100, x=300)
+             + _words("2 Federal income tax withheld", 100, x=480)
+             + _words("48,213.07", 114, x=310)
+             + _words("5,120.00", 114, x=490)
+             + _words("3 Social security wages", 130, x=300)
+             + _words("4 Social security tax withheld", 130, x=480)
+             + _words("48213.07", 144, x=310)
+             + _words("2989.21", 144, x=490))
+    data = extract_fields([(words, 612.0)])
+    assert data["wages"] == 48213.07
+    assert data["federal_withholding"] == 5120.0
+    assert data["social_security_wages"] == 48213.07
+    assert data["social_security_tax"] == 2989.21
+    assert data["medicare_wages"] is None
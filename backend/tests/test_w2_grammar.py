@@ -0,0 +1,40 @@
+from app.w2_profiles import get_profile_index
+from app.w2_parser import W2Parser
+
+CLEAN_TABLE = get_profile_index().get("clean").table
+JUMBLED_TABLE = get_profile_index().get("jumbled").table
+FALLBACK_TABLE = get_profile_index().get("fallback").table
+
+def test_clean_table_reads_values_after_labels():
+    txt = ("Employee’s social security number: 123-45-6789 Employer identification number: 12-3456789 "
+           "Employee's name and address: Jane Doe 1 Main St Springfield, IL 62704 "
+           "1. Wages, tips, other compensation: $50,000.00 2. Federal income tax withheld: $6,000.00")
+    data = CLEAN_TABLE.extract(txt)
+    assert data["employee_ssn"] == "123-45-6789"
+    assert (data["employee_first_name"], data["employee_last_name"]) == ("Jane", "Doe")
+    assert data["wages"] == 50000.0
+    assert data["federal_withholding"] == 6000.0
+    assert data["state"] == "IL"
+    assert data["medicare_tax"] == 0.0
+
+def test_jumbled_blocks_are_all_or_nothing():
+    txt = ("Employer identitication number (EIN) 1 Wages, tips, other compensation 2 Federal income tax withheld "
+           "AB1234567 50000 6000 5 Medicare wages and tips 6 Medicare tax withheld 50000")
+    data = JUMBLED_TABLE.extract(txt)
+    assert (data["employer_ein"], data["wages"], data["federal_withholding"]) == ("AB1234567", 50000.0, 6000.0)
+    assert (data["medicare_wages"], data["medicare_tax"]) == (0.0, 0.0)
+
+def test_fallback_prefers_higher_priority_anchor_and_bounds_window():
+    txt = "identification 98-7654321 EIN 12-3456789 Wages " + "x " * 500 + "99,999.00"
+    data = FALLBACK_TABLE.extract(txt)
+    assert data["employer_ein"] == "12-3456789"
+    # The amount is far outside the window after "Wages"
+    assert data["wages"] == 0.0
+
+def test_text_that_lowercases_longer_keeps_offsets():
+    # "İ" lower-cases to two code points
+    txt = ("Employee's social security number: 123-45-6789 Employer's name and address: İstanbul Kebab "
+           "Employee's name and address: İlker Yilmaz 1. Wages, tips, other compensation: $41,000.00")
+    data = W2Parser()._parse_text(txt)
+    assert data["employee_ssn"] == "123-45-6789"
+    assert data["wages"] == 41000.0
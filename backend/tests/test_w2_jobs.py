@@ -0,0 +1,116 @@
+import asyncio
+import os
+import threading
+import time
+
+from app.parse_cache import ParseCache
+from app.parse_lanes import ParseScheduler
+from app.parse_pool import ParsePool
+from app.upload_spool import SpooledUpload
+from app.w2_jobs import DONE, FAILED, QUEUED, RUNNING, JobRunner, JobStore
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _upload(data):
+    spool = SpooledUpload(max_memory=1024 * 1024)
+    spool.write(data)
+    spool.finish()
+    return spool
+
+
+def test_jobs_run_in_background_and_dedupe_by_hash(tmp_path):
+    with open(os.path.join(FIXTURES, "w2_clean.pdf"), "rb") as fh:
+        pdf = fh.read()
+    scheduler = ParseScheduler(ParsePool(max_workers=1, max_queue=1), ParsePool(max_workers=1, max_queue=1))
+    runner = JobRunner(str(tmp_path), scheduler, ParseCache(max_entries=8), concurrency=1, poll=0.05)
+
+    async def scenario():
+        await runner.start()
+        job, created = await runner.submit(_upload(pdf), "application/pdf", "w2.pdf")
+        assert created and job["status"] == QUEUED
+        again, created = await runner.submit(_upload(pdf), "application/pdf", "copy.pdf")
+        assert not created and again["id"] == job["id"]
+        events = [e async for e in runner.events(job["id"], poll=0.05)]
+        await runner.stop()
+        return job["id"], events
+
+    try:
+        job_id, events = asyncio.run(scenario())
+    finally:
+        scheduler.shutdown()
+    assert events[-1].startswith("event: done")
+    job = runner.store.get(job_id)
+    assert job["status"] == DONE and job["input_path"] is None
+    assert os.listdir(tmp_path / "inputs") == []
+    assert '"wages": 50000.0' in job["result"]
+
+
+def test_jobs_left_running_are_requeued_until_attempts_run_out(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job, _ = store.create("k", "abc", "application/pdf", "w2.pdf", None)
+    assert store.claim()["attempts"] == 1
+    store.close()
+
+    # A new process finds the job still marked running and requeues it
+    store = JobStore(path)
+    assert store.recover(max_attempts=2) == []
+    assert store.get(job["id"])["status"] == QUEUED
+    store.claim()
+    assert [j["id"] for j in store.recover(max_attempts=2)] == [job["id"]]
+    assert store.get(job["id"])["status"] == FAILED
+
+
+
+def test_only_the_lock_holder_runs_and_recovers_jobs(tmp_path):
+    first = JobRunner(str(tmp_path), None, ParseCache(max_entries=8))
+    second = JobRunner(str(tmp_path), None, ParseCache(max_entries=8), max_attempts=1, lock_poll=0.05)
+    job, _ = first.store.create("k", "abc", "application/pdf", "w2.pdf", None)
+    # The first process holds the lock and is running the job
+    assert first._try_lock()
+    first.store.claim()
+
+    async def scenario():
+        await second.start()
+        await asyncio.sleep(0.2)
+        assert second.store.get(job["id"])["status"] == RUNNING
+        stats = await second.stats()
+        assert not stats["running"] and stats["workers"] == 0
+
+        # Once the first process is gone the second takes over and recovers its job
+        await first.stop()
+        await asyncio.sleep(0.2)
+        assert (await second.stats())["running"]
+        await second.stop()
+
+    asyncio.run(scenario())
+    assert second.store.get(job["id"])["status"] == FAILED
+
+
+def test_reads_wait_for_the_writer_lock_off_the_event_loop(tmp_path):
+    runner = JobRunner(str(tmp_path), None, ParseCache(max_entries=8))
+    job, _ = runner.store.create("k", "abc", "application/pdf", "w2.pdf", None)
+    # A claim holds the store's lock, e.g. while SQLite waits out a busy writer
+    held = threading.Event()
+
+    def hold():
+        with runner.store._lock:
+            held.set()
+            time.sleep(0.3)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+
+    async def scenario():
+        ticks = 0
+        read = asyncio.ensure_future(runner.get(job["id"]))
+        while not read.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return ticks, read.result()
+
+    ticks, found = asyncio.run(scenario())
+    holder.join()
+    assert found["id"] == job["id"] and ticks > 5
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+from app.w2_layout import (FORM_HEIGHT, FORM_WIDTH, STATE_ID_CONFIG, W2_TEMPLATE, align_to_template, crop_zone,
+                           zones_to_fields)
+
+def test_align_finds_form_border_and_crops_zones():
+    page = np.full((1400, 2000), 250, np.uint8)
+    x0, y0, w, h = 150, 200, 1664, 800
+    cv2.rectangle(page, (x0, y0), (x0 + w, y0 + h), 0, 6)
+    wages = next(z for z in W2_TEMPLATE if z.field == "wages")
+    bx0, by0, bx1, by1 = wages.box
+    cv2.rectangle(page, (x0 + int((bx0 + 0.01) * w), y0 + int((by0 + 0.01) * h)),
+                  (x0 + int((bx1 - 0.01) * w), y0 + int((by1 - 0.01) * h)), 0, -1)
+
+    form = align_to_template(page)
+    assert form.shape == (FORM_HEIGHT, FORM_WIDTH)
+    assert crop_zone(form, wages).mean() < 100
+    federal = next(z for z in W2_TEMPLATE if z.field == "federal_withholding")
+    assert crop_zone(form, federal).mean() > 200
+
+def test_zones_to_fields_normalizes_ids_and_money():
+    data = zones_to_fields({"employee_ssn": "123 45 6789", "employer_ein": "12-3456789",
+                            "wages": "$52,310.44", "state": "IL", "box12": "D 1,500.00\nDD 8200.00"})
+    assert data["employee_ssn"] == "123-45-6789"
+    assert data["employer_ein"] == "12-3456789"
+    assert data["wages"] == 52310.44
+    assert data["federal_withholding"] is None
+    assert data["state"] == "IL"
+    assert data["box12"] == [{"code": "D", "amount": 1500.0}, {"code": "DD", "amount": 8200.0}]
+
+def test_box12_codes_and_state_ids_keep_letters():
+    data = zones_to_fields({"box12": "Q 2,400.00\nI 10.00", "employer_state_id": "CA 123-4567-8"})
+    # Q is combat pay; there is no code I
+    assert data["box12"] == [{"code": "Q", "amount": 2400.0}]
+    assert data["employer_state_id"] == "CA 123-4567-8"
+    assert next(z for z in W2_TEMPLATE if z.field == "employer_state_id").config == STATE_ID_CONFIG
@@ -0,0 +1,70 @@
+import os
+from app.w2_parser import W2Parser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), "rb") as fh:
+        return fh.read()
+
+def test_clean_pdf_parses_from_bytes_by_geometry():
+    data, ftype = W2Parser().parse_file(_read("w2_clean.pdf"), "application/pdf")
+    assert ftype == "pdf"
+    assert data["employee_ssn"] == "123-45-6789"
+    assert data["employer_ein"] == "12-3456789"
+    assert data["employer_name"] == "Acme Corp"
+    assert (data["employee_first_name"], data["employee_last_name"]) == ("Jane", "Doe")
+    assert data["wages"] == 50000.0
+    assert data["medicare_tax"] == 725.0
+    assert data["state"] == "IL"
+    # The text layer's employer name runs into the next label, so geometry settles it
+    assert data["extraction_tier"] == "geometry"
+    assert data["confidence"]["employer_name"] == 0.95
+
+def test_jumbled_pdf_falls_back_to_regex():
+    data, _ = W2Parser().parse_file(os.path.join(FIXTURES, "w2_jumbled.pdf"))
+    assert data["employer_ein"] == "AB1234567"
+    assert data["wages"] == 50000.0
+    assert data["social_security_tax"] == 3100.0
+    assert data["medicare_tax"] == 725.0
+
+def test_pdf_pages_stream_skip_copies_and_stop_early():
+    parser = W2Parser()
+    read, parses = [], []
+    iter_pages, run_tiers = parser._iter_pdf_pages, parser._run_tiers
+
+    def spy_pages(stream):
+        for page in iter_pages(stream):
+            read.append(page)
+            yield page
+
+    def spy_tiers(tiers, *args):
+        parses.append([name for name, _ in tiers])
+        return run_tiers(tiers, *args)
+
+    parser._iter_pdf_pages, parser._run_tiers = spy_pages, spy_tiers
+    data, _ = parser.parse_file(_read("w2_copies.pdf"), "application/pdf")
+    # Instructions (copy B), its copy C (skipped), then the first W-2 completes every field
+    assert len(read) == 3
+    assert parses == [["text", "geometry"], ["text", "geometry"], ["zonal", "ocr"]]
+    assert data["employee_ssn"] == "124-45-6788"
+    assert data["wages"] == 41000.0
+
+def test_pdf_pages_are_each_text_parsed_once():
+    parser = W2Parser()
+    read, parsed = [], []
+    iter_pages, parse_text = parser._iter_pdf_pages, parser._parse_text
+
+    def spy_pages(stream):
+        for page in iter_pages(stream):
+            read.append(page[1])
+            yield page
+
+    def spy_text(txt, form):
+        parsed.append(txt)
+        return parse_text(txt, form)
+
+    parser._iter_pdf_pages, parser._parse_text = spy_pages, spy_text
+    parser.parse_file(_read("w2_copies.pdf"), "application/pdf", text_only=True)
+    # The second page repeats the first and is skipped; the others are read alone, not re-joined
+    assert parsed == [read[0], read[2]]
@@ -0,0 +1,52 @@
+import json
+
+from app.w2_profiles import PROFILE_DIR, ProfileIndex, get_profile_index, load_profiles
+
+IRS_ROW = ("W-2 Wage and Tax Statement OMB No. 1545-0008 Copy B "
+           "Employer identification number (EIN) 1 Wages, tips, other compensation 2 Federal income tax withheld "
+           "12-3456789 50,000.00 6,000.00")
+
+
+def test_dispatch_picks_layout_from_markers():
+    index = get_profile_index()
+    assert index.match("Employee’s social security number: 123-45-6789 Wages $1.00").name == "clean"
+    assert index.match("b Employer identitication number (EIN) 1 Wages").name == "jumbled"
+    assert index.match(IRS_ROW).name == "irs_blank"
+    assert index.match("ADP Earnings Summary " + IRS_ROW).name == "adp"
+    assert index.match("SSN 123-45-6789 wages 10.00").name == "fallback"
+
+
+def test_vendor_profile_inherits_irs_rules():
+    data = get_profile_index().match("Gusto " + IRS_ROW).table.extract("Gusto " + IRS_ROW)
+    assert (data["employer_ein"], data["wages"], data["federal_withholding"]) == ("12-3456789", 50000.0, 6000.0)
+
+
+def test_extra_directory_adds_and_overrides_profiles(tmp_path):
+    (tmp_path / "acme.json").write_text(json.dumps({
+        "name": "acme", "extends": "fallback", "priority": 40, "required": ["acme payroll"],
+        "rules": [{"anchor": "gross pay", "values": [["wages", "\\s*\\$?([0-9][0-9,]*\\.[0-9]{2})"]]}],
+    }))
+    index = ProfileIndex(load_profiles([PROFILE_DIR, str(tmp_path)]))
+    profile = index.match("ACME Payroll Gross pay $1,234.50 EIN 12-3456789")
+    assert profile.name == "acme"
+    data = profile.table.extract("ACME Payroll Gross pay $1,234.50 EIN 12-3456789")
+    assert (data["wages"], data["employer_ein"]) == (1234.5, "12-3456789")
+
+
+def test_vendor_markers_match_whole_words_on_w2s():
+    index = get_profile_index()
+    clean = "Employee’s social security number: 123-45-6789 Employer: {} Wages $1.00"
+    # "adp" in Broadpoint and "gusto" in Augusto are not vendor names
+    assert index.match(clean.format("Broadpoint Logistics")).name == "clean"
+    assert index.match("Augusto Ramirez " + IRS_ROW).name == "irs_blank"
+    # A vendor name on a non-W-2 page is not a vendor W-2
+    assert index.match("ADP Earnings Summary SSN 123-45-6789 wages 10.00").name == "fallback"
+
+
+def test_profile_without_rules_never_outranks_other_layouts(tmp_path):
+    (tmp_path / "vendor.json").write_text(json.dumps({
+        "name": "vendor", "extends": "irs_blank", "priority": 99, "required": ["vendor"], "rules": [],
+    }))
+    index = ProfileIndex(load_profiles([PROFILE_DIR, str(tmp_path)]))
+    assert index.match("Vendor Employee’s social security number: 123-45-6789 Wages $1.00").name == "clean"
+    assert index.match("Vendor " + IRS_ROW).name == "vendor"
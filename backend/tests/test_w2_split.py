@@ -0,0 +1,89 @@
+import asyncio
+import os
+from dataclasses import replace
+
+from app import parse_lanes
+from app.parse_lanes import ParseScheduler
+from app.parse_pool import ParsePool
+from app.w2_parser import W2Parser
+from app.w2_split import PageRead, merge_instances, segment_pages
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# Employee 1 copies B and C, employee 2 copies B and C, an instructions page, employee 3 copy B
+MULTI = os.path.join(FIXTURES, "w2_multi.pdf")
+EXPECTED = [("124-45-6788", [1, 2], 41000.0), ("125-45-6787", [3, 4, 5], 42000.0),
+            ("126-45-6786", [6], 43000.0)]
+
+
+def _summary(documents):
+    return [(d["employee_ssn"], d["pages"], d["wages"]) for d in documents]
+
+
+def test_segments_by_ssn_copy_and_scan():
+    reads = [PageRead(1, "w2", None, "a", "123-45-6789", "b"),
+             PageRead(2, "notice", None, "n", None, None),
+             PageRead(3, "w2", None, "b", "987-65-4321", "b"),
+             PageRead(4, "", None, "e", None, None),
+             PageRead(5, "w2", None, "a", "123-45-6789", "c"),
+             PageRead(6, "w2 masked", None, "c", None, "b"),
+             PageRead(7, "w2 masked", None, "d", None, "b")]
+    assert [[p.number for p in s] for s in segment_pages(reads)] == [[1, 2, 5], [3], [4], [6], [7]]
+
+
+def test_merge_keeps_most_confident_copy():
+    low = {"employee_ssn": "1", "employer_ein": "2", "confidence": {"wages": 0.5}, "pages": [4]}
+    high = {"employee_ssn": "1", "employer_ein": "2", "confidence": {"wages": 0.9}, "pages": [1]}
+    other = {"employee_ssn": None, "employer_ein": None, "confidence": {}, "pages": [2]}
+    assert merge_instances([low, other, high]) == [{**high, "pages": [1, 4]}, other]
+
+
+def test_merge_ranks_1099_copies_by_their_checked_fields():
+    low = {"form_type": "1099-int", "recipient_tin": "1", "payer_tin": "2",
+           "confidence": {"interest_income": 0.5, "wages": 1.0}, "pages": [1]}
+    high = {**low, "confidence": {"interest_income": 0.9}, "pages": [3]}
+    w2 = {"employee_ssn": "1", "employer_ein": "2", "confidence": {}, "pages": [2]}
+    assert merge_instances([low, w2, high]) == [{**high, "pages": [1, 3]}, w2]
+
+
+def test_masked_ssn_needs_matching_name():
+    reads = [PageRead(1, "w2", None, "a", "XXX-XX-1234", "b", "ana diaz"),
+             PageRead(2, "w2", None, "b", "XXX-XX-1234", "c", "ana diaz"),
+             PageRead(3, "w2", None, "c", "XXX-XX-1234", "b", "li wong"),
+             PageRead(4, "w2", None, "d", "XXX-XX-1234", "c", None)]
+    assert [[p.number for p in s] for s in segment_pages(reads)] == [[1, 2], [3], [4]]
+
+    ana = {"employee_ssn": "XXX-XX-1234", "employer_ein": "2", "employee_first_name": "Ana",
+           "employee_last_name": "Diaz", "confidence": {}, "pages": [1]}
+    li = {**ana, "employee_first_name": "Li", "employee_last_name": "Wong", "pages": [2]}
+    unnamed = {**ana, "employee_first_name": None, "employee_last_name": None, "pages": [3]}
+    again = {**ana, "employee_first_name": "ANA", "pages": [4]}
+    assert [d["pages"] for d in merge_instances([ana, li, unnamed, again])] == [[1, 4], [2], [3]]
+
+
+def test_1099_pages_are_read_as_1099s():
+    parser = W2Parser()
+    nec, _ = parser.read_pages(os.path.join(FIXTURES, "f1099_nec.pdf"))
+    div, _ = parser.read_pages(os.path.join(FIXTURES, "f1099_div.pdf"))
+    assert [(p.employee_ssn, p.employee_name) for p in nec + div] == [("XXX-XX-6789", "jane doe"),
+                                                                        ("XXX-XX-4321", "omar khan")]
+    # Recipients tell the forms of one PDF apart as employees do
+    reads = [replace(page, number=n) for n, page in enumerate(nec + div, 1)]
+    assert [[p.number for p in s] for s in segment_pages(reads)] == [[1], [2]]
+
+
+def test_parse_all_splits_employees():
+    documents, ftype = W2Parser().parse_all(MULTI, "application/pdf")
+    assert ftype == "pdf"
+    assert _summary(documents) == EXPECTED
+
+
+def test_scheduler_splits_across_workers(monkeypatch):
+    # Two-page chunks so the read is spread over several tasks
+    monkeypatch.setattr(parse_lanes, "SPLIT_PAGE_CHUNK", 2)
+    scheduler = ParseScheduler(ParsePool(max_workers=2, max_queue=2), ParsePool(max_workers=1, max_queue=2))
+    try:
+        documents, _ = asyncio.run(scheduler.run_all(MULTI, "application/pdf"))
+    finally:
+        scheduler.shutdown()
+    assert _summary(documents) == EXPECTED
+    assert all(d["extraction_tier"] == "geometry" for d in documents)